@@ -4,9 +4,12 @@ from .allocation import (
     compare_allocation_sets,
     compare_securities_allocation,
 )
+from .lookthrough import ETF_INDICES, LookThrough
 from .selector import SecuritySelector, join_securities
 
 __all__ = [
+    "ETF_INDICES",
+    "LookThrough",
     "SecuritySelector",
     "join_securities",
     "Allocation",
@@ -0,0 +1,92 @@
+"""
+ETF look-through: exposures of ETF positions to the stocks of their indices.
+"""
+
+from collections.abc import Iterable
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+# B3 index tracked by each ETF (index codes as in the B3 index pages)
+ETF_INDICES = {
+    "BOVA11": "IBOV",
+    "BOVV11": "IBOV",
+    "BOVX11": "IBOV",
+    "BRAX11": "IBXX",
+    "DIVO11": "IDIV",
+    "ECOO11": "ICO2",
+    "FIND11": "IFNC",
+    "GOVE11": "IGCT",
+    "ISUS11": "ISEE",
+    "MATB11": "IMAT",
+    "PIBB11": "IBXL",
+    "SMAC11": "SMLL",
+    "SMAL11": "SMLL",
+}
+
+
+class LookThrough:
+    """
+    Expand ETF positions into the stocks of the index each ETF tracks,
+    weighted by their part in the index composition, and merge them with
+    direct stock positions.  Positions other than known ETFs are kept as is.
+    """
+
+    def __init__(
+        self,
+        etf_indices: dict[str, str] | None = None,
+        index_retriever=None,
+        day: str | date | None = None,
+    ):
+        self.etf_indices: dict[str, str] = dict(
+            ETF_INDICES if etf_indices is None else etf_indices
+        )
+        self._index_retriever = index_retriever
+        self.day: str | date | None = day
+        self._parts: dict[str, pd.Series] = {}
+
+    @property
+    def index_retriever(self):
+        if self._index_retriever is None:
+            import retriever
+
+            self._index_retriever = retriever.get_index_retriever()
+        return self._index_retriever
+
+    def parts(self, index: str) -> pd.Series:
+        """Return the (normalized) part of each stock in the index."""
+        parts = self._parts.get(index)
+        if parts is None:
+            df = self.index_retriever.get_composition_frame(index, self.day)
+            parts = pd.Series(
+                df["part"].to_numpy(np.float64), index=df["code"].to_numpy()
+            )
+            parts /= parts.sum()
+            self._parts[index] = parts
+        return parts
+
+    def _compositions(
+        self, etfs: Iterable[str]
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Sparse ETF x stock matrix, as (row, stock, part) triples
+        rows, codes, parts = [], [], []
+        for row, etf in enumerate(etfs):
+            index_parts = self.parts(self.etf_indices[etf])
+            rows.append(np.full(len(index_parts), row))
+            codes.append(index_parts.index.to_numpy())
+            parts.append(index_parts.to_numpy())
+        return np.concatenate(rows), np.concatenate(codes), np.concatenate(parts)
+
+    def expand(self, securities: dict[str, float]) -> dict[str, float]:
+        """Return the securities (name: value or weight) with ETFs looked through."""
+        holdings = pd.Series(securities, dtype=np.float64)
+        is_etf = holdings.index.isin(list(self.etf_indices))
+        if not is_etf.any():
+            return dict(securities)
+
+        etfs = holdings[is_etf]
+        rows, codes, parts = self._compositions(etfs.index)
+        underlying = pd.Series(etfs.to_numpy()[rows] * parts, index=codes)
+        exposures = pd.concat([holdings[~is_etf], underlying])
+        return exposures.groupby(level=0, sort=False).sum().to_dict()
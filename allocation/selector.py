@@ -5,13 +5,20 @@ from functools import reduce
 
 
 class SecuritySelector:
-    def __init__(self, num_of_secs=0, ignore_secs=[], regex_rules=[]):
+    def __init__(
+        self, num_of_secs=0, ignore_secs=[], regex_rules=[], look_through=None
+    ):
         self.num_of_secs = num_of_secs
         self.ignore_secs = ignore_secs
         self.regex_rules = regex_rules
+        self.look_through = look_through
 
     def select_securities(self, securities):
-        # 0. Get key-value tuples iterator from securities dict
+        # 0. Expand ETFs into their underlying stocks (see LookThrough)
+        if self.look_through is not None:
+            securities = self.look_through.expand(securities)
+
+        # 0.1. Get key-value tuples iterator from securities dict
         secs = securities.items()
 
         # 1. Remove ignored securities
@@ -40,8 +47,13 @@ class SecuritySelector:
         return dict(secs)
 
 
-def join_securities(securitiesA, securitiesB, num_of_secs=20):
-    # 0. Get key-value tuples iterators from securities dicts
+def join_securities(securitiesA, securitiesB, num_of_secs=20, look_through=None):
+    # 0. Expand ETFs into their underlying stocks (see LookThrough)
+    if look_through is not None:
+        securitiesA = look_through.expand(securitiesA)
+        securitiesB = look_through.expand(securitiesB)
+
+    # 0.1. Get key-value tuples iterators from securities dicts
     secsA = securitiesA.items()
     secsB = securitiesB.items()
 
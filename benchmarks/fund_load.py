@@ -0,0 +1,47 @@
+"""
+Time FundRetriever loading synthetic CVM files.
+
+Usage: python -m benchmarks.fund_load [--funds 500]
+"""
+
+import argparse
+import tempfile
+import time
+
+from retriever.fund import FundRetriever
+from retriever.retriever import DataRetriever
+
+from .generators import write_fund_files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--funds", type=int, default=500)
+    args = parser.parse_args()
+
+    years = list(range(DataRetriever._initial_year, time.localtime()[0] + 1))
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"Generating {args.funds} funds x {len(years)} years...")
+        codes = write_fund_files(directory, args.funds, years)
+
+        start = time.perf_counter()
+        retriever = FundRetriever(data_directory=directory)
+        cold = time.perf_counter() - start
+
+        start = time.perf_counter()
+        FundRetriever(data_directory=directory)
+        cached = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for code in codes:
+            retriever.get_value(code, f"{years[-1]}-01-10")
+        lookups = time.perf_counter() - start
+
+    print(f"Load from files: {cold:8.3f}s")
+    print(f"Load from cache: {cached:8.3f}s")
+    print(f"{len(codes)} lookups: {lookups:8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
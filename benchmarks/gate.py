@@ -0,0 +1,359 @@
+"""
+Performance regression gate.
+
+Usage: python -m benchmarks.gate [--data DIR] [--update] [--case NAME ...]
+
+Runs the retriever, curve and portfolio hot paths on a fixed synthetic
+dataset and compares them with benchmarks/gate_baseline.json.  Each case runs
+in a fresh interpreter, restored from a snapshot of the loaded retrievers and
+calendars, and is measured for:
+- wall_time: best wall time of the repeated runs (seconds)
+- peak_rss: peak resident set size of the interpreter (MB)
+- alloc_peak: peak memory allocated by the case, traced by tracemalloc (MB)
+- alloc_blocks: memory blocks allocated by the case and still alive at its end
+
+The gate fails (exit status 1) when a metric exceeds its baseline by more
+than the tolerance.  --update rewrites the baseline with the current numbers.
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+from collections.abc import Callable
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+BASELINE_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "gate_baseline.json"
+)
+
+METRICS = ["wall_time", "peak_rss", "alloc_peak", "alloc_blocks"]
+
+# Maximum ratio between current and baseline values.  Wall time is noisier
+# than memory, and tiny values are compared with an absolute slack instead.
+TOLERANCES = {
+    "wall_time": 1.5,
+    "peak_rss": 1.1,
+    "alloc_peak": 1.2,
+    "alloc_blocks": 1.2,
+}
+SLACK = {
+    "wall_time": 0.005,
+    "peak_rss": 16.0,
+    "alloc_peak": 1.0,
+    "alloc_blocks": 1000,
+}
+
+Regression = namedtuple("Regression", ["case", "metric", "baseline", "current"])
+
+
+#########
+# Cases #
+#########
+
+
+def _query_days(n: int, seed: int = 0) -> list[date]:
+    from .generators import all_business_days, data_years
+
+    days = all_business_days(data_years())[5:]
+    rng = np.random.default_rng(seed)
+    return [d.date() for d in days[rng.integers(0, len(days), n)]]
+
+
+def _bovespa_get_value(root: str) -> Callable[[], object]:
+    import retriever
+
+    dr = retriever.get_bovespa_retriever()
+    codes = list(dr.codes)
+    rng = np.random.default_rng(0)
+    queries = [
+        (codes[i], f"{d:%Y-%m-%d}")
+        for i, d in zip(rng.integers(0, len(codes), 2000), _query_days(2000))
+    ]
+    return lambda: [dr.get_value(code, day) for code, day in queries]
+
+
+def _fund_get_value(root: str) -> Callable[[], object]:
+    import retriever
+
+    dr = retriever.get_fund_retriever()
+    codes = dr._available_codes()
+    rng = np.random.default_rng(0)
+    queries = [
+        (codes[i], f"{d:%Y-%m-%d}")
+        for i, d in zip(rng.integers(0, len(codes), 2000), _query_days(2000))
+    ]
+    return lambda: [dr.get_value(code, day) for code, day in queries]
+
+
+def _bcb_get_variation(root: str) -> Callable[[], object]:
+    import retriever
+
+    from .generators import all_business_days, data_years
+
+    dr = retriever.get_bcb_retriever()
+    last_day = all_business_days(data_years())[-1].date()
+    begins = [d for d in _query_days(500) if d < last_day]
+    return lambda: [dr.get_variation("CDI", b, last_day) for b in begins]
+
+
+def _curve_init(root: str) -> Callable[[], object]:
+    from model.curves import Curve
+
+    days = _query_days(50)
+    return lambda: [Curve("di_pre", day) for day in days]
+
+
+def _portfolio_load_from_csv(root: str) -> Callable[[], object]:
+    from model.portfolio import Portfolio
+
+    file_name = os.path.join(root, "portfolio.csv")
+    return lambda: Portfolio().load_from_csv(file_name)
+
+
+CASES = {
+    "BovespaRetriever.get_value": _bovespa_get_value,
+    "FundRetriever.get_value": _fund_get_value,
+    "BCBRetriever.get_variation": _bcb_get_variation,
+    "Curve.__init__": _curve_init,
+    "Portfolio.load_from_csv": _portfolio_load_from_csv,
+}
+
+
+###############
+# Measurement #
+###############
+
+
+def _snapshot_file(root: str) -> str:
+    return os.path.join(root, "gate.snapshot")
+
+
+def prepare(root: str) -> None:
+    """Generate the dataset (if needed) and snapshot the loaded retrievers."""
+    import retriever
+    from retriever.snapshot import load_snapshot, save_snapshot
+    from utils.calendars import get_calendar
+
+    from .suite import RETRIEVERS, dataset_sizes, generate_dataset
+
+    if not os.path.isfile(os.path.join(root, "codes.json")):
+        print("Generating synthetic data in %s..." % root)
+        generate_dataset(root, dataset_sizes(1.0))
+    if load_snapshot(_snapshot_file(root)) is not None:
+        return
+
+    print("Loading retrievers and calendars...")
+    for name, (directory, cls) in RETRIEVERS.items():
+        retriever.registry.add(name, cls(data_directory=os.path.join(root, directory)))
+    get_calendar("PMC/BMF")
+    get_calendar("ANBIMA")
+    save_snapshot(_snapshot_file(root), retriever.registry.instances)
+
+
+def _peak_rss() -> float:
+    """Return the peak resident set size of this interpreter (MB)."""
+    # ru_maxrss survives exec, so a case started by a larger process would
+    # report the parent's peak; VmHWM is reset for the new program
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_case(name: str, root: str, repeat: int) -> dict[str, float]:
+    """Measure one case in the current interpreter."""
+    from retriever.snapshot import restore_snapshot
+
+    assert restore_snapshot(_snapshot_file(root)), "Stale or missing snapshot"
+    func = CASES[name](root)
+    func()  # Warm up
+
+    wall_time = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        wall_time = min(wall_time, time.perf_counter() - start)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    func()
+    _, alloc_peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    alloc_blocks = sum(s.count_diff for s in stats if s.count_diff > 0)
+
+    return {
+        "wall_time": wall_time,
+        "peak_rss": _peak_rss(),
+        "alloc_peak": alloc_peak / 2**20,
+        "alloc_blocks": alloc_blocks,
+    }
+
+
+def measure_cases(names: list[str], root: str, repeat: int) -> dict[str, dict]:
+    """Measure each case in a fresh interpreter."""
+    results = {}
+    for name in names:
+        output = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.gate",
+                "--data",
+                root,
+                "--repeat",
+                str(repeat),
+                "--run-case",
+                name,
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ).stdout
+        results[name] = json.loads(output.strip().splitlines()[-1])
+        print("%-28s %8.4fs" % (name, results[name]["wall_time"]))
+    return results
+
+
+##############
+# Comparison #
+##############
+
+
+def compare(
+    baseline: dict[str, dict],
+    current: dict[str, dict],
+    tolerances: dict[str, float] = TOLERANCES,
+    slack: dict[str, float] = SLACK,
+) -> list[Regression]:
+    """Return the metrics of the current results that regressed from the baseline."""
+    regressions = []
+    for case, metrics in current.items():
+        if case not in baseline:
+            continue
+        for metric in METRICS:
+            if metric not in metrics or metric not in baseline[case]:
+                continue
+            base, value = baseline[case][metric], metrics[metric]
+            limit = max(base * tolerances[metric], base + slack[metric])
+            if value > limit:
+                regressions.append(Regression(case, metric, base, value))
+    return regressions
+
+
+def format_diff(
+    baseline: dict[str, dict],
+    current: dict[str, dict],
+    regressions: list[Regression],
+) -> str:
+    """Return a table of the baseline and current values, flagging regressions."""
+    flagged = {(r.case, r.metric) for r in regressions}
+    lines = [
+        "%-28s %-13s %12s %12s %8s"
+        % ("Case", "Metric", "Baseline", "Current", "Change")
+    ]
+    for case, metrics in current.items():
+        for metric in METRICS:
+            value = metrics.get(metric)
+            base = baseline.get(case, {}).get(metric)
+            if value is None:
+                continue
+            if base is None:
+                change = "new"
+                base_str = "-"
+            else:
+                change = "%+.0f%%" % ((value / base - 1.0) * 100.0) if base else "-"
+                base_str = "%.4g" % base
+            marker = "  <-- REGRESSION" if (case, metric) in flagged else ""
+            lines.append(
+                "%-28s %-13s %12s %12.4g %8s%s"
+                % (case, metric, base_str, value, change, marker)
+            )
+    for case in baseline:
+        if case not in current:
+            lines.append("%-28s (not run)" % case)
+    return "\n".join(lines)
+
+
+def save_baseline(file_name: str, current: dict[str, dict]) -> None:
+    """Write the current results, with the environment, as the baseline."""
+    with open(file_name, "w") as f:
+        json.dump(
+            {
+                "environment": {
+                    "python": sys.version.split()[0],
+                    "pandas": pd.__version__,
+                },
+                "cases": {
+                    case: {k: round(v, 6) for k, v in metrics.items()}
+                    for case, metrics in current.items()
+                },
+            },
+            f,
+            indent=2,
+        )
+        f.write("\n")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--data", help="Directory for (reused) synthetic data")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per case")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline file")
+    parser.add_argument("--case", action="append", choices=list(CASES))
+    parser.add_argument(
+        "--update", action="store_true", help="Save results as the baseline"
+    )
+    parser.add_argument("--run-case", choices=list(CASES), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_case is not None:
+        assert args.data is not None
+        print(json.dumps(run_case(args.run_case, args.data, args.repeat)))
+        return 0
+
+    root = args.data or tempfile.mkdtemp(prefix="portfolio_gate_")
+    try:
+        prepare(root)
+        current = measure_cases(args.case or list(CASES), root, args.repeat)
+    finally:
+        if args.data is None:
+            shutil.rmtree(root)
+
+    if args.update or not os.path.isfile(args.baseline):
+        save_baseline(args.baseline, current)
+        print("Baseline saved to %s" % args.baseline)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)["cases"]
+    regressions = compare(baseline, current)
+    print()
+    print(format_diff(baseline, current, regressions))
+    if regressions:
+        print()
+        print("%d metric(s) regressed beyond tolerance" % len(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,386 @@
+"""
+Synthetic market data files, written in the same layout as the files produced
+by the retriever/data_*/download_*_files.sh scripts.
+"""
+
+import os
+import zipfile
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from utils.calendars import get_calendar
+
+FUND_COLUMNS = [
+    "TP_FUNDO_CLASSE",
+    "CNPJ_FUNDO_CLASSE",
+    "ID_SUBCLASSE",
+    "DT_COMPTC",
+    "VL_TOTAL",
+    "VL_QUOTA",
+    "VL_PATRIM_LIQ",
+    "CAPTC_DIA",
+    "RESG_DIA",
+    "NR_COTST",
+]
+
+
+def business_days(year: int) -> pd.DatetimeIndex:
+    # Brazilian holidays matter: curves cannot be built on them (see model.curves)
+    last_day = min(date(year, 12, 31), date.today())
+    return pd.DatetimeIndex(get_calendar("ANBIMA").seq(date(year, 1, 1), last_day))
+
+
+def fund_cnpj(i: int) -> str:
+    digits = f"{10000000 + i:08d}000{i % 100:03d}"
+    return f"{digits[:2]}.{digits[2:5]}.{digits[5:8]}/{digits[8:12]}-{digits[12:]}"
+
+
+def write_fund_files(directory: str, funds: int, years: list[int], seed: int = 0):
+    """Write codes.txt and one CVM daily report CSV per fund and year."""
+    rng = np.random.default_rng(seed)
+    cnpjs = [fund_cnpj(i) for i in range(funds)]
+
+    with open(os.path.join(directory, "codes.txt"), "w") as codes_file:
+        for i, cnpj in enumerate(cnpjs):
+            codes_file.write(f"{cnpj}||FUNDO SINTETICO {i}\n")
+
+    for cnpj in cnpjs:
+        quota = 1.0
+        for year in years:
+            days = business_days(year)
+            returns = rng.normal(0.0004, 0.005, len(days))
+            quotas = quota * np.cumprod(1.0 + returns)
+            quota = quotas[-1]
+            patrim = rng.uniform(1e7, 1e9, len(days))
+            df = pd.DataFrame(
+                {
+                    "TP_FUNDO_CLASSE": "FI",
+                    "CNPJ_FUNDO_CLASSE": cnpj,
+                    "ID_SUBCLASSE": "",
+                    "DT_COMPTC": days.strftime("%Y-%m-%d"),
+                    "VL_TOTAL": patrim.round(2),
+                    "VL_QUOTA": quotas.round(9),
+                    "VL_PATRIM_LIQ": patrim.round(2),
+                    "CAPTC_DIA": rng.uniform(0, 1e6, len(days)).round(2),
+                    "RESG_DIA": rng.uniform(0, 1e6, len(days)).round(2),
+                    "NR_COTST": rng.integers(100, 100000, len(days)),
+                },
+                columns=FUND_COLUMNS,
+            )
+            code = cnpj.translate({ord(i): None for i in "./-"})
+            file_name = os.path.join(directory, f"{code}_{year}.csv")
+            df.to_csv(file_name, index=False)
+    return [cnpj.translate({ord(i): None for i in "./-"}) for cnpj in cnpjs]
+
+
+def data_years() -> list[int]:
+    """Years expected by the retrievers (see DataRetriever._initial_year)."""
+    return list(range(2014, date.today().year + 1))
+
+
+def all_business_days(years: list[int]) -> pd.DatetimeIndex:
+    return business_days(years[0]).append([business_days(y) for y in years[1:]])
+
+
+############
+# COTAHIST #
+############
+
+
+def stock_codes(stocks: int) -> list[str]:
+    """Tickers: 4 letters plus 3 (common), 4 (preferred) or 11 (units, FIIs)."""
+    codes = []
+    for i in range(stocks):
+        letters = "".join(chr(ord("A") + (i // 26**k) % 26) for k in (3, 2, 1, 0))
+        codes.append(letters + ("3", "4", "11")[i % 3])
+    return codes
+
+
+def _cotahist_record(day: pd.Timestamp, code: str, price: float) -> str:
+    cents = int(round(price * 100))
+    record = (
+        "01"  # TIPREG
+        + day.strftime("%Y%m%d")  # DATA
+        + "02"  # CODBDI
+        + code.ljust(12)  # CODNEG
+        + "010"  # TPMERC (mercado a vista)
+        + ("EMPRESA " + code[:4]).ljust(12)  # NOMRES
+        + "ON      NM"  # ESPECI
+        + "   "  # PRAZOT
+        + "R$  "  # MODREF
+        + f"{cents:013d}" * 5  # PREABE, PREMAX, PREMIN, PREMED, PREULT
+        + f"{cents:013d}" * 2  # PREOFC, PREOFV
+        + f"{1000:05d}"  # TOTNEG
+        + f"{100000:018d}"  # QUATOT
+        + f"{cents * 100000:018d}"  # VOLTOT
+        + f"{0:013d}"  # PREEXE
+        + "0"  # INDOPC
+        + "99991231"  # DATVEN
+        + "0000001"  # FATCOT
+        + f"{0:013d}"  # PTOEXE
+        + ("BR" + code[:4] + "ACNOR0").ljust(12)  # CODISI
+        + "100"  # DISMES
+    )
+    assert len(record) == 245
+    return record
+
+
+def write_cotahist_files(
+    directory: str, stocks: int, years: list[int], seed: int = 0
+) -> list[str]:
+    """Write codes.txt and COTAHIST_A<year>.TXT/.ZIP annual files."""
+    rng = np.random.default_rng(seed)
+    codes = stock_codes(stocks)
+    with open(os.path.join(directory, "codes.txt"), "w") as codes_file:
+        codes_file.write("".join(code + "\n" for code in codes))
+
+    prices = rng.uniform(5.0, 100.0, stocks)
+    for year in years:
+        days = business_days(year)
+        returns = rng.normal(0.0, 0.02, (len(days), stocks))
+        year_prices = prices * np.cumprod(1.0 + returns, axis=0)
+        prices = year_prices[-1]
+
+        txt_name = f"COTAHIST_A{year}.TXT"
+        generation_date = days[-1].strftime("%Y%m%d")
+        lines = [f"00COTAHIST.{year}BOVESPA {generation_date}".ljust(245)]
+        for i, day in enumerate(days):
+            for code, price in zip(codes, year_prices[i]):
+                lines.append(_cotahist_record(day, code, price))
+        lines.append(f"99COTAHIST.{year}BOVESPA {generation_date}".ljust(245))
+        with open(os.path.join(directory, txt_name), "w", newline="\r\n") as f:
+            f.write("\n".join(lines) + "\n")
+        zip_name = os.path.join(directory, f"COTAHIST_A{year}.ZIP")
+        with zipfile.ZipFile(zip_name, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.write(os.path.join(directory, txt_name), txt_name)
+    return codes
+
+
+##################
+# Tesouro Direto #
+##################
+
+TREASURE_KINDS = {
+    # code: (sheet prefix, price level)
+    "LFT": ("LFT", 10000.0),
+    "LTN": ("LTN", 700.0),
+    "NTN-B": ("NTN-B", 4000.0),
+    "NTN-B_Principal": ("NTN-B Princ", 1500.0),
+    "NTN-F": ("NTN-F", 1000.0),
+}
+
+
+def write_treasure_files(
+    directory: str, bonds: int, years: list[int], seed: int = 0
+) -> list[str]:
+    """
+    Write codes.txt and one Tesouro Direto XLS workbook per kind and year, with
+    one sheet per bond.  Return the bond codes (e.g. LTN_010130).
+    """
+    import xlwt
+
+    rng = np.random.default_rng(seed)
+    with open(os.path.join(directory, "codes.txt"), "w") as codes_file:
+        codes_file.write("".join(code + "\n" for code in TREASURE_KINDS))
+
+    header = [
+        "Dia",
+        "Taxa Compra Manha",
+        "Taxa Venda Manha",
+        "PU Compra Manha",
+        "PU Venda Manha",
+        "PU Base Manha",
+    ]
+    bond_codes = []
+    maturities = [date(years[-1] + 2 + i, 1, 1) for i in range(bonds)]
+    for code, (prefix, level) in TREASURE_KINDS.items():
+        sheets = [f"{prefix} {maturity:%d%m%y}" for maturity in maturities]
+        bond_codes += [f"{code}_{maturity:%d%m%y}" for maturity in maturities]
+        for year in years:
+            days = business_days(year)
+            book = xlwt.Workbook()
+            for sheet_name in sheets:
+                sheet = book.add_sheet(sheet_name)
+                sheet.write(0, 0, sheet_name)
+                for col, name in enumerate(header):
+                    sheet.write(1, col, name)
+                rates = rng.uniform(0.05, 0.15, len(days))
+                prices = level * np.cumprod(1.0 + rng.normal(0.0003, 0.002, len(days)))
+                for row, day in enumerate(days, start=2):
+                    values = (rates[row - 2], rates[row - 2] + 0.001)
+                    sheet.write(row, 0, day.strftime("%d/%m/%Y"))
+                    sheet.write(row, 1, round(values[0] * 100, 2))
+                    sheet.write(row, 2, round(values[1] * 100, 2))
+                    sheet.write(row, 3, round(prices[row - 2], 2))
+                    sheet.write(row, 4, round(prices[row - 2] * 0.999, 2))
+                    sheet.write(row, 5, round(prices[row - 2] * 0.9995, 2))
+            book.save(os.path.join(directory, f"{code}_{year}.xls"))
+    return bond_codes
+
+
+#######
+# SGS #
+#######
+
+
+def write_sgs_files(directory: str, years: list[int], seed: int = 0) -> None:
+    """Write BCB SGS daily series (percent per day) as sgs_daily_<year>.csv files."""
+    rng = np.random.default_rng(seed)
+    with open(os.path.join(directory, "codes.txt"), "w") as codes_file:
+        codes_file.write("CDI\nSELIC\nIPCA\n")
+    for year in years:
+        days = business_days(year)
+        cdi = np.round(rng.uniform(0.02, 0.05, len(days)), 6)
+        df = pd.DataFrame(
+            {
+                "SELIC": cdi + 0.0004,
+                "CDI": cdi,
+                "IPCA": np.round(rng.uniform(0.0, 0.04, len(days)), 6),
+                "IGP-M": np.round(rng.uniform(-0.02, 0.05, len(days)), 6),
+            },
+            index=pd.Index(days, name="Date"),
+        )
+        df.to_csv(os.path.join(directory, f"sgs_daily_{year}.csv"))
+
+
+################
+# Yield curves #
+################
+
+CURVE_DAYS = [1, 21, 63, 126, 252, 378, 504, 756, 1008, 1260, 1764, 2520, 3780, 5040]
+
+
+def write_curve_files(
+    directory: str, years: list[int], vertices: int = len(CURVE_DAYS), seed: int = 0
+) -> None:
+    """Write B3 DI x Pre and DI x IPCA curves as yc_<curve>_<year>.csv files."""
+    rng = np.random.default_rng(seed)
+    with open(os.path.join(directory, "codes.txt"), "w") as codes_file:
+        codes_file.write("di_pre\ndi_ipca\n")
+
+    biz_days = np.array(
+        CURVE_DAYS[:vertices]
+        + [CURVE_DAYS[-1] + 252 * i for i in range(1, vertices - len(CURVE_DAYS) + 1)]
+    )
+    cur_days = np.round(biz_days * 365 / 252).astype(int)
+    for curve, level in (("di_pre", 0.10), ("di_ipca", 0.05)):
+        for year in years:
+            days = business_days(year)
+            short = level + rng.normal(0.0, 0.002, len(days)).cumsum() / 10
+            slope = np.log1p(biz_days / 252) * 0.005
+            rates = np.round(short[:, None] + slope[None, :], 6)
+            refdate = np.repeat(days, len(biz_days))
+            forward = refdate + pd.to_timedelta(np.tile(cur_days, len(days)), "D")
+            df = pd.DataFrame(
+                {
+                    "refdate": refdate.strftime("%Y-%m-%d"),
+                    "curve": "PRE" if curve == "di_pre" else "DIC",
+                    "cur_days": np.tile(cur_days, len(days)),
+                    "biz_days": np.tile(biz_days, len(days)),
+                    "forward_date": forward.strftime("%Y-%m-%d"),
+                    "rate": rates.ravel(),
+                }
+            )
+            df.to_csv(os.path.join(directory, f"yc_{curve}_{year}.csv"), index=False)
+
+
+#############
+# Portfolio #
+#############
+
+PORTFOLIO_COLUMNS = [
+    "Data",
+    "Categoria",
+    "Ativo",
+    "Quantidade",
+    "PrecoUnitario",
+    "Taxa",
+    "Indexador",
+    "Vencimento",
+    "Subcategoria",
+]
+
+
+def write_portfolio_file(
+    file_name: str,
+    stocks: list[str],
+    funds: list[str],
+    bonds: list[str],
+    bank_bonds: int,
+    seed: int = 0,
+) -> None:
+    """Write a portfolio CSV in the format read by Portfolio.load_from_csv."""
+    rng = np.random.default_rng(seed)
+    # Business days, so that curves exist at the issue dates of bank bonds
+    days = all_business_days(data_years()[:-1])
+    dates = sorted(rng.choice(days, len(stocks) + len(funds) + len(bonds) + bank_bonds))
+    rows = []
+    for stock in stocks:
+        kind = "FII" if stock.endswith("11") and len(rows) % 2 else "Acao"
+        rows.append([kind, stock, rng.integers(100, 1000), "", "", "", "", ""])
+    for fund in funds:
+        rows.append(["StockFund", fund, 1000, "", "", "", "", "Active"])
+    for bond in bonds:
+        rows.append(["TD", bond, 2, "", "10.5%", "", "", ""])
+    for i in range(bank_bonds):
+        rows.append(["CDB", f"CDB_{i:03d}", 10, 1000.0, "105%", "CDI", "", "Floating"])
+    for row, day in zip(rows, dates):
+        row.insert(0, pd.Timestamp(day).strftime("%Y-%m-%d"))
+        if row[1] == "CDB":
+            # Within the curves' longest vertex, from any issue date
+            row[7] = date(date.today().year + 3, 1, 2).strftime("%Y-%m-%d")
+
+    df = pd.DataFrame(rows, columns=PORTFOLIO_COLUMNS)
+    df["Vencimento"] = df["Vencimento"].replace("", "2099-12-31")
+    df.to_csv(file_name, index=False)
+
+
+##############
+# Retrievers #
+##############
+
+
+@contextmanager
+def registered_retrievers(directory: str, names: Iterable[str]) -> Iterator[dict]:
+    """
+    Write the data files of the named retrievers (bcb, curves or
+    directtreasure, with a single bond per kind) in subdirectories of
+    directory, and register retrievers reading them for the duration of the
+    context, after which the previous retrievers are restored.  Yield the
+    retrievers by name.
+    """
+    import retriever
+    from retriever.bcb import BCBRetriever
+    from retriever.curves import B3CurveRetriever
+    from retriever.directtreasure import DirectTreasureRetriever
+
+    retrievers = {
+        "bcb": (write_sgs_files, BCBRetriever),
+        "curves": (write_curve_files, B3CurveRetriever),
+        "directtreasure": (
+            lambda d, years: write_treasure_files(d, 1, years),
+            DirectTreasureRetriever,
+        ),
+    }
+    registry = retriever.registry
+    previous = registry.instances
+    instances = {}
+    try:
+        for name in names:
+            write_files, cls = retrievers[name]
+            data_directory = os.path.join(directory, name)
+            os.makedirs(data_directory, exist_ok=True)
+            write_files(data_directory, data_years())
+            instances[name] = cls(data_directory=data_directory)
+            registry.add(name, instances[name])
+        yield instances
+    finally:
+        for name in instances:
+            if name in previous:
+                registry.add(name, previous[name])
+            else:
+                registry.remove(name)
@@ -0,0 +1,335 @@
+"""
+Offline benchmark suite on synthetic market data.
+
+Usage: python -m benchmarks.suite [--scale 1] [--repeat 3] [--save-baseline]
+
+Synthetic data files are generated in a temporary directory (or in --data, to
+reuse them between runs) and loaded by the retrievers, which are then placed
+in the retriever registry so that curves and portfolios use them.  Results
+are compared with benchmarks/baseline.json, which --save-baseline rewrites.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+import retriever
+from retriever.bcb import BCBRetriever
+from retriever.bovespa import BovespaRetriever
+from retriever.curves import B3CurveRetriever
+from retriever.directtreasure import DirectTreasureRetriever
+from retriever.fund import FundRetriever
+from utils.calendars import get_calendar
+
+from .generators import (
+    all_business_days,
+    data_years,
+    write_cotahist_files,
+    write_curve_files,
+    write_fund_files,
+    write_portfolio_file,
+    write_sgs_files,
+    write_treasure_files,
+)
+
+BASELINE_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "baseline.json"
+)
+
+# Dataset size at scale 1
+SIZES = {
+    "stocks": 30,
+    "funds": 20,
+    "bonds": 2,  # per Tesouro Direto kind
+    "bank_bonds": 5,
+    "lookups": 1000,
+    "curves": 50,
+    "etfs": 200,
+}
+
+RETRIEVERS = {
+    # registry name: (data directory, retriever class)
+    "bovespa": ("data_bovespa", BovespaRetriever),
+    "fund": ("data_fund", FundRetriever),
+    "directtreasure": ("data_directtreasure", DirectTreasureRetriever),
+    "bcb": ("data_bcb", BCBRetriever),
+    "curves": ("data_curves", B3CurveRetriever),
+}
+
+
+def dataset_sizes(scale: float) -> dict[str, int]:
+    return {key: max(1, int(round(size * scale))) for key, size in SIZES.items()}
+
+
+def generate_dataset(root: str, sizes: dict[str, int]) -> dict[str, list[str]]:
+    """Write all synthetic data files under root and return the generated codes."""
+    years = data_years()
+    for directory, _ in RETRIEVERS.values():
+        os.makedirs(os.path.join(root, directory), exist_ok=True)
+
+    codes = {
+        "stocks": write_cotahist_files(
+            os.path.join(root, "data_bovespa"), sizes["stocks"], years
+        ),
+        "funds": write_fund_files(
+            os.path.join(root, "data_fund"), sizes["funds"], years
+        ),
+        "bonds": write_treasure_files(
+            os.path.join(root, "data_directtreasure"), sizes["bonds"], years
+        ),
+    }
+    write_sgs_files(os.path.join(root, "data_bcb"), years)
+    write_curve_files(os.path.join(root, "data_curves"), years)
+    write_portfolio_file(
+        os.path.join(root, "portfolio.csv"),
+        codes["stocks"],
+        codes["funds"],
+        codes["bonds"],
+        sizes["bank_bonds"],
+    )
+    with open(os.path.join(root, "codes.json"), "w") as f:
+        json.dump(codes, f)
+    return codes
+
+
+def measure(func: Callable[[], object], repeat: int = 1) -> float:
+    """Return the best wall time of repeat calls of func."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _remove_caches(directory: str) -> None:
+    for name in os.listdir(directory):
+        if name.endswith(".cache"):
+            os.remove(os.path.join(directory, name))
+
+
+class Suite:
+    def __init__(self, root: str, sizes: dict[str, int], repeat: int = 3):
+        self.root: str = root
+        self.sizes: dict[str, int] = sizes
+        self.repeat: int = repeat
+        with open(os.path.join(root, "codes.json")) as f:
+            self.codes: dict[str, list[str]] = json.load(f)
+        self.rng = np.random.default_rng(0)
+        # Skip the first days, for which some series have no quotes yet
+        self.days = all_business_days(data_years())[5:]
+        self.results: dict[str, float] = {}
+
+    def record(self, name: str, seconds: float) -> None:
+        self.results[name] = seconds
+        print("%-32s %10.4fs" % (name, seconds))
+
+    def random_days(self, n: int) -> list[str]:
+        return list(
+            self.days[self.rng.integers(0, len(self.days), n)].strftime("%Y-%m-%d")
+        )
+
+    def run(self) -> dict[str, float]:
+        self.record(
+            "calendars.load",
+            measure(lambda: (get_calendar("PMC/BMF"), get_calendar("ANBIMA"))),
+        )
+        self.run_loads()
+        self.run_lookups()
+        self.run_curves()
+        self.run_portfolio()
+        self.run_lookthrough()
+        return self.results
+
+    def run_loads(self) -> None:
+        for name, (directory, cls) in RETRIEVERS.items():
+            data_directory = os.path.join(self.root, directory)
+            _remove_caches(data_directory)
+            self.record(
+                f"{name}.cold_load",
+                measure(lambda: cls(data_directory=data_directory)),
+            )
+            instances = []
+            self.record(
+                f"{name}.cache_load",
+                measure(
+                    lambda: instances.append(cls(data_directory=data_directory)),
+                    self.repeat,
+                ),
+            )
+            retriever.registry.add(name, instances[-1])
+
+    def run_lookups(self) -> None:
+        n = self.sizes["lookups"]
+        for name, codes in (
+            ("bovespa", self.codes["stocks"]),
+            ("fund", self.codes["funds"]),
+            ("directtreasure", self.codes["bonds"]),
+        ):
+            dr = retriever.registry.get(name)
+            queries = list(zip(self.rng.choice(codes, n), self.random_days(n)))
+            self.record(
+                f"{name}.get_value",
+                measure(
+                    lambda: [dr.get_value(str(c), d) for c, d in queries], self.repeat
+                ),
+            )
+            self.record(f"{name}.grid_build", measure(dr.build_price_grid))
+            self.record(
+                f"{name}.get_value_grid",
+                measure(
+                    lambda: [dr.get_value(str(c), d) for c, d in queries], self.repeat
+                ),
+            )
+            dr.drop_price_grid()
+
+        # Indexers query variations with date objects
+        bcb = retriever.get_bcb_retriever()
+        begins = [pd.Timestamp(d).date() for d in self.random_days(n)]
+        last_day = self.days[-1].date()
+        intervals = [
+            (b, min(b + timedelta(days=int(k)), last_day))
+            for b, k in zip(begins, self.rng.integers(2, 720, n))
+        ]
+        self.record(
+            "bcb.get_variation",
+            measure(
+                lambda: [bcb.get_variation("CDI", b, e) for b, e in intervals if b < e],
+                self.repeat,
+            ),
+        )
+
+    def run_curves(self) -> None:
+        from model.curves import Curve
+
+        days = self.random_days(self.sizes["curves"])
+        maturity = date(date.today().year + 3, 1, 2)
+        self.record(
+            "curves.build",
+            measure(
+                lambda: [Curve("di_pre", d).get_rate(maturity) for d in days],
+                self.repeat,
+            ),
+        )
+
+    def run_portfolio(self) -> None:
+        from model.portfolio import Portfolio
+
+        file_name = os.path.join(self.root, "portfolio.csv")
+        self.record(
+            "portfolio.load_from_csv",
+            measure(lambda: Portfolio().load_from_csv(file_name), self.repeat),
+        )
+
+    def run_lookthrough(self) -> None:
+        from allocation import LookThrough
+
+        # ETFs on indices of overlapping sets of the synthetic stocks
+        stocks = self.codes["stocks"]
+        n = self.sizes["etfs"]
+        frames = {
+            "IDX%d" % i: pd.DataFrame({"code": stocks[i % 7 :], "part": 1.0})
+            for i in range(n)
+        }
+        look_through = LookThrough(
+            {"ETF%d11" % i: "IDX%d" % i for i in range(n)}, _CompositionFrames(frames)
+        )
+        securities = {"ETF%d11" % i: 1.0 for i in range(n)}
+        look_through.expand(securities)  # Read the compositions
+        self.record(
+            "lookthrough.expand",
+            measure(lambda: look_through.expand(securities), self.repeat),
+        )
+
+
+class _CompositionFrames:
+    """Index compositions kept in memory (see IndexRetriever)."""
+
+    def __init__(self, frames: dict[str, pd.DataFrame]):
+        self.frames: dict[str, pd.DataFrame] = frames
+
+    def get_composition_frame(self, index, day=None) -> pd.DataFrame:
+        return self.frames[index]
+
+
+def environment() -> dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "cpus": str(os.cpu_count()),
+    }
+
+
+def compare(results: dict[str, float], baseline: dict[str, float]) -> str:
+    lines = ["%-32s %10s %10s %8s" % ("Benchmark", "Baseline", "Current", "Ratio")]
+    for name, seconds in results.items():
+        if name in baseline:
+            lines.append(
+                "%-32s %9.4fs %9.4fs %7.2fx"
+                % (name, baseline[name], seconds, seconds / baseline[name])
+            )
+        else:
+            lines.append("%-32s %10s %9.4fs" % (name, "-", seconds))
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--scale", type=float, default=1.0, help="Dataset scale")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark")
+    parser.add_argument("--data", help="Directory for (reused) synthetic data")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline file")
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="Save results as the baseline"
+    )
+    args = parser.parse_args(argv)
+
+    sizes = dataset_sizes(args.scale)
+    root = args.data or tempfile.mkdtemp(prefix="portfolio_bench_")
+    try:
+        if not os.path.isfile(os.path.join(root, "codes.json")):
+            print("Generating synthetic data in %s..." % root)
+            start = time.perf_counter()
+            generate_dataset(root, sizes)
+            print("Generated in %.1fs" % (time.perf_counter() - start))
+        results = Suite(root, sizes, args.repeat).run()
+    finally:
+        if args.data is None:
+            shutil.rmtree(root)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(
+                {
+                    "scale": args.scale,
+                    "environment": environment(),
+                    "results": {k: round(v, 6) for k, v in results.items()},
+                },
+                f,
+                indent=2,
+            )
+            f.write("\n")
+        print("Baseline saved to %s" % args.baseline)
+    elif os.path.isfile(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["scale"] != args.scale:
+            print("Baseline was recorded at scale %s" % baseline["scale"])
+        print()
+        print(compare(results, baseline["results"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,353 @@
+"""
+Batch risk measures (duration, DV01 and convexity) of debt securities.
+
+The cash flows of all debt securities of a book are laid out in shared arrays
+(position, business days to payment and amount), along with the yield of each
+position.  Risk measures of the whole book are computed at once from these
+arrays, and a curve shock (a rate bump for each tenor) reprices all positions
+without building any curve again.
+
+Securities are represented as:
+- treasure bonds: their coupons and principal (see model.pricing), on the VNA
+  for indexed bonds, at the last published rate
+- bank bonds: the projected cash flow at maturity, at the risk-free rate plus
+  the g-spread (or at the rate implied by the value, if marked to the curve),
+  with the cash flows of CDI and IPCA bonds projected again under shocks
+- debentures: a single payment at maturity, at the debenture rate, matching
+  the marked value (amortization schedules are not available)
+
+Rates follow the business/252 convention, so time is measured in business
+years, and yields of inflation indexed bonds are real yields.
+"""
+
+from collections import namedtuple
+from collections.abc import Callable, Iterable, Mapping
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from utils.calendars import get_calendar
+
+from .category import PublicDebtCategories
+from .curves import Curve
+from .fixedincome import business_days
+from .pricing import KINDS, TreasurePricer, coupon_flows, parse_bond, payment_dates
+from .security import (
+    BankBond,
+    BankBondCDI,
+    BankBondIPCA,
+    Debenture,
+    DebtSecurity,
+    TreasureBond,
+)
+
+# A curve shock is a rate bump (0.0001 for 1 bp), either the same for all
+# tenors, a function of the tenors (in business years) or an array with one
+# bump for each cash flow of the book
+type Shock = float | Callable[[np.ndarray], np.ndarray] | np.ndarray
+
+# Curve driving the yield of each position: "di_pre" for nominal yields,
+# "di_ipca" for real yields and None for bonds not moved by the curves (LFT
+# and bank bonds marked to the curve).  The
+# cash flows of CDI and IPCA bank bonds are projected with a curve as well:
+# a projected rate which moves by a scale of the curve shock at maturity.
+Position = namedtuple(
+    "Position",
+    ["name", "category", "subcategory", "quantity", "curve", "projection"],
+)
+Projection = namedtuple("Projection", ["curve", "rate", "scale"])
+
+MEASURES = ["value", "yield", "macaulay", "modified", "convexity", "dv01"]
+
+
+def _curve_code(security: DebtSecurity) -> str | None:
+    if isinstance(security, BankBond):
+        return "di_pre" if security.mark_to_market else None
+    if security.subcategory == PublicDebtCategories.Floating:
+        return None
+    if isinstance(security, Debenture) or (
+        isinstance(security, TreasureBond)
+        and security.subcategory == PublicDebtCategories.Inflation
+    ):
+        return "di_ipca"
+    return "di_pre"
+
+
+def _concatenate(arrays: list[np.ndarray], dtype) -> np.ndarray:
+    return np.concatenate(arrays) if arrays else np.zeros(0, dtype)
+
+
+class DebtBook:
+    def __init__(
+        self,
+        items: Iterable[tuple[DebtSecurity, float]],
+        day: str | date,
+        pricer: TreasurePricer | None = None,
+    ):
+        """
+        Lay out the cash flows, on a day, of (security, quantity) items, such
+        as the items of a portfolio.  Other and expired securities are skipped.
+        """
+        if isinstance(day, str):
+            day = datetime.strptime(day, "%Y-%m-%d").date()
+        self.day: date = date(day.year, day.month, day.day)
+        self.pricer: TreasurePricer = pricer if pricer is not None else TreasurePricer()
+        # Curves shared by all bank bonds
+        self._curves: dict[tuple[str, date], Curve] = {}
+
+        self.positions: list[Position] = []
+        yields, positions, days, dates, amounts = [], [], [], [], []
+        for security, quantity in items:
+            if not isinstance(security, DebtSecurity) or security.is_expired():
+                continue
+            flow_days, flow_dates, flow_amounts, rate = self._cash_flows(security)
+            positions.append(np.full(len(flow_days), len(self.positions)))
+            days.append(flow_days)
+            dates.append(flow_dates)
+            amounts.append(flow_amounts)
+            yields.append(rate)
+            self.positions.append(
+                Position(
+                    security.name,
+                    security.category,
+                    security.subcategory,
+                    float(quantity),
+                    _curve_code(security),
+                    self._projection(security),
+                )
+            )
+
+        self.yields: np.ndarray = np.array(yields, np.float64)
+        self.quantities: np.ndarray = np.array(
+            [p.quantity for p in self.positions], np.float64
+        )
+        self._set_flows(positions, days, dates, amounts)
+
+    @property
+    def curves(self) -> list[str]:
+        """Return the curves driving the yields or the cash flows of the book."""
+        codes = {p.curve for p in self.positions}
+        codes |= {p.projection.curve for p in self.positions if p.projection}
+        return sorted(code for code in codes if code is not None)
+
+    @classmethod
+    def from_portfolio(cls, portfolio, day: str | date | None = None):
+        return cls(portfolio.securities.values(), day or portfolio.at_day)
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    ##############
+    # Cash flows #
+    ##############
+
+    def _set_flows(
+        self,
+        positions: list[np.ndarray],
+        days: list[np.ndarray],
+        dates: list[np.ndarray],
+        amounts: list[np.ndarray],
+    ) -> None:
+        """
+        Lay out the cash flows of all positions in flat arrays, with the
+        curve and the projection of the position of each flow.
+        """
+        self.flow_positions: np.ndarray = _concatenate(positions, np.int64)
+        self.flow_days: np.ndarray = _concatenate(days, np.int64)
+        self.flow_dates: np.ndarray = _concatenate(dates, "datetime64[D]")
+        self.flow_amounts: np.ndarray = _concatenate(amounts, np.float64)
+        self.flow_years: np.ndarray = self.flow_days / 252.0
+        self.flow_curves: np.ndarray = np.array(
+            [p.curve for p in self.positions], dtype=object
+        )[self.flow_positions]
+        projections = [
+            p.projection or Projection(None, 0.0, 0.0) for p in self.positions
+        ]
+        self.flow_projections: np.ndarray = np.array(
+            [p.curve for p in projections], dtype=object
+        )[self.flow_positions]
+        self.flow_projection_rates: np.ndarray = np.array(
+            [p.rate for p in projections], np.float64
+        )[self.flow_positions]
+        self.flow_projection_scales: np.ndarray = np.array(
+            [p.scale for p in projections], np.float64
+        )[self.flow_positions]
+
+    def _curve(self, code: str, day: date) -> Curve:
+        curve = self._curves.get((code, day))
+        if curve is None:
+            curve = Curve(code, day)
+            self._curves[(code, day)] = curve
+        return curve
+
+    def _cash_flows(
+        self, security: DebtSecurity
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, float]:
+        """
+        Return the business days to each payment, the payment dates, the
+        amounts and the yield.
+        """
+        if isinstance(security, TreasureBond):
+            return self._treasure_cash_flows(security)
+
+        days = get_calendar("ANBIMA").bizdays(self.day, security.maturity)
+        if isinstance(security, BankBond):
+            cash_flow = security.compute_cash_flow_at_maturity(self.day)
+            if days == 0:
+                rate = 0.0
+            elif security.mark_to_market:
+                pre_curve = self._curve("di_pre", security.curve_date(self.day))
+                rate = security.get_discount_rate(self.day, pre_curve)
+            else:
+                value = security.get_value(self.day)
+                rate = (cash_flow / value) ** (252.0 / days) - 1.0
+        elif isinstance(security, Debenture):
+            rate = security.rate.rate
+            cash_flow = security.get_value(self.day) * (1.0 + rate) ** (days / 252.0)
+        else:
+            raise Exception("Unsupported debt security: %s" % security.name)
+        maturity = np.array([security.maturity], "datetime64[D]")
+        return np.array([days]), maturity, np.array([cash_flow]), rate
+
+    def _projection(self, security: DebtSecurity) -> Projection | None:
+        # Projected rates of bank bonds, as in compute_cash_flow_at_maturity
+        if not isinstance(security, BankBond) or not security.mark_to_market:
+            return None
+        if isinstance(security, BankBondCDI):
+            pre_curve = self._curve("di_pre", security.curve_date(self.day))
+            percent = security.rate.percent
+            return Projection(
+                "di_pre", pre_curve.get_rate(security.maturity) * percent, percent
+            )
+        if isinstance(security, BankBondIPCA):
+            real_curve = self._curve("di_ipca", security.curve_date(self.day))
+            real_rate = real_curve.get_rate(security.maturity)
+            scale = 1.0 + security.rate.rate
+            return Projection("di_ipca", scale * (1.0 + real_rate) - 1.0, scale)
+        return None
+
+    def _treasure_cash_flows(self, security: TreasureBond):
+        name = security.name
+        kind, maturity = parse_bond(name)
+        payments = payment_dates(kind, maturity, self.day)
+        amounts = coupon_flows(kind, payments)
+        if KINDS[kind].indexer is not None:
+            day = np.array([self.day], "datetime64[D]")
+            amounts *= self.pricer.vna(name, day)[0] / 100.0
+
+        quotes = self.pricer.treasure_retriever.data[name]["Taxa_Compra_Manha"]
+        quotes = quotes.dropna()
+        rate = quotes.asof(pd.Timestamp(self.day))
+        assert not np.isnan(rate), "No rate of %s on %s" % (name, self.day)
+        days = business_days(self.day, payments)
+        return days, payments, amounts, rate / 100.0
+
+    #############
+    # Valuation #
+    #############
+
+    def flow_bumps(self, shock: Shock) -> np.ndarray:
+        """Return the rate bump of a shock for each cash flow."""
+        if callable(shock):
+            return shock(self.flow_years)
+        return np.broadcast_to(np.asarray(shock, np.float64), self.flow_years.shape)
+
+    def flow_yields(self, shocks: Mapping[str, Shock] | None = None) -> np.ndarray:
+        """
+        Return the yield of each cash flow, with the shocks of each curve
+        applied to the positions driven by the curve.
+        """
+        rates = self.yields[self.flow_positions]
+        for code, shock in (shocks or {}).items():
+            mask = self.flow_curves == code
+            rates[mask] += self.flow_bumps(shock)[mask]
+        return rates
+
+    def flow_growths(self, shocks: Mapping[str, Shock] | None = None) -> np.ndarray:
+        """
+        Return the change of each projected cash flow under the shocks of the
+        curves it is projected with.
+        """
+        growths = np.ones(len(self.flow_years))
+        for code, shock in (shocks or {}).items():
+            mask = self.flow_projections == code
+            rates = self.flow_projection_rates[mask]
+            bumps = self.flow_bumps(shock)[mask] * self.flow_projection_scales[mask]
+            years = self.flow_years[mask]
+            growths[mask] = ((1.0 + rates + bumps) / (1.0 + rates)) ** years
+        return growths
+
+    def _sum(self, flow_values: np.ndarray) -> np.ndarray:
+        return np.bincount(
+            self.flow_positions, weights=flow_values, minlength=len(self.positions)
+        )
+
+    def unit_values(self, shocks: Mapping[str, Shock] | None = None) -> np.ndarray:
+        """Return the value of one unit of each position."""
+        rates = self.flow_yields(shocks)
+        amounts = self.flow_amounts * self.flow_growths(shocks)
+        return self._sum(amounts * (1.0 + rates) ** -self.flow_years)
+
+    def values(self, shocks: Mapping[str, Shock] | None = None) -> np.ndarray:
+        """Return the value of each position (unit value times quantity)."""
+        return self.unit_values(shocks) * self.quantities
+
+    def pnl(self, shocks: Mapping[str, Shock]) -> np.ndarray:
+        """Return the change of value of each position under the shocks."""
+        return self.values(shocks) - self.values()
+
+    ############
+    # Measures #
+    ############
+
+    def measures(self) -> pd.DataFrame:
+        """
+        Return the value, yield, Macaulay and modified durations (in business
+        years), convexity and DV01 (value change for 1 bp) of each position.
+        """
+        years = self.flow_years
+        present_values = (
+            self.flow_amounts * (1.0 + self.yields[self.flow_positions]) ** -years
+        )
+        unit_values = self._sum(present_values)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            macaulay = self._sum(years * present_values) / unit_values
+            convexity = self._sum(years * (years + 1.0) * present_values) / (
+                unit_values * (1.0 + self.yields) ** 2
+            )
+        modified = macaulay / (1.0 + self.yields)
+        values = unit_values * self.quantities
+
+        df = pd.DataFrame(
+            {
+                "category": [p.category for p in self.positions],
+                "subcategory": [p.subcategory for p in self.positions],
+                "quantity": self.quantities,
+                "value": values,
+                "yield": self.yields,
+                "macaulay": macaulay,
+                "modified": modified,
+                "convexity": convexity,
+                "dv01": modified * values * 0.0001,
+            },
+            index=pd.Index([p.name for p in self.positions], name="name"),
+        )
+        return df
+
+    def aggregate(self) -> pd.DataFrame:
+        """
+        Return the measures by category and subcategory (PublicDebtCategories
+        and PrivateDebtCategories): sums of values and DV01s, and durations,
+        convexities and yields weighted by value.
+        """
+        df = self.measures()
+        weighted = ["yield", "macaulay", "modified", "convexity"]
+        df[weighted] = df[weighted].mul(df["value"], axis=0)
+        groups = df.groupby(["category", "subcategory"], sort=False)[
+            ["value", "dv01"] + weighted
+        ].sum()
+        # Subcategories of different categories are different enums
+        groups = groups.sort_index(key=lambda index: index.map(lambda c: c.value))
+        groups[weighted] = groups[weighted].div(groups["value"], axis=0)
+        return groups[MEASURES]
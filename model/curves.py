@@ -1,23 +1,59 @@
+from collections.abc import Iterable
 from datetime import date, datetime
 
+import numpy as np
 import pandas as pd
-import QuantLib as ql
 
 import retriever
 
+from .fixedincome import business_days
+from .nss import NSSFit, fit_nss, get_curve_fits, nss_rates, vertex_years
+
 # Reference: https://www.wilsonfreitas.net/posts/2023-07-26-quantlib-zerocurve/main
 
 
 class Curve:
-    def __init__(self, code: str, base_date: str | date):
+    def __init__(
+        self,
+        code: str,
+        base_date: str | date,
+        vertices: pd.DataFrame | None = None,
+        fitted: bool = False,
+    ):
+        """
+        Build the curve from its vertices (forward_date and rate columns),
+        which are read from the curve retriever if not given (e.g. when the
+        vertices are shocked).
+
+        If fitted is set, rates come from the NSS fit of the curve instead
+        (see model.nss), read from the cache of fits unless vertices are given,
+        and no QuantLib curve is built.
+        """
         if isinstance(base_date, str):
             base_date = datetime.strptime(base_date, "%Y-%m-%d").date()
         assert isinstance(base_date, date)
+
         self.code = code
         self.base_date = base_date
+        self.fit: NSSFit | None = None
 
-        curve_retriever = retriever.get_curve_retriever()
-        df: pd.DataFrame = curve_retriever.get_curve_vertices(self.code, self.base_date)
+        if fitted:
+            if vertices is None:
+                self.fit = get_curve_fits().get_fit(self.code, self.base_date)
+            else:
+                years = vertex_years(self.base_date, vertices)
+                self.fit = fit_nss(years, vertices["rate"])
+            self.vertices = vertices
+            return
+
+        # QuantLib takes a noticeable time to import, so it is only loaded when needed
+        import QuantLib as ql
+
+        if vertices is None:
+            curve_retriever = retriever.get_curve_retriever()
+            vertices = curve_retriever.get_curve_vertices(self.code, self.base_date)
+        df: pd.DataFrame = vertices
+        self.vertices: pd.DataFrame = df
 
         dates = list(df["forward_date"].map(lambda d: ql.Date().from_date(d)))
         rates = list(df["rate"])
@@ -57,7 +93,16 @@ class Curve:
             interpolator,
         )
 
+    def _years(self, forward_dates) -> np.ndarray:
+        dates = np.asarray(forward_dates, "datetime64[D]")
+        return business_days(self.base_date, dates) / 252.0
+
     def get_rate(self, forward_date: str | date) -> float:
+        if self.fit is not None:
+            return float(nss_rates(self.fit, self._years(forward_date)))
+
+        import QuantLib as ql
+
         if isinstance(forward_date, str):
             d = ql.Date(forward_date, "%Y-%m-%d")
         elif isinstance(forward_date, date):
@@ -67,5 +112,29 @@ class Curve:
         r = self.ql_curve.zeroRate(d, self.day_counter, self.compounding)
         return r.rate()
 
+    def get_rates(self, forward_dates: Iterable[str | date]) -> np.ndarray:
+        """
+        Return the rates to many forward dates, with dates after the last
+        vertex taking the rate of the last vertex (unless the curve is fitted).
+        """
+        days = np.asarray(list(forward_dates), "datetime64[D]")
+        if self.fit is not None:
+            return nss_rates(self.fit, self._years(days))
+
+        import QuantLib as ql
+
+        last_day = np.datetime64(self.ql_curve.maxDate().to_date(), "D")
+        days = np.minimum(days, last_day)
+        unique_days, inverse = np.unique(days, return_inverse=True)
+        rates = np.array(
+            [
+                self.ql_curve.zeroRate(
+                    ql.Date().from_date(day.item()), self.day_counter, self.compounding
+                ).rate()
+                for day in unique_days
+            ]
+        )
+        return rates[inverse]
+
     def __repr__(self):
         return f"Curve(code={self.code!r}, base_date={self.base_date:%Y-%m-%d})"
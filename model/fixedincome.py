@@ -6,8 +6,11 @@ from datetime import date, datetime
 from math import exp, pow
 from typing import Callable, override
 
+import numpy as np
 from bizdays import Calendar  # pyright: ignore[reportMissingTypeStubs]
 
+from utils.calendars import get_calendar
+
 
 class Frequency:
     # Frequency to time unit mapping
@@ -435,9 +438,7 @@ def ir(ir_spec: str) -> InterestRate:
         elif tok in Frequency.names:
             frequency = Frequency(tok)
         elif tok.startswith("cal"):
-            calendar = Calendar.load(  # pyright: ignore[reportUnknownMemberType]
-                name=tok.replace("cal", "")
-            )
+            calendar = get_calendar(tok.replace("cal", ""))
 
     assert rate is not None
     assert frequency is not None
@@ -447,9 +448,6 @@ def ir(ir_spec: str) -> InterestRate:
     return InterestRate(rate, frequency, compounding, day_count, calendar)
 
 
-ANBIMA_CAL = Calendar.load("ANBIMA")
-
-
 def ir_over(rate: float) -> InterestRate:
     """Return an InterestRate object for a given interest rate with the Brazilian Over convention."""
     return InterestRate(
@@ -457,7 +455,7 @@ def ir_over(rate: float) -> InterestRate:
         frequency=Frequency("annual"),
         compounding=Compounding("exponential"),
         day_count=DayCount("business/252"),
-        calendar=ANBIMA_CAL,
+        calendar=get_calendar("ANBIMA"),
     )
 
 
@@ -515,3 +513,49 @@ def period(pspec: str) -> GenericPeriod:
         assert m is not None
         g = m.groups()
         return FixedTimePeriod(float(g[0] + (g[1] or ".0")), g[2])
+
+
+##############
+# Vectorized #
+##############
+
+_busday_calendars: dict[str, np.busdaycalendar] = {}
+
+
+def busday_calendar(calendar_name: str) -> np.busdaycalendar:
+    """Return the numpy business day calendar of a bizdays calendar."""
+    busdaycal = _busday_calendars.get(calendar_name)
+    if busdaycal is None:
+        calendar = get_calendar(calendar_name)
+        weekmask = [
+            day not in calendar.weekdays
+            for day in ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday")
+            + ("Saturday", "Sunday")
+        ]
+        busdaycal = np.busdaycalendar(
+            weekmask=weekmask, holidays=np.array(calendar.holidays, "datetime64[D]")
+        )
+        _busday_calendars[calendar_name] = busdaycal
+    return busdaycal
+
+
+def business_days(begin_dates, end_dates, calendar_name: str = "ANBIMA") -> np.ndarray:
+    """
+    Return the number of business days from each begin date (inclusive) to
+    each end date (exclusive), as counted to the payment dates of bonds.
+    Unlike Calendar.bizdays, an end date which is not a business day (such as
+    a maturity on January 1st) is not moved back to the previous business day.
+    """
+    return np.busday_count(
+        np.asarray(begin_dates, "datetime64[D]"),
+        np.asarray(end_dates, "datetime64[D]"),
+        busdaycal=busday_calendar(calendar_name),
+    )
+
+
+def discount_over(rates, days) -> np.ndarray:
+    """
+    Return the discount factors of annual rates over numbers of business
+    days, with the Brazilian Over convention (see ir_over).
+    """
+    return np.power(1.0 + np.asarray(rates, np.float64), -np.asarray(days) / 252.0)
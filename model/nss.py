@@ -0,0 +1,300 @@
+"""
+Nelson-Siegel-Svensson fits of the B3 curves.
+
+The zero rate to a tenor of t business years (business/252, annual
+compounding, as the vertices of the B3 curves) is
+
+    r(t) = b0 + b1 f1(t/l1) + b2 f2(t/l1) + b3 f2(t/l2)
+
+with f1(x) = (1 - exp(-x)) / x and f2(x) = f1(x) - exp(-x).  For given decays
+l1 and l2, fitting the betas is a linear least squares problem: the decays
+are chosen on a log-spaced grid and then on a finer grid around the best
+pair, solving the least squares problems of all pairs at once.
+
+Fits are computed once per curve and reference date and kept, along with
+their errors against the vertices, in a small cache next to the curve files
+(see CurveFits), so that rates and discount factors of arrays of tenors are
+evaluated in closed form without reading or interpolating vertices.
+"""
+
+import atexit
+import logging
+import os
+import threading
+from collections import namedtuple
+from collections.abc import Iterable
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+import retriever
+from utils.instrumentation import increment, span
+
+from .fixedincome import business_days
+
+logger = logging.getLogger(__name__)
+
+# Parameters and fit errors (root mean square and maximum absolute errors of
+# the rates at the vertices, and number of vertices)
+NSSFit = namedtuple(
+    "NSSFit", ["b0", "b1", "b2", "b3", "l1", "l2", "rmse", "max_error", "vertices"]
+)
+
+DECAYS = np.geomspace(0.05, 20.0, 25)
+REFINEMENT = np.geomspace(0.8, 1.25, 9)
+
+
+def nss_loadings(years: np.ndarray, l1: np.ndarray, l2: np.ndarray) -> np.ndarray:
+    """Return the loadings of the betas, with a last axis of size 4."""
+    years = np.asarray(years, np.float64)
+    x1 = np.maximum(years / l1, 1e-12)
+    x2 = np.maximum(years / l2, 1e-12)
+    f1 = -np.expm1(-x1) / x1
+    return np.stack(
+        [
+            np.ones_like(x1),
+            f1,
+            f1 - np.exp(-x1),
+            -np.expm1(-x2) / x2 - np.exp(-x2),
+        ],
+        axis=-1,
+    )
+
+
+def nss_rates(fit: NSSFit, years: np.ndarray) -> np.ndarray:
+    """Return the rates to tenors in business years."""
+    betas = np.array([fit.b0, fit.b1, fit.b2, fit.b3])
+    return nss_loadings(years, fit.l1, fit.l2) @ betas
+
+
+def nss_discounts(fit: NSSFit, years: np.ndarray) -> np.ndarray:
+    """Return the discount factors to tenors in business years."""
+    years = np.asarray(years, np.float64)
+    return np.power(1.0 + nss_rates(fit, years), -years)
+
+
+def _least_squares(
+    years: np.ndarray, rates: np.ndarray, l1: np.ndarray, l2: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    # Betas and sums of squared errors for each pair of decays
+    loadings = nss_loadings(years[None, :], l1[:, None], l2[:, None])
+    gram = np.einsum("pni,pnj->pij", loadings, loadings)
+    gram += 1e-12 * np.eye(4)
+    betas = np.linalg.solve(gram, np.einsum("pni,n->pi", loadings, rates)[..., None])
+    residuals = np.einsum("pni,pi->pn", loadings, betas[..., 0]) - rates
+    return betas[..., 0], (residuals**2).sum(axis=1)
+
+
+def fit_nss(years: np.ndarray, rates: np.ndarray) -> NSSFit:
+    """Fit the NSS parameters to the rates of a curve at tenors in business years."""
+    years = np.asarray(years, np.float64)
+    rates = np.asarray(rates, np.float64)
+    assert len(years) == len(rates) and len(years) > 0
+
+    l1, l2 = (g.ravel() for g in np.meshgrid(DECAYS, DECAYS, indexing="ij"))
+    keep = l1 < l2
+    l1, l2 = l1[keep], l2[keep]
+    betas, errors = _least_squares(years, rates, l1, l2)
+    best = np.argmin(errors)
+
+    l1, l2 = (
+        g.ravel()
+        for g in np.meshgrid(
+            l1[best] * REFINEMENT, l2[best] * REFINEMENT, indexing="ij"
+        )
+    )
+    betas, errors = _least_squares(years, rates, l1, l2)
+    best = np.argmin(errors)
+
+    fit = NSSFit(
+        *betas[best].tolist(), float(l1[best]), float(l2[best]), 0.0, 0.0, len(years)
+    )
+    errors = nss_rates(fit, years) - rates
+    return fit._replace(
+        rmse=float(np.sqrt(np.mean(errors**2))),
+        max_error=float(np.abs(errors).max()),
+    )
+
+
+def vertex_years(base_date: date, vertices: pd.DataFrame) -> np.ndarray:
+    """Return the tenors of the vertices of a curve in business years."""
+    dates = vertices["forward_date"].to_numpy().astype("datetime64[D]")
+    return business_days(base_date, dates) / 252.0
+
+
+class CurveFits:
+    """
+    NSS fits of the curves of a curve retriever, for each reference date.
+
+    Fits are kept in fits/<curve>.feather files in the data directory of the
+    retriever, one row per reference date, and only missing reference dates
+    are fitted.  Each fit keeps the load time of the retriever data it was
+    fitted to, and is fitted again once the retriever has loaded a newer
+    curve file of its year (e.g. after a refresh).  New fits are written in
+    batches (see flush).
+    """
+
+    # Number of new fits of a curve after which get_fit writes its file
+    SAVE_BATCH = 64
+
+    def __init__(self, curve_retriever=None):
+        if curve_retriever is None:
+            curve_retriever = retriever.get_curve_retriever()
+        self.curve_retriever = curve_retriever
+        self.directory: str = os.path.join(curve_retriever.data_directory, "fits")
+        self._fits: dict[str, dict[date, NSSFit]] = {}
+        # Retriever load time of each fit, and number of fits not yet written
+        self._loaded_at: dict[str, dict[date, float]] = {}
+        self._unsaved: dict[str, int] = {}
+        # Modification times of the curve files, as of the retriever load time
+        self._file_times: dict[tuple[str, int], float] = {}
+        self._file_times_loaded_at: float | None = None
+        self._lock = threading.Lock()
+
+    def _file_name(self, code: str) -> str:
+        return os.path.join(self.directory, code + ".feather")
+
+    def _load(self, code: str) -> dict[date, NSSFit]:
+        fits = self._fits.get(code)
+        if fits is None:
+            fits = {}
+            loaded_at = {}
+            file_name = self._file_name(code)
+            if os.path.isfile(file_name):
+                logger.info("Loading file %s...", file_name)
+                df = pd.read_feather(file_name)
+                if "loaded_at" not in df:
+                    df["loaded_at"] = 0.0
+                for row in df.itertuples(index=False):
+                    base_date = row.refdate.date()
+                    fits[base_date] = NSSFit(*(getattr(row, f) for f in NSSFit._fields))
+                    loaded_at[base_date] = row.loaded_at
+            self._fits[code] = fits
+            self._loaded_at[code] = loaded_at
+            self._unsaved[code] = 0
+        return fits
+
+    def _save(self, code: str) -> None:
+        fits = self._fits[code]
+        df = pd.DataFrame(list(fits.values()), columns=NSSFit._fields)
+        df.insert(0, "refdate", pd.to_datetime(list(fits.keys())))
+        df["loaded_at"] = [self._loaded_at[code][d] for d in fits]
+        df = df.sort_values("refdate", ignore_index=True)
+
+        os.makedirs(self.directory, exist_ok=True)
+        file_name = self._file_name(code)
+        df.to_feather(file_name + ".part")
+        os.replace(file_name + ".part", file_name)
+        self._unsaved[code] = 0
+
+    def _file_time(self, code: str, year: int) -> float:
+        loaded_at = self.curve_retriever.loaded_at
+        if loaded_at != self._file_times_loaded_at:
+            self._file_times = {}
+            self._file_times_loaded_at = loaded_at
+        key = (code, year)
+        if key not in self._file_times:
+            file_name = os.path.join(
+                self.curve_retriever.data_directory, "yc_%s_%d.csv" % key
+            )
+            exists = os.path.isfile(file_name)
+            self._file_times[key] = os.path.getmtime(file_name) if exists else 0.0
+        return self._file_times[key]
+
+    def _is_current(self, code: str, base_date: date) -> bool:
+        # Fits of the loaded data are current, and fits of data loaded before
+        # are as long as the curve file has not changed since
+        loaded_at = self._loaded_at[code].get(base_date)
+        if loaded_at is None:
+            return False
+        if loaded_at == self.curve_retriever.loaded_at:
+            return True
+        return loaded_at >= self._file_time(code, base_date.year)
+
+    def _fit(self, code: str, base_date: date) -> NSSFit:
+        vertices = self.curve_retriever.get_curve_vertices(code, base_date)
+        increment("curves_fitted", asset="curves")
+        fit = fit_nss(vertex_years(base_date, vertices), vertices["rate"])
+        self._fits[code][base_date] = fit
+        self._loaded_at[code][base_date] = self.curve_retriever.loaded_at
+        self._unsaved[code] += 1
+        return fit
+
+    def get_fit(self, code: str, base_date: str | date) -> NSSFit:
+        if isinstance(base_date, str):
+            base_date = datetime.strptime(base_date, "%Y-%m-%d").date()
+        base_date = date(base_date.year, base_date.month, base_date.day)
+        with self._lock:
+            fits = self._load(code)
+            if self._is_current(code, base_date):
+                return fits[base_date]
+            fit = self._fit(code, base_date)
+            if self._unsaved[code] >= self.SAVE_BATCH:
+                self._save(code)
+        return fit
+
+    def fit_all(
+        self, code: str, base_dates: Iterable[date] | None = None, refit: bool = False
+    ) -> pd.DataFrame:
+        """
+        Fit the curve on the reference dates (all of them by default), write
+        the fits, and return them (see diagnostics).
+        """
+        if base_dates is None:
+            refdates = self.curve_retriever.data[code]["refdate"].unique()
+            base_dates = [pd.Timestamp(d).date() for d in refdates]
+        with self._lock:
+            self._load(code)
+            missing = [d for d in base_dates if refit or not self._is_current(code, d)]
+            if missing:
+                with span("fit", asset="curves"):
+                    for base_date in missing:
+                        self._fit(code, base_date)
+            if self._unsaved[code]:
+                self._save(code)
+        return self.diagnostics(code)
+
+    def flush(self) -> None:
+        """Write the fits not yet written."""
+        with self._lock:
+            for code, unsaved in self._unsaved.items():
+                if unsaved:
+                    self._save(code)
+
+    def diagnostics(self, code: str) -> pd.DataFrame:
+        """
+        Return the parameters and errors of the fits of a curve, along with
+        the load time of the retriever data they were fitted to, by reference
+        date.
+        """
+        with self._lock:
+            fits = self._load(code)
+            df = pd.DataFrame(list(fits.values()), columns=NSSFit._fields)
+            df["loaded_at"] = [self._loaded_at[code][d] for d in fits]
+            df.index = pd.DatetimeIndex(list(fits.keys()), name="refdate")
+        return df.sort_index()
+
+
+_curve_fits: CurveFits | None = None
+
+
+def get_curve_fits() -> CurveFits:
+    """
+    Return the fits of the curves of the registered curve retriever, whose
+    new fits are written when the retriever changes or at exit.
+    """
+    global _curve_fits
+    curve_retriever = retriever.get_curve_retriever()
+    if _curve_fits is None or _curve_fits.curve_retriever is not curve_retriever:
+        if _curve_fits is None:
+            atexit.register(_flush_curve_fits)
+        else:
+            _curve_fits.flush()
+        _curve_fits = CurveFits(curve_retriever)
+    return _curve_fits
+
+
+def _flush_curve_fits() -> None:
+    if _curve_fits is not None:
+        _curve_fits.flush()
@@ -176,6 +176,28 @@ class Portfolio:
             )
         print("       TOTAL: $ {:11,.2f}".format(self.portfolio_value))
 
+    def get_price_panel(
+        self,
+        start: str | date,
+        end: str | date,
+        calendar: str | None = None,
+        max_age: int | None = None,
+        cache_directory: str | None = None,
+    ) -> pd.DataFrame:
+        """
+        Return the prices of the quoted securities (stocks, funds, treasure
+        bonds and debentures) from start to end (see retriever.PricePanel).
+        """
+        from retriever import PricePanel
+
+        panel = PricePanel(cache_directory=cache_directory)
+        sources = {}
+        for name, item in sorted(self.securities.items()):
+            source = panel.source_of(item.sec.retriever)
+            if source is not None:
+                sources[name] = source
+        return panel.build(list(sources), start, end, calendar, max_age, sources)
+
     def get_allocation(self):
         allocations = [
             (x[0], x[1] / self.portfolio_value) for x in self.categories_values.items()
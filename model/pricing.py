@@ -0,0 +1,194 @@
+"""
+Vectorized pricing of Tesouro Direto bonds from their rates.
+
+The cash flows of a bond (the semiannual coupons of NTN-F and NTN-B, and the
+principal) are discounted by its rate over the business days to each payment,
+with the business/252 convention (see model.fixedincome).  Bonds indexed to
+SELIC (LFT) and to IPCA (NTN-B and NTN-B Principal) are priced on their
+updated face value (VNA), which is implied by the last published quote of
+the bond and projected to the pricing day with the daily SELIC and IPCA
+series of the BCB retriever.
+"""
+
+from collections import namedtuple
+from collections.abc import Iterable
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from .fixedincome import business_days, discount_over
+
+# Face value, annual coupon rate (paid semiannually) and indexer of each kind
+# of bond.  Indexed bonds are priced in percent of their VNA.
+BondKind = namedtuple("BondKind", ["face", "coupon", "indexer"])
+
+KINDS = {
+    "LTN": BondKind(1000.0, 0.0, None),
+    "NTN-F": BondKind(1000.0, 0.10, None),
+    "LFT": BondKind(100.0, 0.0, "SELIC"),
+    "NTN-B": BondKind(100.0, 0.06, "IPCA"),
+    "NTN-B_Principal": BondKind(100.0, 0.0, "IPCA"),
+}
+
+
+def parse_bond(name: str) -> tuple[str, date]:
+    """Return the kind and the maturity of a bond (e.g. NTN-B_150535)."""
+    kind, maturity = name.rsplit("_", 1)
+    assert kind in KINDS, "Bond not supported: %s" % name
+    day = datetime.strptime(maturity, "%d%m%y").date()
+    if day.year < 2000:
+        day = day.replace(year=day.year + 100)
+    return kind, day
+
+
+def payment_dates(kind: str, maturity: date, first_day: date) -> np.ndarray:
+    """
+    Return the payment dates of a bond after first_day: its coupon dates,
+    every six months back from maturity, and the maturity itself.
+    """
+    dates = [maturity]
+    if KINDS[kind].coupon > 0.0:
+        months = maturity.year * 12 + maturity.month - 1
+        while True:
+            months -= 6
+            day = date(months // 12, months % 12 + 1, maturity.day)
+            if day <= first_day:
+                break
+            dates.append(day)
+    return np.array(sorted(dates), dtype="datetime64[D]")
+
+
+def coupon_flows(kind: str, payments: np.ndarray) -> np.ndarray:
+    """Return the amounts paid on the payment dates of a bond (per face value)."""
+    face, coupon, _ = KINDS[kind]
+    flows = np.full(len(payments), face * (np.sqrt(1.0 + coupon) - 1.0))
+    flows[-1] += face
+    return flows
+
+
+def present_values(
+    kind: str, payments: np.ndarray, days: np.ndarray, rates: np.ndarray
+) -> np.ndarray:
+    """
+    Return the present value, on each day and at each rate, of the payments
+    of a bond still due (after the day).
+    """
+    flows = coupon_flows(kind, payments)
+
+    du = business_days(days[:, None], payments[None, :])
+    factors = discount_over(rates[:, None], du)
+    due = payments[None, :] > days[:, None]
+    return np.where(due, flows * factors, 0.0).sum(axis=1)
+
+
+def _to_days(days: Iterable[str | date]) -> np.ndarray:
+    return pd.to_datetime(list(days)).values.astype("datetime64[D]")
+
+
+class TreasurePricer:
+    def __init__(self, treasure_retriever=None, bcb_retriever=None):
+        self._treasure_retriever = treasure_retriever
+        self._bcb_retriever = bcb_retriever
+        # Business days and cumulative factors of each BCB series
+        self._levels: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+
+    @property
+    def treasure_retriever(self):
+        if self._treasure_retriever is None:
+            import retriever
+
+            self._treasure_retriever = retriever.get_directtreasure_retriever()
+        return self._treasure_retriever
+
+    @property
+    def bcb_retriever(self):
+        if self._bcb_retriever is None:
+            import retriever
+
+            self._bcb_retriever = retriever.get_bcb_retriever()
+        return self._bcb_retriever
+
+    def price(
+        self,
+        names: Iterable[str],
+        days: Iterable[str | date],
+        rates: Iterable[float] | float,
+    ) -> np.ndarray:
+        """
+        Return the price of each (bond, day, rate) triple, with rates as
+        fractions (0.1 for 10%) and the same rate for all if a single one is
+        given.  Triples are priced at once for each bond.
+        """
+        names = np.asarray(list(names), dtype=object)
+        days = _to_days(days)
+        assert len(days) == len(names)
+        rates = np.broadcast_to(np.asarray(rates, np.float64), names.shape)
+
+        prices = np.full(len(names), np.nan)
+        codes, bonds = pd.factorize(names)
+        for i, name in enumerate(bonds):
+            rows = np.flatnonzero(codes == i)
+            prices[rows] = self._price_bond(name, days[rows], rates[rows])
+        return prices
+
+    def _price_bond(self, name: str, days: np.ndarray, rates: np.ndarray):
+        kind, maturity = parse_bond(name)
+        first_day = pd.Timestamp(days.min()).date()
+        payments = payment_dates(kind, maturity, first_day)
+        values = present_values(kind, payments, days, rates)
+        if KINDS[kind].indexer is not None:
+            values *= self.vna(name, days) / 100.0
+        return values
+
+    def vna(self, name: str, days: np.ndarray) -> np.ndarray:
+        """
+        Return the updated face value of an indexed bond on each day, implied
+        by the last quote of the bond up to the day (or the first quote) and
+        projected with its index.
+        """
+        kind, maturity = parse_bond(name)
+        quotes = self.treasure_retriever.data[name]
+        quotes = quotes[
+            (quotes["PU_Compra_Manha"] > 0) & quotes["Taxa_Compra_Manha"].notna()
+        ]
+        assert len(quotes) > 0, "No quotes of %s" % name
+        quote_days = quotes.index.values.astype("datetime64[D]")
+
+        position = np.searchsorted(quote_days, days, side="right") - 1
+        anchors, inverse = np.unique(np.maximum(position, 0), return_inverse=True)
+        anchor_days = quote_days[anchors]
+        payments = payment_dates(kind, maturity, pd.Timestamp(anchor_days.min()).date())
+        quotations = present_values(
+            kind,
+            payments,
+            anchor_days,
+            quotes["Taxa_Compra_Manha"].to_numpy(np.float64)[anchors] / 100.0,
+        )
+        anchor_vna = quotes["PU_Compra_Manha"].to_numpy(np.float64)[anchors] / (
+            quotations / 100.0
+        )
+        return anchor_vna[inverse] * self.index_factors(
+            KINDS[kind].indexer, anchor_days[inverse], days
+        )
+
+    def index_factors(
+        self, code: str, begins: np.ndarray, ends: np.ndarray
+    ) -> np.ndarray:
+        """
+        Return the variation factors of a BCB series from each begin day to
+        each end day (the last day not being considered, as in get_variation).
+        """
+        levels = self._levels.get(code)
+        if levels is None:
+            series = self.bcb_retriever.data["bcb"][code].dropna()
+            levels = (
+                series.index.values.astype("datetime64[D]"),
+                np.concatenate([[1.0], np.cumprod(1.0 + series.to_numpy(np.float64))]),
+            )
+            self._levels[code] = levels
+        series_days, cumulative = levels
+        return (
+            cumulative[np.searchsorted(series_days, ends)]
+            / cumulative[np.searchsorted(series_days, begins)]
+        )
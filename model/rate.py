@@ -2,13 +2,10 @@ from abc import ABC, abstractmethod
 from datetime import date, datetime
 from typing import override
 
-from bizdays import Calendar
-
 from model.fixedincome import DateRangePeriod, InterestRate, ir_over
 from retriever import get_bcb_retriever
 from retriever.retriever import VariationRetriever
-
-ANBIMA_CAL = Calendar.load("ANBIMA")
+from utils.calendars import get_calendar
 
 
 class Indexer:
@@ -31,7 +28,7 @@ class Indexer:
         if isinstance(end_date, str):
             end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
 
-        days: int = ANBIMA_CAL.bizdays(begin_date, end_date)
+        days: int = get_calendar("ANBIMA").bizdays(begin_date, end_date)
         assert days >= 0
 
         post_factor = 1.0
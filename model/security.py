@@ -13,11 +13,10 @@ from abc import ABC, abstractmethod
 from datetime import date, datetime, timedelta
 from typing import override
 
-from bizdays import Calendar
-
 import retriever
 from retriever import FundRetriever
 from retriever.retriever import ValueRetriever
+from utils.calendars import get_calendar
 
 from .category import (
     CashCategories,
@@ -30,11 +29,9 @@ from .category import (
 )
 from .curves import Curve
 from .fixedincome import DateRangePeriod, ir_over
+from .pricing import TreasurePricer
 from .rate import BondRate, CDIPercentualRate, FixedRate, IPCARate, SELICRate
 
-print("Loading calendar...")
-CAL = Calendar.load("PMC/BMF")
-
 
 class Security(ABC):
     def __init__(
@@ -258,6 +255,15 @@ class TreasureBond(DebtSecurity, ABC):
             "Tesouro Nacional",
         )
 
+    def price(self, day: str | date, rate: float | None = None) -> float:
+        """
+        Return the price of the bond on a day at a rate (the bond rate by
+        default), whether or not a quote was published on that day.
+        """
+        if rate is None:
+            rate = self.rate.rate
+        return float(TreasurePricer().price([self.name], [day], rate)[0])
+
     @staticmethod
     def create(name: str, rate_value: float):
         if name.startswith("LTN_"):
@@ -379,6 +385,22 @@ class BankBond(DebtSecurity, ABC):
         else:
             return 15.0 / 100
 
+    @staticmethod
+    def curve_date(day: date) -> date:
+        # Curves are published at the end of the day
+        return (
+            day
+            if date.today() > day
+            else get_calendar("PMC/BMF").preceding(day - timedelta(days=1))
+        )
+
+    def get_discount_rate(self, day: date, pre_curve: Curve | None = None) -> float:
+        """Return the risk-free rate to maturity plus the g-spread at emission."""
+        if pre_curve is None:
+            pre_curve = Curve("di_pre", self.curve_date(day))
+        risk_free_rate = pre_curve.get_rate(self.maturity)
+        return risk_free_rate + self.g_spread_at_emission
+
     @override
     def get_value(self, day: str | date) -> float:
         if self.is_expired():
@@ -395,12 +417,7 @@ class BankBond(DebtSecurity, ABC):
             projected_cash_flow = self.compute_cash_flow_at_maturity(day)
 
             # Compute discount rate (risk-free + g-spread)
-            curve_date = (
-                day if date.today() > day else CAL.preceding(day - timedelta(days=1))
-            )
-            pre_curve = Curve("di_pre", curve_date)
-            risk_free_rate = pre_curve.get_rate(self.maturity)
-            discount_rate = risk_free_rate + self.g_spread_at_emission
+            discount_rate = self.get_discount_rate(day)
 
             # Compute discount factor
             ir = ir_over(discount_rate)
@@ -464,11 +481,7 @@ class BankBondCDI(BankBond):
         )
 
         # Get projected risk-free and bond rates
-        curve_date = (
-            reference_day
-            if date.today() > reference_day
-            else CAL.preceding(reference_day - timedelta(days=1))
-        )
+        curve_date = self.curve_date(reference_day)
         pre_curve = Curve("di_pre", curve_date)
         risk_free_rate = pre_curve.get_rate(self.maturity)
         future_bond_rate = risk_free_rate * self.rate.percent
@@ -573,11 +586,7 @@ class BankBondIPCA(BankBond):
         )
 
         # Get projected risk-free and bond rates
-        curve_date = (
-            reference_day
-            if date.today() > reference_day
-            else CAL.preceding(reference_day - timedelta(days=1))
-        )
+        curve_date = self.curve_date(reference_day)
         real_curve = Curve("di_ipca", curve_date)
         real_rate = real_curve.get_rate(self.maturity)
         future_bond_rate = (1.0 + self.rate.rate) * (1.0 + real_rate) - 1.0
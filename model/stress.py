@@ -0,0 +1,245 @@
+"""
+Stress tests of the debt book under curve scenarios.
+
+A scenario shocks the vertices of the B3 curves (di_pre and di_ipca): parallel
+shifts, twists, or IPCA breakeven shocks (di_pre alone).  Each shocked curve
+is built once per scenario and shared by all positions of the book (see
+model.analytics.DebtBook): the changes of the curve rates at the payment dates
+of the book move the yields and the projected cash flows of all positions at
+once.  Scenarios are spread over a process pool, whose workers build the
+shocked curves, while the repricing itself is vectorized.
+"""
+
+import os
+import time
+from collections import namedtuple
+from collections.abc import Iterable
+from datetime import date
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+from utils.calendars import add_calendar, loaded_calendars
+from utils.instrumentation import record_time
+
+from .analytics import DebtBook
+from .curves import Curve
+from .fixedincome import business_days
+from .security import BankBond
+
+STAGES = ["base_curves", "workers", "shocked_curves", "rates", "repricing", "total"]
+
+
+class CurveShock(namedtuple("CurveShock", ["short", "long", "tenor"])):
+    """
+    A rate bump going linearly from short (at tenor 0) to long (at the tenor,
+    in business years, and beyond).  Unlike lambdas, shocks can be sent to
+    worker processes.
+    """
+
+    __slots__ = ()
+
+    def __call__(self, years: np.ndarray) -> np.ndarray:
+        weights = np.clip(np.asarray(years, np.float64) / self.tenor, 0.0, 1.0)
+        return self.short + (self.long - self.short) * weights
+
+
+# Shocks (see model.analytics.Shock) of the vertices of each curve
+Scenario = namedtuple("Scenario", ["name", "shocks"])
+
+
+CURVES = ("di_pre", "di_ipca")
+
+
+def _curves_suffix(curves: tuple[str, ...]) -> str:
+    return "" if sorted(curves) == sorted(CURVES) else " " + "/".join(curves)
+
+
+def parallel(bp: float, curves: Iterable[str] = CURVES) -> Scenario:
+    curves = tuple(curves)
+    shock = CurveShock(bp / 10000.0, bp / 10000.0, 1.0)
+    name = "parallel %+gbp" % bp + _curves_suffix(curves)
+    return Scenario(name, {code: shock for code in curves})
+
+
+def twist(
+    short_bp: float,
+    long_bp: float,
+    tenor: float = 10.0,
+    curves: Iterable[str] = CURVES,
+) -> Scenario:
+    curves = tuple(curves)
+    shock = CurveShock(short_bp / 10000.0, long_bp / 10000.0, tenor)
+    name = "twist %+g/%+gbp %gy" % (short_bp, long_bp, tenor) + _curves_suffix(curves)
+    return Scenario(name, {code: shock for code in curves})
+
+
+def breakeven(bp: float) -> Scenario:
+    """Shock the implied inflation: nominal rates move, real rates do not."""
+    shock = CurveShock(bp / 10000.0, bp / 10000.0, 1.0)
+    return Scenario("breakeven %+gbp" % bp, {"di_pre": shock})
+
+
+def standard_scenarios() -> list[Scenario]:
+    scenarios = [parallel(bp) for bp in (-300, -200, -100, -50, -25)]
+    scenarios += [parallel(bp) for bp in (25, 50, 100, 200, 300)]
+    scenarios += [parallel(bp, ["di_ipca"]) for bp in (-100, -50, 50, 100)]
+    scenarios += [
+        twist(short_bp, -short_bp, tenor)
+        for short_bp in (-100, -50, 50, 100)
+        for tenor in (2.0, 5.0, 10.0)
+    ]
+    scenarios += [breakeven(bp) for bp in (-100, -50, -25, 25, 50, 100)]
+    return scenarios
+
+
+def shock_vertices(vertices: pd.DataFrame, base_date: date, shock) -> pd.DataFrame:
+    """Return the curve vertices with their rates bumped by the shock."""
+    dates = vertices["forward_date"].to_numpy().astype("datetime64[D]")
+    years = business_days(base_date, dates) / 252.0
+    df = vertices.copy()
+    df["rate"] = df["rate"] + (shock(years) if callable(shock) else shock)
+    return df
+
+
+###########
+# Workers #
+###########
+
+# Base curves of the engine, set once in each worker process
+_state: dict[str, object] = {}
+
+# Modules imported once by the fork server, instead of by each worker
+WORKER_PRELOAD = ["QuantLib", "model.stress"]
+
+# Scenarios below which a default engine (no processes given) runs them in
+# the calling process: a scenario takes about 3 ms, while starting workers
+# takes 0.5 s (1.5 s along with the fork server)
+POOL_MIN_SCENARIOS = 2000
+
+
+def _init_worker(base_date, vertices, dates, base_rates, calendars=None) -> None:
+    # Calendars are passed along, as loading them takes longer than a
+    # scenario (see utils.calendars)
+    for name, calendar in (calendars or {}).items():
+        add_calendar(name, calendar)
+    _state.update(
+        base_date=base_date, vertices=vertices, dates=dates, base_rates=base_rates
+    )
+
+
+def _scenario_bumps(scenario: Scenario) -> tuple[dict[str, np.ndarray], list[float]]:
+    """
+    Build the shocked curves of a scenario and return the changes of their
+    rates at the dates, along with the time spent building curves and
+    evaluating rates.
+    """
+    bumps = {}
+    curves_time = rates_time = 0.0
+    for code, shock in scenario.shocks.items():
+        start = time.perf_counter()
+        vertices = shock_vertices(_state["vertices"][code], _state["base_date"], shock)
+        curve = Curve(code, _state["base_date"], vertices)
+        middle = time.perf_counter()
+        bumps[code] = curve.get_rates(_state["dates"]) - _state["base_rates"][code]
+        curves_time += middle - start
+        rates_time += time.perf_counter() - middle
+    return bumps, [curves_time, rates_time]
+
+
+def _pool_size(num_scenarios: int) -> int:
+    if num_scenarios < POOL_MIN_SCENARIOS:
+        return 1
+    return max(1, min(os.cpu_count() or 1, num_scenarios))
+
+
+def _map_scenarios(processes: int, args: tuple, scenarios: list[Scenario]) -> list:
+    """Return the bumps of the scenarios, computed by a pool of processes."""
+    if processes == 1:
+        _init_worker(*args)
+        return [_scenario_bumps(scenario) for scenario in scenarios]
+
+    # Workers get their state from the initializer arguments, so they need
+    # not be forked from a (possibly multi-threaded) process
+    context = get_context("forkserver")
+    context.set_forkserver_preload(WORKER_PRELOAD)
+    args = (*args, loaded_calendars())
+    with context.Pool(processes, _init_worker, args) as pool:
+        return pool.map(_scenario_bumps, scenarios, chunksize=1)
+
+
+##########
+# Engine #
+##########
+
+
+class StressEngine:
+    def __init__(self, book: DebtBook, processes: int | None = None):
+        """
+        Stress a debt book, with a process pool of the given size (by
+        default, one process per CPU for large sets of scenarios only).
+        """
+        self.book: DebtBook = book
+        self.processes: int | None = processes
+        # Curves of the book day, as used by bank bonds
+        self.base_date: date = BankBond.curve_date(book.day)
+        # Seconds spent in each stage by the last run (summed over workers for
+        # shocked_curves and rates, while workers counts their startup)
+        self.timings: dict[str, float] = {}
+
+    def _base_curves(self, codes: list[str], dates: np.ndarray) -> tuple[dict, dict]:
+        base_curves = {code: Curve(code, self.base_date) for code in codes}
+        vertices = {code: curve.vertices for code, curve in base_curves.items()}
+        base_rates = {
+            code: curve.get_rates(dates) for code, curve in base_curves.items()
+        }
+        return vertices, base_rates
+
+    def _pnl(self, dates: np.ndarray, results: list) -> np.ndarray:
+        positions = np.searchsorted(dates, self.book.flow_dates)
+        base_values = self.book.values()
+        pnl = [
+            self.book.values({code: bump[positions] for code, bump in bumps.items()})
+            - base_values
+            for bumps, _ in results
+        ]
+        return np.array(pnl).reshape(len(results), len(self.book))
+
+    def run(self, scenarios: Iterable[Scenario]) -> pd.DataFrame:
+        """Return the P&L of each position (columns) under each scenario (rows)."""
+        scenarios = list(scenarios)
+        timings = dict.fromkeys(STAGES, 0.0)
+        start = time.perf_counter()
+
+        codes = sorted({code for scenario in scenarios for code in scenario.shocks})
+        dates = np.unique(self.book.flow_dates)
+        vertices, base_rates = self._base_curves(codes, dates)
+        timings["base_curves"] = time.perf_counter() - start
+
+        middle = time.perf_counter()
+        processes = self.processes or _pool_size(len(scenarios))
+        args = (self.base_date, vertices, dates, base_rates)
+        results = _map_scenarios(processes, args, scenarios)
+        for _, (curves_time, rates_time) in results:
+            timings["shocked_curves"] += curves_time
+            timings["rates"] += rates_time
+        if processes > 1:
+            # Whatever was not spent on scenarios went to starting workers
+            elapsed = time.perf_counter() - middle
+            busy = (timings["shocked_curves"] + timings["rates"]) / processes
+            timings["workers"] = max(0.0, elapsed - busy)
+
+        middle = time.perf_counter()
+        pnl = self._pnl(dates, results)
+        timings["repricing"] = time.perf_counter() - middle
+        timings["total"] = time.perf_counter() - start
+
+        for stage, elapsed in timings.items():
+            record_time("stress", elapsed, stage=stage)
+        self.timings = timings
+        return pd.DataFrame(
+            pnl,
+            index=pd.Index([scenario.name for scenario in scenarios], name="scenario"),
+            columns=pd.Index([p.name for p in self.book.positions], name="name"),
+        )
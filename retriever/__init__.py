@@ -1,3 +1,4 @@
+from .anbima import AnbimaIndexRetriever
 from .bcb import BCBRetriever
 from .bovespa import BovespaRetriever
 from .cdi import CDIRetriever
@@ -5,103 +6,95 @@ from .curves import B3CurveRetriever
 from .debentures import DebenturesRetriever
 from .directtreasure import DirectTreasureRetriever
 from .fund import FundRetriever
+from .idex import IdexRetriever
 from .index import IndexRetriever
 from .ipca import IPCARetriever
+from .panel import PricePanel
+from .registry import RetrieverRegistry
 from .retriever import DataRetriever
 
+registry = RetrieverRegistry()
+registry.register("anbima", AnbimaIndexRetriever)
+registry.register("bcb", BCBRetriever)
+registry.register("bovespa", BovespaRetriever)
+registry.register("cdi", CDIRetriever)
+# get_curve_retriever() and get_b3_curve_retriever() share the same instance
+registry.register("curves", B3CurveRetriever)
+registry.register("debentures", DebenturesRetriever)
+registry.register("directtreasure", DirectTreasureRetriever)
+registry.register("fund", FundRetriever)
+registry.register("idex", IdexRetriever)
+registry.register("index", IndexRetriever)
+registry.register("ipca", IPCARetriever)
 
-def get_bovespa_retriever():
-    if get_bovespa_retriever.instance is None:
-        get_bovespa_retriever.instance = BovespaRetriever()
-    return get_bovespa_retriever.instance
+registry.register_profile(
+    "securities", ["bovespa", "debentures", "directtreasure", "fund"]
+)
+registry.register_profile("rates", ["bcb", "cdi", "curves", "ipca"])
+registry.register_profile(
+    "valuation", registry.profiles["securities"] + registry.profiles["rates"]
+)
+registry.register_profile("benchmarks", ["anbima", "idex"])
+registry.register_profile("all", registry.names)
 
 
-get_bovespa_retriever.instance = None
+def preload_retrievers(profile: str = "valuation", wait: bool = False):
+    """Warm up the retrievers of a profile in background threads."""
+    return registry.preload(profile, wait)
 
 
-def get_cdi_retriever():
-    if get_cdi_retriever.instance is None:
-        get_cdi_retriever.instance = CDIRetriever()
-    return get_cdi_retriever.instance
+def get_anbima_retriever() -> AnbimaIndexRetriever:
+    return registry.get("anbima")
 
 
-get_cdi_retriever.instance = None
+def get_bovespa_retriever() -> BovespaRetriever:
+    return registry.get("bovespa")
 
 
-def get_debentures_retriever():
-    if get_debentures_retriever.instance is None:
-        get_debentures_retriever.instance = DebenturesRetriever()
-    return get_debentures_retriever.instance
+def get_cdi_retriever() -> CDIRetriever:
+    return registry.get("cdi")
 
 
-get_debentures_retriever.instance = None
+def get_debentures_retriever() -> DebenturesRetriever:
+    return registry.get("debentures")
 
 
-def get_directtreasure_retriever():
-    if get_directtreasure_retriever.instance is None:
-        get_directtreasure_retriever.instance = DirectTreasureRetriever()
-    return get_directtreasure_retriever.instance
+def get_directtreasure_retriever() -> DirectTreasureRetriever:
+    return registry.get("directtreasure")
 
 
-get_directtreasure_retriever.instance = None
+def get_fund_retriever() -> FundRetriever:
+    return registry.get("fund")
 
 
-def get_fund_retriever():
-    if get_fund_retriever.instance is None:
-        get_fund_retriever.instance = FundRetriever()
-    return get_fund_retriever.instance
+def get_idex_retriever() -> IdexRetriever:
+    return registry.get("idex")
 
 
-get_fund_retriever.instance = None
+def get_ipca_retriever() -> IPCARetriever:
+    return registry.get("ipca")
 
 
-def get_ipca_retriever():
-    if get_ipca_retriever.instance is None:
-        get_ipca_retriever.instance = IPCARetriever()
-    return get_ipca_retriever.instance
+def get_index_retriever() -> IndexRetriever:
+    return registry.get("index")
 
 
-get_ipca_retriever.instance = None
+def get_curve_retriever() -> B3CurveRetriever:
+    return registry.get("curves")
 
 
-def get_index_retriever():
-    if get_index_retriever.instance is None:
-        get_index_retriever.instance = IndexRetriever()
-    return get_index_retriever.instance
+def get_bcb_retriever() -> BCBRetriever:
+    return registry.get("bcb")
 
 
-get_index_retriever.instance = None
-
-
-def get_curve_retriever():
-    if get_curve_retriever.instance is None:
-        get_curve_retriever.instance = B3CurveRetriever()
-    return get_curve_retriever.instance
-
-
-get_curve_retriever.instance = None
-
-
-def get_bcb_retriever():
-    if get_bcb_retriever.instance is None:
-        get_bcb_retriever.instance = BCBRetriever()
-    return get_bcb_retriever.instance
-
-
-get_bcb_retriever.instance = None
-
-
-def get_b3_curve_retriever():
-    if get_b3_curve_retriever.instance is None:
-        get_b3_curve_retriever.instance = B3CurveRetriever()
-    return get_b3_curve_retriever.instance
-
-
-get_b3_curve_retriever.instance = None
+def get_b3_curve_retriever() -> B3CurveRetriever:
+    return registry.get("curves")
 
 
 __all__ = [
     "DataRetriever",
+    "PricePanel",
+    "get_anbima_retriever",
     "get_b3_curve_retriever",
     "get_bcb_retriever",
     "get_bovespa_retriever",
@@ -110,6 +103,9 @@ __all__ = [
     "get_debentures_retriever",
     "get_directtreasure_retriever",
     "get_fund_retriever",
+    "get_idex_retriever",
     "get_index_retriever",
     "get_ipca_retriever",
+    "preload_retrievers",
+    "registry",
 ]
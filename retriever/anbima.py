@@ -0,0 +1,82 @@
+import logging
+
+import pandas as pd
+
+from utils.instrumentation import increment
+
+from .retriever import IndexLevelRetriever
+
+logger = logging.getLogger(__name__)
+
+# Columns of the index history files that are kept, and their names
+COLUMNS = {
+    "Data de Referência": "day",
+    "Número Índice": "level",
+    "Duration (d.u.)": "duration",
+}
+
+
+def _to_number(series: pd.Series) -> pd.Series:
+    # Numbers may come as text in Brazilian format (1.234,56), mixed with
+    # numeric cells, which are kept as they are
+    if series.dtype == object:
+        text = series.map(type) == str
+        series = series.copy()
+        series[text] = (
+            series[text]
+            .str.replace(".", "", regex=False)
+            .str.replace(",", ".", regex=False)
+        )
+    return pd.to_numeric(series, errors="coerce")
+
+
+class AnbimaIndexRetriever(IndexLevelRetriever):
+    """
+    Daily numbers of the ANBIMA fixed income indices (IMA-B, IRF-M, IMA-S...).
+
+    Each index has a single history file (<INDEX>.xls), which is parsed once
+    into the cache files of the retriever.
+    """
+
+    def __init__(self, data_directory: str | None = None):
+        IndexLevelRetriever.__init__(self, "anbima", data_directory)
+        self.check_and_update_data()
+
+    def _get_data_file_patterns(self):
+        return [self.data_directory + "/" + code + ".xls" for code in self.codes]
+
+    def _available_codes(self):
+        return self.codes
+
+    def _load_data_files(self):
+        data: dict[str, pd.DataFrame] = {}
+        for code in self.codes:
+            file_name = self.data_directory + "/" + code + ".xls"
+            logger.info("Loading file %s...", file_name)
+            increment("files_parsed", asset="anbima")
+
+            df = pd.read_excel(file_name, engine="xlrd")
+            df = df[[col for col in COLUMNS if col in df.columns]]
+            df = df.rename(columns=COLUMNS)
+            assert "day" in df.columns and "level" in df.columns, (
+                "Invalid index file: %s" % file_name
+            )
+
+            if not pd.api.types.is_datetime64_any_dtype(df["day"]):
+                df["day"] = pd.to_datetime(
+                    df["day"], format="%d/%m/%Y", errors="coerce"
+                )
+            for col in df.columns.drop("day"):
+                df[col] = _to_number(df[col])
+
+            # Footnote lines have no date
+            df.dropna(subset=["day", "level"], inplace=True)
+            df.drop_duplicates(subset="day", keep="last", inplace=True)
+            df.set_index("day", inplace=True)
+            df.sort_index(inplace=True)
+            data[code] = df
+
+        self._data = data
+
+    def __repr__(self):
+        return "AnbimaIndexRetriever()"
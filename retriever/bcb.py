@@ -1,15 +1,20 @@
 import glob
+import logging
 from datetime import date, datetime, timedelta
 from typing import override
 
 import pandas as pd
 
+from utils.instrumentation import increment, timed
+
 from .retriever import VariationRetriever
 
+logger = logging.getLogger(__name__)
+
 
 class BCBRetriever(VariationRetriever):
-    def __init__(self):
-        VariationRetriever.__init__(self, "bcb")
+    def __init__(self, data_directory: str | None = None):
+        VariationRetriever.__init__(self, "bcb", data_directory)
         self.check_and_update_data()
 
     @override
@@ -25,10 +30,11 @@ class BCBRetriever(VariationRetriever):
         file_list = sorted(glob.glob(self.data_directory + "/sgs_daily_*.csv"))
         assert len(file_list) > 0
 
-        data = pd.DataFrame()
+        df_list: list[pd.DataFrame] = []
 
         for file_name in file_list:
-            print("Loading file %s..." % file_name)
+            logger.info("Loading file %s...", file_name)
+            increment("files_parsed", asset="bcb")
 
             df = pd.read_csv(
                 file_name,
@@ -36,13 +42,16 @@ class BCBRetriever(VariationRetriever):
                 parse_dates=True,
             )
 
-            data = pd.concat([data, df])
+            df_list.append(df)
+
+        data = pd.concat(df_list)
 
         data /= 100.0
 
         self.data: dict[str, pd.DataFrame] = {"bcb": data}
 
     @override
+    @timed("get_variation")
     def get_variation(
         self,
         code: str,
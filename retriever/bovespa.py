@@ -1,10 +1,29 @@
 import glob
-from multiprocessing import Pool
+import logging
+import os
+import re
+import tempfile
+import time
+import zipfile
+from datetime import date, datetime, timedelta
+from multiprocessing import get_context
+from pathlib import Path
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
 
+from utils.calendars import get_calendar
+from utils.instrumentation import increment, span, timed
+
+from .fetcher import Fetcher
+from .grid import PriceGrid
 from .retriever import ValueRetriever
 
+logger = logging.getLogger(__name__)
+
 # fmt: off
 FIELDS = [
     (  1,   2, "TIPREG"),
@@ -57,9 +76,13 @@ COLS = [
     "PREULT",
 ]
 
+# https://www.b3.com.br/pt_br/market-data-e-indices/servicos-de-dados/market-data/historico/mercado-a-vista/cotacoes-historicas/
+DAILY_URL = "https://bvmf.bmfbovespa.com.br/InstDados/SerHist/COTAHIST_D%s.ZIP"
+DAILY_REGEX = re.compile(r"COTAHIST_D(\d{8})\.TXT$")
+
 
 def _read_file(file_name):
-    print("Loading file %s..." % file_name)
+    logger.info("Loading file %s...", file_name)
 
     df = pd.read_fwf(
         file_name,
@@ -76,12 +99,76 @@ def _read_file(file_name):
     )
     df.drop_duplicates(inplace=True)
 
+    for col in set(PRICES) & set(COLS):
+        df[col] /= 100.0
+
     return df
 
 
+def _read_file_to_ipc(file_name: str, directory: str) -> str:
+    # Parsed columns are handed back to the parent process through an Arrow IPC
+    # file instead of a pickled dataframe, so the parent can memory map them.
+    df = _read_file(file_name)
+    table = pa.Table.from_pandas(df.reset_index(), preserve_index=False)
+    ipc_file = os.path.join(directory, Path(file_name).stem + ".arrow")
+    with pa.OSFile(ipc_file, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return ipc_file
+
+
+def _read_ipc_file(ipc_file: str) -> pa.Table:
+    with pa.memory_map(ipc_file) as source:
+        return pa.ipc.open_file(source).read_all().replace_schema_metadata(None)
+
+
+def _merge_rows(tables: list[pa.Table]) -> pa.Table:
+    # Promotion handles the null-typed columns of files without quotes
+    table = pa.concat_tables(tables, promote_options="default")
+    table = table.select(COLS)
+
+    # Rows from newer files (daily after annual) take precedence
+    keys = table.select(["DATA", "CODNEG"]).to_pandas()
+    unique = ~keys.duplicated(keep="last").to_numpy()
+    table = table.filter(pa.array(unique))
+
+    return table.sort_by([("DATA", "ascending"), ("CODNEG", "ascending")])
+
+
+def _pool_size(num_files: int) -> int:
+    return max(1, min(os.cpu_count() or 1, num_files))
+
+
+def _read_generation_date(file_name: str) -> date | None:
+    # Header record: TIPREG (00), file name, origin and generation date (AAAAMMDD)
+    with open(file_name, encoding="windows-1252") as f:
+        header = f.readline()
+    if not header.startswith("00"):
+        return None
+    return datetime.strptime(header[23:31], "%Y%m%d").date()
+
+
+def _daily_file_date(file_name: str) -> date:
+    reg_exp = DAILY_REGEX.search(file_name)
+    assert reg_exp is not None
+    return datetime.strptime(reg_exp.groups()[0], "%d%m%Y").date()
+
+
 class BovespaRetriever(ValueRetriever):
-    def __init__(self):
-        ValueRetriever.__init__(self, "bovespa")
+    """
+    Daily stock quotes from B3 COTAHIST files.
+
+    Quotes are cached in one partition per year.  In incremental mode the
+    current year is kept up to date by fetching the COTAHIST_D daily files of
+    the trading days that are missing, instead of redownloading the whole
+    COTAHIST_A annual file, and only their rows are parsed and merged into the
+    current year partition.
+    """
+
+    def __init__(self, incremental: bool = True, data_directory: str | None = None):
+        ValueRetriever.__init__(self, "bovespa", data_directory)
+        self.incremental: bool = incremental
+        self._stale_partitions: dict[int, pd.DataFrame] = {}
         self.check_and_update_data()
 
     def _get_data_file_patterns(self):
@@ -92,22 +179,228 @@ class BovespaRetriever(ValueRetriever):
         assert isinstance(self._data["bovespa"].index, pd.MultiIndex)
         return self._data["bovespa"].index.levels[1].values
 
-    def _load_data_files(self):
-        file_list = sorted(glob.glob(self.data_directory + "/COTAHIST_A*.TXT"))
+    def _annual_file(self, year: int) -> str:
+        return self.data_directory + "/COTAHIST_A%s.TXT" % year
+
+    def _daily_files(self, year: int) -> list[str]:
+        return sorted(
+            glob.glob(self.data_directory + "/COTAHIST_D????%s.TXT" % year),
+            key=_daily_file_date,
+        )
+
+    def _partition_file(self, year: int) -> str:
+        return self.data_directory + "/bovespa_%s.cache" % year
+
+    def _source_files(self, year: int) -> list[str]:
+        annual_file = self._annual_file(year)
+        annual_files = [annual_file] if os.path.isfile(annual_file) else []
+        return annual_files + self._daily_files(year)
+
+    def _years(self) -> list[int]:
+        file_list = glob.glob(self.data_directory + "/COTAHIST_[AD]*.TXT")
+        return sorted({int(Path(f).stem[-4:]) for f in file_list})
+
+    def _is_partition_up_to_date(self, year: int) -> bool:
+        partition_file = self._partition_file(year)
+        if not os.path.isfile(partition_file):
+            return False
+        source_ts = max(map(os.path.getmtime, self._source_files(year)))
+        return source_ts < os.path.getmtime(partition_file)
+
+    ############
+    # Download #
+    ############
 
-        # Load TXT files in parallel
-        with Pool(processes=16) as pool:
-            df_list = pool.map(_read_file, file_list)
-        data = pd.concat(df_list)
+    def _download_data_files(self, year):
+        current_year = time.localtime()[0]
+        if (
+            self.incremental
+            and year == current_year
+            and os.path.isfile(self._annual_file(year))
+        ):
+            self._download_daily_files(year)
+        else:
+            ValueRetriever._download_data_files(self, year)
 
-        # Adjust dataframe
-        for col in set(PRICES) & set(COLS):
-            data[col] /= 100.0
+    def _last_available_day(self, year: int) -> date:
+        days = [date(year, 1, 1) - timedelta(days=1)]
+
+        partition_file = self._partition_file(year)
+        if os.path.isfile(partition_file):
+            column = feather.read_table(partition_file, columns=["DATA"])["DATA"]
+            if len(column) > 0:
+                days.append(pc.max(column).as_py().date())
+
+        annual_file = self._annual_file(year)
+        if os.path.isfile(annual_file):
+            generation_date = _read_generation_date(annual_file)
+            if generation_date is not None:
+                days.append(generation_date)
+
+        days.extend(map(_daily_file_date, self._daily_files(year)))
+        return max(days)
+
+    def _download_daily_files(self, year: int) -> None:
+        first_day = self._last_available_day(year) + timedelta(days=1)
+        last_day = min(date.today(), date(year, 12, 31))
+        calendar = get_calendar("PMC/BMF")
+        days = calendar.seq(first_day, last_day) if first_day <= last_day else []
+
+        logger.info("Downloading %d bovespa daily files...", len(days))
+        items = [
+            (
+                DAILY_URL % f"{day:%d%m%Y}",
+                self.data_directory + f"/COTAHIST_D{day:%d%m%Y}.ZIP",
+            )
+            for day in days
+        ]
+        with span("download", asset="bovespa"), Fetcher(verify=False) as fetcher:
+            # The most recent trading day may not have been published yet
+            updated, _ = fetcher.fetch_many(items, keep_going=True)
+        increment("files_downloaded", len(updated), asset="bovespa")
+        for zip_file in updated:
+            with zipfile.ZipFile(zip_file) as zf:
+                zf.extractall(self.data_directory)
+
+        # Mark the current year as checked (see is_file_up_to_date)
+        os.utime(self.data_directory + "/COTAHIST_A%s.ZIP" % year, None)
+
+    #########
+    # Cache #
+    #########
+
+    def _check_cache_files(self):
+        years = self._years()
+        return len(years) > 0 and all(map(self._is_partition_up_to_date, years))
+
+    def _load_data_from_cache(self):
+        tables = [self._read_partition(year) for year in self._years()]
+        self._data = {"bovespa": self._assemble(tables)}
+
+    def _write_data_to_cache(self):
+        for year, table in self._stale_partitions.items():
+            feather.write_feather(table, self._partition_file(year) + ".part")
+        for year in self._stale_partitions:
+            partition_file = self._partition_file(year)
+            os.replace(partition_file + ".part", partition_file)
+        self._stale_partitions = {}
+
+    def _staging_copy(self):
+        staged = ValueRetriever._staging_copy(self)
+        staged._stale_partitions = {}
+        return staged
+
+    def _read_partition(self, year: int) -> pa.Table:
+        table = feather.read_table(self._partition_file(year), columns=COLS)
+        return table.replace_schema_metadata(None)
+
+    @staticmethod
+    def _assemble(tables: list[pa.Table]) -> pd.DataFrame:
+        # Arrow concatenation only chains the chunks: data is copied once, by to_pandas
+        table = pa.concat_tables(tables)
+        # Dictionary encode codes so that to_pandas does not create a string per row
+        codes = pc.dictionary_encode(table["CODNEG"])
+        table = table.set_column(
+            table.schema.get_field_index("CODNEG"), "CODNEG", codes
+        )
+        data = table.to_pandas()
+        data.set_index(["DATA", "CODNEG"], inplace=True)
+        # Use a plain level of (unique) codes, so that sorting is lexicographic
+        level = data.index.levels[1].astype(object)
+        data.index = data.index.set_levels(level, level="CODNEG")
         data.sort_index(inplace=True, kind="stable")
+        return data
+
+    ###########
+    # Loading #
+    ###########
+
+    def _load_data_files(self):
+        partitions: dict[int, pa.Table] = {}
+        file_list: list[str] = []
+        file_years: list[int] = []
+
+        for year in self._years():
+            sources = self._files_to_parse(year, partitions)
+            file_list.extend(sources)
+            file_years.extend([year] * len(sources))
+
+        with tempfile.TemporaryDirectory(prefix="bovespa_") as directory:
+            ipc_files = self._parse_files(file_list, directory)
+            for year in self._stale_partitions:
+                tables = [partitions[year]] if year in partitions else []
+                tables += [
+                    _read_ipc_file(ipc_file)
+                    for ipc_file, y in zip(ipc_files, file_years)
+                    if y == year
+                ]
+                partitions[year] = self._stale_partitions[year] = _merge_rows(tables)
+
+            data = self._assemble([partitions[year] for year in sorted(partitions)])
 
         self._data = {"bovespa": data}
 
+    def _files_to_parse(self, year: int, partitions: dict[int, pa.Table]) -> list[str]:
+        """
+        Return the files of year to parse, adding its partition to partitions
+        if it is up to date or only needs the rows of newer daily files.
+        """
+        if self._is_partition_up_to_date(year):
+            partitions[year] = self._read_partition(year)
+            return []
+        self._stale_partitions[year] = pa.table({})
+
+        sources = self._source_files(year)
+        partition_file = self._partition_file(year)
+        annual_file = self._annual_file(year)
+        if (
+            self.incremental
+            and os.path.isfile(partition_file)
+            and os.path.isfile(annual_file)
+            and os.path.getmtime(annual_file) < os.path.getmtime(partition_file)
+        ):
+            # Only daily files are newer than the partition: merge their rows
+            partition_ts = os.path.getmtime(partition_file)
+            partitions[year] = self._read_partition(year)
+            sources = [f for f in sources if os.path.getmtime(f) > partition_ts]
+        return sources
+
+    def _parse_files(self, file_list: list[str], directory: str) -> list[str]:
+        """Parse TXT files in parallel into Arrow IPC files in directory."""
+        if not file_list:
+            return []
+        args = [(file_name, directory) for file_name in file_list]
+        # Not forked: retrievers may be loaded from background threads
+        context = get_context("forkserver")
+        with context.Pool(processes=_pool_size(len(file_list))) as pool:
+            ipc_files = pool.starmap(_read_file_to_ipc, args)
+        increment("files_parsed", len(file_list), asset="bovespa")
+        return ipc_files
+
+    def _value_series(self, code):
+        assert self._data is not None
+        return self._data["bovespa"].xs(code, level="CODNEG")["PREULT"]
+
+    def _build_price_grid(self, codes):
+        assert self._data is not None
+        df = self._data["bovespa"]
+        index = df.index
+        # Grid column of each code of the index level (-1 if not requested)
+        columns = pd.Index(codes).get_indexer(index.levels[1])[index.codes[1]]
+        requested = columns >= 0
+        return PriceGrid.from_records(
+            index.get_level_values("DATA").values[requested],
+            columns[requested],
+            df["PREULT"].to_numpy(np.float64)[requested],
+            codes,
+        )
+
+    @timed("get_value")
     def get_value(self, code, day):
+        if self._grid is not None:
+            quote = self._grid.lookup(code, day)
+            if quote is not None:
+                return quote[0]
         assert self._data is not None
         ValueRetriever.get_value(self, code, day)
         ts = pd.Timestamp(day)
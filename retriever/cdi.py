@@ -1,15 +1,20 @@
 import glob
+import logging
 from datetime import datetime, timedelta
 
 import numpy as np
 import pandas as pd
 
+from utils.instrumentation import increment, timed
+
 from .retriever import VariationRetriever
 
+logger = logging.getLogger(__name__)
+
 
 class CDIRetriever(VariationRetriever):
-    def __init__(self):
-        VariationRetriever.__init__(self, "cdi")
+    def __init__(self, data_directory: str | None = None):
+        VariationRetriever.__init__(self, "cdi", data_directory)
         # self.check_and_update_data()
 
     def _get_data_file_patterns(self):
@@ -21,10 +26,11 @@ class CDIRetriever(VariationRetriever):
     def _load_data_files(self):
         file_list = sorted(glob.glob(self.data_directory + "/CDI_*.csv"))
 
-        data = pd.DataFrame()
+        df_list: list[pd.DataFrame] = []
 
         for file_name in file_list:
-            print("Loading file %s..." % file_name)
+            logger.info("Loading file %s...", file_name)
+            increment("files_parsed", asset="cdi")
 
             df = pd.read_csv(
                 file_name,
@@ -34,7 +40,9 @@ class CDIRetriever(VariationRetriever):
                 index_col=["date"],
             )
 
-            data = pd.concat([data, df])
+            df_list.append(df)
+
+        data = pd.concat(df_list)
 
         data["annual"] /= 10000.0
 
@@ -45,6 +53,7 @@ class CDIRetriever(VariationRetriever):
 
         self._data = {"cdi": data}
 
+    @timed("get_variation")
     def get_variation(self, code, begin_date, end_date, percentage=1.0):
         VariationRetriever.get_variation(self, code, begin_date, end_date)
 
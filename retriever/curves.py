@@ -1,15 +1,20 @@
 import glob
+import logging
 import re
 from datetime import date
 
 import pandas as pd
 
+from utils.instrumentation import increment, timed
+
 from .retriever import CurveRetriever
 
+logger = logging.getLogger(__name__)
+
 
 class B3CurveRetriever(CurveRetriever):
-    def __init__(self):
-        CurveRetriever.__init__(self, "curves")
+    def __init__(self, data_directory: str | None = None):
+        CurveRetriever.__init__(self, "curves", data_directory)
         self.check_and_update_data()
 
     def _get_data_file_patterns(self):
@@ -19,14 +24,13 @@ class B3CurveRetriever(CurveRetriever):
         return self.codes
 
     def _load_data_files(self):
-        self._data = {}
-        for curve in self.codes:
-            self._data[curve] = pd.DataFrame()
+        parts: dict[str, list[pd.DataFrame]] = {curve: [] for curve in self.codes}
 
         file_list = sorted(glob.glob(self.data_directory + "/yc_*.csv"))
 
         for file_name in file_list:
-            print("Loading file %s..." % file_name)
+            logger.info("Loading file %s...", file_name)
+            increment("files_parsed", asset="curves")
 
             reg_exp = re.search(self.data_directory + r"/yc_(.*)_\d{4}\.csv", file_name)
             assert reg_exp is not None
@@ -39,8 +43,14 @@ class B3CurveRetriever(CurveRetriever):
             ).sort_index(kind="stable")
 
             if len(df) > 0:
-                self._data[curve] = pd.concat([self._data[curve], df])
+                parts.setdefault(curve, []).append(df)
+
+        self._data = {
+            curve: pd.concat(dfs) if dfs else pd.DataFrame()
+            for curve, dfs in parts.items()
+        }
 
+    @timed("get_curve_vertices")
     def get_curve_vertices(self, code: str, base_date: str | date):
         CurveRetriever.get_curve_vertices(self, code, base_date)
         if isinstance(base_date, date):
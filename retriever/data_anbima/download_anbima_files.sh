@@ -26,7 +26,7 @@ read_array() {
 #https://data.anbima.com.br/indices/consulta/ima/resultados-diarios
 URL_BASE=https://adata-precos-prod.s3.amazonaws.com/arquivos/indices-historico
 
+echo "Downloading ${#INDICES[@]} ANBIMA index files..."
 for INDEX in "${INDICES[@]}"; do
-	echo "Downloading ${INDEX}.xls..."
-	wget -q --random-wait -O "${INDEX}.xls" "${URL_BASE}/${INDEX}-HISTORICO.xls"
-done
+	echo "${URL_BASE}/${INDEX}-HISTORICO.xls ${INDEX}.xls"
+done | python ../fetcher.py >/dev/null
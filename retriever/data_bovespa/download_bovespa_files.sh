@@ -20,9 +20,12 @@ FILENAMETXT=${BASENAME}.TXT
 URL=https://bvmf.bmfbovespa.com.br/InstDados/SerHist/${FILENAMEZIP}
 
 echo "Downloading ${FILENAMEZIP}..."
-wget -q --no-check-certificate --random-wait -O "${FILENAMEZIP}" "${URL}"
+UPDATED=$(python ../fetcher.py --insecure "${URL}" "${FILENAMEZIP}")
 [[ -s ${FILENAMEZIP} ]] || false
-unzip -q -o "${FILENAMEZIP}"
+# Only extract the archive if it has changed on the server
+if [[ -n ${UPDATED} || ! -s ${FILENAMETXT} ]]; then
+	unzip -q -o "${FILENAMEZIP}"
+fi
 
 touch "${FILENAMEZIP}"
 touch "${FILENAMETXT}"
@@ -32,6 +32,17 @@ fi
 
 END_TS=$((MINIMAL_TS + OFFSET))
 
+# Download files only if they do not exist and if day is not Saturday (6) nor Sunday (7).
+# Days without a file (holidays) are expected to fail, hence --keep-going.
+CURRENT_TS=$INITIAL_TS
+while [[ "${CURRENT_TS}" -le "${END_TS}" ]]; do
+	CURRENT_DATE=$(date --date="@${CURRENT_TS}" "+%Y%m%d")
+	if [[ $(date --date="@${CURRENT_TS}" "+%u") -lt 6 ]]; then
+		echo "${URL}/${CURRENT_DATE}.txt ${CURRENT_DATE}.txt"
+	fi
+	CURRENT_TS=$((CURRENT_TS + OFFSET))
+done | python ../fetcher.py --skip-existing --keep-going >/dev/null 2>&1
+
 echo "Date,CDI" >"${CSV_FILE}"
 
 CURRENT_TS=$INITIAL_TS
@@ -39,11 +50,6 @@ while [[ "${CURRENT_TS}" -le "${END_TS}" ]]; do
 	CURRENT_DATE=$(date --date="@${CURRENT_TS}" "+%Y%m%d")
 	FILENAME=${CURRENT_DATE}.txt
 
-	# Download file only if it does not exist and if day is not Saturday (6) nor Sunday (7)
-	if [[ ! -e ${FILENAME} && $(date --date="@${CURRENT_TS}" "+%u") -lt 6 ]]; then
-		wget -q --random-wait "${URL}/${FILENAME}" || true
-	fi
-
 	if [[ -e ${FILENAME} ]]; then
 		echo -n "${CURRENT_DATE}," >>"${CSV_FILE}"
 		cat "${FILENAME}" >>"${CSV_FILE}"
@@ -37,16 +37,30 @@ URL_PU_SUFIX="++++"
 #http://www.debentures.com.br/exploreosnd/consultaadados/mercadosecundario/precosdenegociacao_f.asp
 URL_NEG="http://www.debentures.com.br/exploreosnd/consultaadados/mercadosecundario/precosdenegociacao_e.asp?op_exc=False&dt_ini=${YEAR}0101&dt_fim=${YEAR}1231&ativo="
 
+# Download raw PU and NEG files for all debentures in a single batch.
+# Codes without data (e.g. matured debentures) are expected to fail, hence --keep-going
+echo "Downloading ${#DEBS[@]} debentures PU and NEG files..."
 for DEB in "${DEBS[@]}"; do
+	echo "${URL_PU}${DEB}${URL_PU_SUFIX} ${DEB}_PU_${YEAR}.raw"
+	echo "${URL_NEG}${DEB} ${DEB}_NEG_${YEAR}.raw"
+done | python ../fetcher.py --keep-going >/dev/null
+
+for DEB in "${DEBS[@]}"; do
+	RAW_PU_FILE_NAME=${DEB}_PU_${YEAR}.raw
 	TSV_PU_FILE_NAME=${DEB}_PU_${YEAR}.tsv
 	CSV_PU_FILE_NAME=${DEB}_PU_${YEAR}.csv
-	echo "Downloading ${CSV_PU_FILE_NAME}..."
-	wget -q --random-wait -O- "${URL_PU}${DEB}${URL_PU_SUFIX}" | iconv --from-code=ISO-8859-1 --to-code=UTF-8 | dos2unix -q >"${TSV_PU_FILE_NAME}"
+	[ -s "${RAW_PU_FILE_NAME}" ] || continue
+	echo "Converting ${CSV_PU_FILE_NAME}..."
+	iconv --from-code=ISO-8859-1 --to-code=UTF-8 <"${RAW_PU_FILE_NAME}" | dos2unix -q >"${TSV_PU_FILE_NAME}"
 	[ -e "${TSV_PU_FILE_NAME}" ] && tail -n +3 "${TSV_PU_FILE_NAME}" | head --lines=-4 | sed 's/\.//g' | sed 's/,/./g' | tr '\t' ',' | sed 's/,$//' >"${CSV_PU_FILE_NAME}"
+done
 
+for DEB in "${DEBS[@]}"; do
+	RAW_NEG_FILE_NAME=${DEB}_NEG_${YEAR}.raw
 	TSV_NEG_FILE_NAME=${DEB}_NEG_${YEAR}.tsv
 	CSV_NEG_FILE_NAME=${DEB}_NEG_${YEAR}.csv
-	echo "Downloading ${CSV_NEG_FILE_NAME}..."
-	wget -q --random-wait -O- "${URL_NEG}${DEB}" | iconv --from-code=ISO-8859-1 --to-code=UTF-8 | dos2unix -q >"${TSV_NEG_FILE_NAME}"
+	[ -s "${RAW_NEG_FILE_NAME}" ] || continue
+	echo "Converting ${CSV_NEG_FILE_NAME}..."
+	iconv --from-code=ISO-8859-1 --to-code=UTF-8 <"${RAW_NEG_FILE_NAME}" | dos2unix -q >"${TSV_NEG_FILE_NAME}"
 	[ -e "${TSV_NEG_FILE_NAME}" ] && tail -n +3 "${TSV_NEG_FILE_NAME}" | sed '/Não existe consulta para os itens selecionados/d' | sed 's/\.//g' | sed 's/,/./g' | tr '\t' ',' >"${CSV_NEG_FILE_NAME}"
 done
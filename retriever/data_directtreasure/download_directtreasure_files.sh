@@ -37,12 +37,12 @@ for BOND in "${BONDS[@]}"; do
 
 	if [[ "${YEAR}" -lt 2023 && "${BOND}" =~ NTN-B1 ]]; then
 		# Create empty Excel file (with 'Sheet' worksheet)
-		uv run python -c "import xlwt; wb = xlwt.Workbook(); wb.add_sheet('Sheet'); wb.save('${LOCAL_FILE}')"
+		uv run python -c "import xlwt; wb = xlwt.Workbook(); wb.add_sheet('Sheet'); wb.save('${LOCAL_FILE}')" >&2
 	else
-		echo "Downloading ${LOCAL_FILE}..."
-		wget -q --random-wait -O "${LOCAL_FILE}" "${URL_BASE}/${YEAR}/${REMOTE_FILE}"
+		echo "Downloading ${LOCAL_FILE}..." >&2
+		echo "${URL_BASE}/${YEAR}/${REMOTE_FILE} ${LOCAL_FILE}"
 	fi
-done
+done | python ../fetcher.py >/dev/null
 
 CURRENT_YEAR=$(date +"%Y")
 if [[ "${YEAR}" == "${CURRENT_YEAR}" ]]; then
@@ -31,21 +31,23 @@ read_array() {
 [ -e "./codes.txt" ] && read_array "./codes.txt"
 
 # Download zip files (see also http://cvmweb.cvm.gov.br/SWB/Sistemas/SCW/CPublica/CConsolFdo/FormBuscaParticFdo.aspx)
+URL_BASE=https://dados.cvm.gov.br/dados/FI/DOC/INF_DIARIO/DADOS
 if [[ $YEAR -le 2020 ]]; then
 	echo "Downloading ${YEAR}.zip fund file..."
 	ZIP_FILE="inf_diario_fi_${YEAR}.zip"
-	TIME_FLAG=""; [[ -e ${ZIP_FILE} ]] && TIME_FLAG="--time-cond ${ZIP_FILE}"
-	curl --silent ${TIME_FLAG:+${TIME_FLAG}} --remote-time --remote-name "https://dados.cvm.gov.br/dados/FI/DOC/INF_DIARIO/DADOS/HIST/${ZIP_FILE}"
-	unzip -q -o "${ZIP_FILE}"
+	python ../fetcher.py "${URL_BASE}/HIST/${ZIP_FILE}" "${ZIP_FILE}" >/dev/null
 else
 	echo "Downloading ${YEAR}-MM.zip fund files..."
 	LAST_MONTH=12; [[ $YEAR -eq $(date +"%Y") ]] && LAST_MONTH=$(date +"%m")
+	# Months not yet published are expected to fail, hence --keep-going
 	for MONTH in $(seq -f "%02g" "${LAST_MONTH}"); do
 		ZIP_FILE="inf_diario_fi_${YEAR}${MONTH}.zip"
-		TIME_FLAG=""; [[ -e ${ZIP_FILE} ]] && TIME_FLAG="--time-cond ${ZIP_FILE}"
-		curl --silent ${TIME_FLAG:+${TIME_FLAG}} --remote-time --remote-name --fail "https://dados.cvm.gov.br/dados/FI/DOC/INF_DIARIO/DADOS/${ZIP_FILE}" && unzip -q -o "${ZIP_FILE}"
-	done
+		echo "${URL_BASE}/${ZIP_FILE} ${ZIP_FILE}"
+	done | python ../fetcher.py --keep-going >/dev/null
 fi
+for ZIP_FILE in inf_diario_fi_"${YEAR}"*.zip; do
+	unzip -q -o "${ZIP_FILE}"
+done
 
 # Normalize CSVs according to the current format (with all columns)
 for CSV_FILE in inf_diario_fi_"${YEAR}"*.csv; do (
@@ -26,7 +26,7 @@ read_array() {
 # https://idex.jgp.com.br
 URL_BASE=https://jgp-credito-public-s3.s3.us-east-1.amazonaws.com/idex
 
+echo "Downloading ${#INDICES[@]} IDEX files..."
 for INDEX in "${INDICES[@]}"; do
-	echo "Downloading ${INDEX}.xlsx..."
-	wget -q --random-wait -O "${INDEX}.xlsx" "${URL_BASE}/idex_${INDEX}_datafile.xlsx"
-done
+	echo "${URL_BASE}/idex_${INDEX}_datafile.xlsx ${INDEX}.xlsx"
+done | python ../fetcher.py >/dev/null
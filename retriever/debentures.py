@@ -1,18 +1,63 @@
 import glob
+import logging
 import re
 
+import numpy as np
 import pandas as pd
 
+from utils.instrumentation import increment, timed
+
 from .retriever import ValueRetriever
 
+logger = logging.getLogger(__name__)
+
+
+# Columns of the PU files kept (by position) and their names
+PU_COLUMNS = {0: "Data", 5: "PU_Curva"}
+
+
+def mark_series(df: pd.DataFrame, max_trade_age: int | None) -> pd.Series:
+    """
+    Return the mark of a debenture on each day of its data: the average
+    price of the last trade, or the theoretical (curve) price when the last
+    trade is more than max_trade_age days old.  The trade price is used
+    whenever there is no curve price, and always if max_trade_age is None.
+    """
+    trades = df["PU_Medio"]
+    if max_trade_age is None or "PU_Curva" not in df.columns:
+        return trades.dropna()
+
+    trade_days = pd.Series(df.index.where(trades.notna()), index=df.index).ffill()
+    ages = (df.index - pd.DatetimeIndex(trade_days)).days
+    curve = df["PU_Curva"]
+    use_trade = (ages <= max_trade_age) | curve.isna()
+    return trades.ffill().where(use_trade, curve).dropna()
+
 
 class DebenturesRetriever(ValueRetriever):
-    def __init__(self):
-        ValueRetriever.__init__(self, "debentures")
+    """
+    Debenture prices from secondary market trades (NEG files) and from the
+    theoretical curve (PU files), joined by day in one frame per debenture.
+
+    Illiquid debentures are marked to the curve: the value of a debenture on
+    a day is the average price of its last trade, unless that trade is more
+    than max_trade_age days old, in which case the curve price is used.
+    """
+
+    def __init__(
+        self, data_directory: str | None = None, max_trade_age: int | None = 7
+    ):
+        ValueRetriever.__init__(self, "debentures", data_directory)
+        self.max_trade_age: int | None = max_trade_age
+        self._marks: dict[str, pd.Series] = {}
         self.check_and_update_data()
 
     def _get_data_file_patterns(self):
-        return [self.data_directory + "/" + code + "_NEG_%s.csv" for code in self.codes]
+        return [
+            self.data_directory + "/" + code + "_" + kind + "_%s.csv"
+            for code in self.codes
+            for kind in ("NEG", "PU")
+        ]
 
     def _available_codes(self):
         return self.codes
@@ -31,14 +76,14 @@ class DebenturesRetriever(ValueRetriever):
             "Percentual_PU_da_Curva",
         ]
 
-        self._data = {}
-        for deb in self.codes:
-            self._data[deb] = pd.DataFrame()
+        parts: dict[str, list[pd.DataFrame]] = {deb: [] for deb in self.codes}
+        pu_parts: dict[str, list[pd.DataFrame]] = {deb: [] for deb in self.codes}
 
         file_list = sorted(glob.glob(self.data_directory + "/*_NEG_*.csv"))
 
         for file_name in file_list:
-            print("Loading file %s..." % file_name)
+            logger.info("Loading file %s...", file_name)
+            increment("files_parsed", asset="debentures")
 
             reg_exp = re.search(
                 self.data_directory + r"/(.*)_NEG_\d{4}\.csv", file_name
@@ -55,10 +100,66 @@ class DebenturesRetriever(ValueRetriever):
             ).sort_index(kind="stable")
 
             if len(df) > 0:
-                self._data[deb] = pd.concat([self._data[deb], df])
+                parts.setdefault(deb, []).append(df)
+
+        file_list = sorted(glob.glob(self.data_directory + "/*_PU_*.csv"))
 
+        for file_name in file_list:
+            logger.info("Loading file %s...", file_name)
+            increment("files_parsed", asset="debentures")
+
+            reg_exp = re.search(self.data_directory + r"/(.*)_PU_\d{4}\.csv", file_name)
+            deb = reg_exp.groups()[0]
+
+            df = pd.read_csv(file_name, header=0, usecols=list(PU_COLUMNS))
+            df.columns = list(PU_COLUMNS.values())
+            df["Data"] = pd.to_datetime(df["Data"], dayfirst=True)
+            df["PU_Curva"] = pd.to_numeric(df["PU_Curva"], errors="coerce")
+            df.set_index("Data", inplace=True)
+
+            if len(df) > 0:
+                pu_parts.setdefault(deb, []).append(df)
+
+        self._data = {}
+        for deb in parts.keys() | pu_parts.keys():
+            trades = _concat_days(parts.get(deb, []))
+            curve = _concat_days(pu_parts.get(deb, []))
+            if len(curve) > 0:
+                trades = trades.join(curve, how="outer") if len(trades) else curve
+            self._data[deb] = trades
+
+    def _check_and_load_data_files(self):
+        if self._needs_to_be_loaded:
+            self._marks = {}
+        ValueRetriever._check_and_load_data_files(self)
+
+    def _value_series(self, code):
+        marks = self._marks.get(code)
+        if marks is None:
+            df = self._data[code]
+            if "PU_Medio" not in df.columns and "PU_Curva" not in df.columns:
+                marks = pd.Series(dtype=np.float64)
+            elif "PU_Medio" not in df.columns:
+                marks = df["PU_Curva"].dropna()
+            else:
+                marks = mark_series(df, self.max_trade_age)
+            self._marks[code] = marks
+        return marks
+
+    @timed("get_value")
     def get_value(self, code, date):
+        if self._grid is not None:
+            quote = self._grid.lookup(code, date)
+            if quote is not None:
+                return quote[0]
         ValueRetriever.get_value(self, code, date)
-        ts = pd.Timestamp(date)
-        asof_ts = self._data[code].index.asof(ts)
-        return self._data[code].loc[asof_ts].PU_Medio
+        marks = self._value_series(code)
+        return marks.asof(pd.Timestamp(date)) if len(marks) else float("nan")
+
+
+def _concat_days(dfs: list[pd.DataFrame]) -> pd.DataFrame:
+    # Yearly files are joined by day, keeping the last line of repeated days
+    if not dfs:
+        return pd.DataFrame()
+    df = pd.concat(dfs)
+    return df[~df.index.duplicated(keep="last")].sort_index(kind="stable")
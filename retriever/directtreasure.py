@@ -1,14 +1,97 @@
 import glob
+import logging
+import os
 import re
+from multiprocessing import get_context
+from pathlib import Path
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from utils.instrumentation import increment, span, timed
 
 from .retriever import ValueRetriever
 
+logger = logging.getLogger(__name__)
+
+NAMES = [
+    "Dia",
+    "Taxa_Compra_Manha",
+    "Taxa_Venda_Manha",
+    "PU_Compra_Manha",
+    "PU_Venda_Manha",
+    "PU_Base_Manha",
+]
+
+_regex = re.compile(r"NTN-B_Princ_([0-9]{6})")
+
+
+def _read_file(file_name: str) -> pd.DataFrame:
+    """Return the quotes of all bonds (sheets) of a Tesouro Direto XLS file."""
+    logger.info("Loading file %s...", file_name)
+
+    excel = pd.ExcelFile(file_name)
+    dfs = []
+    for sheet_name in excel.sheet_names:
+        sheet_name = str(sheet_name)
+        if sheet_name == "Sheet":
+            continue
+
+        bond_code = sheet_name.replace(" ", "_")
+        if _regex.match(bond_code):
+            bond_code = _regex.sub(r"NTN-B_Principal_\g<1>", bond_code)
+
+        df = pd.read_excel(
+            excel,
+            sheet_name=sheet_name,
+            names=NAMES,
+            parse_dates=["Dia"],
+            date_format="%d/%m/%Y",
+            skiprows=1,
+        )
+        df.drop_duplicates(subset="Dia", inplace=True)
+        df.insert(0, "Titulo", bond_code)
+        dfs.append(df)
+
+    if not dfs:
+        return pd.DataFrame(
+            {"Titulo": pd.Series(dtype=object), "Dia": pd.Series(dtype="M8[ns]")}
+            | {name: pd.Series(dtype=float) for name in NAMES[1:]}
+        )
+    return pd.concat(dfs, ignore_index=True)
+
+
+def _convert_file(file_name: str, partition_file: str) -> str:
+    # Each XLS file is parsed once (in a worker process) into a columnar
+    # partition, which is all the retriever reads afterwards
+    df = _read_file(file_name)
+    df["Dia"] = df["Dia"].astype("M8[ns]")
+    feather.write_feather(
+        pa.Table.from_pandas(df, preserve_index=False), partition_file + ".part"
+    )
+    os.replace(partition_file + ".part", partition_file)
+    return partition_file
+
+
+def _pool_size(num_files: int) -> int:
+    return max(1, min(os.cpu_count() or 1, num_files))
+
 
 class DirectTreasureRetriever(ValueRetriever):
-    def __init__(self):
-        ValueRetriever.__init__(self, "directtreasure")
+    """
+    Daily Tesouro Direto bond prices.
+
+    Each downloaded <KIND>_<year>.xls file (one sheet per bond) is converted
+    to a columnar partition in the partitions directory, and the retriever
+    only reads these partitions.  Files are converted right after being
+    downloaded, and any file newer than its partition is converted again
+    on load, with the XLS parsing spread over a process pool.
+    """
+
+    def __init__(self, data_directory: str | None = None):
+        ValueRetriever.__init__(self, "directtreasure", data_directory)
+        self.partition_directory: str = os.path.join(self.data_directory, "partitions")
         self.check_and_update_data()
 
     def _get_data_file_patterns(self):
@@ -18,52 +101,80 @@ class DirectTreasureRetriever(ValueRetriever):
         assert self._data is not None
         return self._data.keys()
 
-    def _load_data_files(self):
-        self._data = {}
-
-        names = [
-            "Dia",
-            "Taxa_Compra_Manha",
-            "Taxa_Venda_Manha",
-            "PU_Compra_Manha",
-            "PU_Venda_Manha",
-            "PU_Base_Manha",
-        ]
-
-        regex = re.compile(r"NTN-B_Princ_([0-9]{6})")
+    ##############
+    # Conversion #
+    ##############
+
+    def _partition_file(self, file_name: str) -> str:
+        return os.path.join(self.partition_directory, Path(file_name).stem + ".feather")
+
+    def _is_partition_up_to_date(self, file_name: str) -> bool:
+        partition_file = self._partition_file(file_name)
+        return os.path.isfile(partition_file) and os.path.getmtime(
+            file_name
+        ) < os.path.getmtime(partition_file)
+
+    def _convert_files(self, file_list: list[str]) -> list[str]:
+        """Convert the XLS files without an up to date partition."""
+        stale = [f for f in file_list if not self._is_partition_up_to_date(f)]
+        if not stale:
+            return []
+
+        os.makedirs(self.partition_directory, exist_ok=True)
+        args = [(f, self._partition_file(f)) for f in stale]
+        processes = _pool_size(len(stale))
+        with span("convert", asset="directtreasure"):
+            if processes == 1:
+                for arg in args:
+                    _convert_file(*arg)
+            else:
+                # Not forked: retrievers may be loaded from background threads
+                with get_context("forkserver").Pool(processes=processes) as pool:
+                    pool.starmap(_convert_file, args)
+        increment("files_parsed", len(stale), asset="directtreasure")
+        return stale
+
+    def _download_data_files(self, year):
+        ValueRetriever._download_data_files(self, year)
+        self._convert_files(
+            [
+                p % year
+                for p in self._get_data_file_patterns()
+                if os.path.isfile(p % year)
+            ]
+        )
+
+    ###########
+    # Loading #
+    ###########
 
+    def _load_data_files(self):
         file_list = sorted(glob.glob(self.data_directory + "/*.xls"))
-        for file_name in file_list:
-            print("Loading file %s..." % file_name)
+        self._convert_files(file_list)
 
-            excel = pd.ExcelFile(file_name)
-
-            for sheet_name in excel.sheet_names:
-                sheet_name = str(sheet_name)
-                if sheet_name == "Sheet":
-                    continue
-
-                bond_code = sheet_name.replace(" ", "_")
-                if regex.match(bond_code):
-                    bond_code = regex.sub(r"NTN-B_Principal_\g<1>", bond_code)
-
-                if bond_code not in self._data:
-                    self._data[bond_code] = pd.DataFrame()
+        tables = [
+            feather.read_table(self._partition_file(f)).replace_schema_metadata(None)
+            for f in file_list
+        ]
+        table = pa.concat_tables(tables, promote_options="default")
+        df = table.to_pandas()
 
-                df = pd.read_excel(
-                    excel,
-                    sheet_name=sheet_name,
-                    names=names,
-                    parse_dates=["Dia"],
-                    date_format="%d/%m/%Y",
-                    skiprows=1,
-                )
-                df.drop_duplicates(subset="Dia", inplace=True)
-                df.set_index("Dia", inplace=True)
+        # Files are sorted by kind and year, so each bond has its quotes in order
+        self._data = {
+            str(bond_code): quotes.drop(columns="Titulo").set_index("Dia")
+            for bond_code, quotes in df.groupby("Titulo", sort=False)
+        }
 
-                self._data[bond_code] = pd.concat([self._data[bond_code], df])
+    def _value_series(self, code):
+        assert self._data is not None
+        return self._data[code]["PU_Base_Manha"]
 
+    @timed("get_value")
     def get_value(self, code, day):
+        if self._grid is not None:
+            quote = self._grid.lookup(code, day)
+            if quote is not None:
+                return quote[0]
         ValueRetriever.get_value(self, code, day)
         ts = pd.Timestamp(day)
         assert self._data is not None
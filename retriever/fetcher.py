@@ -0,0 +1,425 @@
+#!/usr/bin/env python
+"""
+Pooled HTTP/FTP file fetcher.
+
+Downloads are streamed to disk over keep-alive connections that are reused
+across files of the same host.  HTTP downloads are conditional: the ETag and
+Last-Modified headers of each file are kept in a ``<file>.meta`` sidecar and
+sent back on the next request, so an unchanged remote file costs a single
+``304 Not Modified`` round trip.
+
+This module only depends on the standard library, so it can also be executed
+as a script by the ``download_*_files.sh`` scripts:
+
+    python ../fetcher.py [options] URL FILE
+    python ../fetcher.py [options] < list_of_url_and_file_pairs
+"""
+
+import argparse
+import ftplib
+import http.client
+import json
+import os
+import ssl
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from collections import defaultdict
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from urllib.parse import urljoin, urlsplit
+
+_CHUNK_SIZE = 1 << 16
+_MAX_REDIRECTS = 5
+_REDIRECT_CODES = (301, 302, 303, 307, 308)
+_USER_AGENT = "portfolio-fetcher/0.1"
+
+
+class FetchError(Exception):
+    pass
+
+
+class _ServerError(FetchError):
+    # 5xx responses are worth retrying, unlike other failed requests
+    pass
+
+
+def _meta_file_name(file_name: str) -> str:
+    return file_name + ".meta"
+
+
+def _read_meta(file_name: str) -> dict[str, str]:
+    # Validators are only meaningful if the file they describe is still there
+    if not os.path.isfile(file_name) or os.stat(file_name).st_size == 0:
+        return {}
+    try:
+        with open(_meta_file_name(file_name)) as meta_file:
+            return json.load(meta_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_meta(file_name: str, headers: http.client.HTTPMessage) -> None:
+    meta = {
+        key: headers[header]
+        for key, header in (("etag", "ETag"), ("last_modified", "Last-Modified"))
+        if headers[header] is not None
+    }
+    if meta:
+        with open(_meta_file_name(file_name), "w") as meta_file:
+            json.dump(meta, meta_file)
+    elif os.path.exists(_meta_file_name(file_name)):
+        # Validators of a previous version do not describe the new file
+        os.remove(_meta_file_name(file_name))
+
+
+def _conditional_headers(file_name: str) -> dict[str, str]:
+    """Return the headers that make a request for file_name conditional."""
+    headers = {}
+    meta = _read_meta(file_name)
+    if "etag" in meta:
+        headers["If-None-Match"] = meta["etag"]
+    if "last_modified" in meta:
+        headers["If-Modified-Since"] = meta["last_modified"]
+    elif os.path.isfile(file_name) and os.stat(file_name).st_size > 0:
+        mtime = os.path.getmtime(file_name)
+        headers["If-Modified-Since"] = formatdate(mtime, usegmt=True)
+    return headers
+
+
+class _Stream:
+    """Write chunks into a temporary file that atomically replaces the target."""
+
+    def __init__(self, file_name: str, gzipped: bool = False):
+        self.file_name: str = file_name
+        directory = os.path.dirname(os.path.abspath(file_name))
+        fd, self.temp_name = tempfile.mkstemp(dir=directory, suffix=".part")
+        self.file = os.fdopen(fd, "wb")
+        self.decoder = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+
+    def write(self, chunk: bytes) -> None:
+        if self.decoder is not None:
+            chunk = self.decoder.decompress(chunk)
+        self.file.write(chunk)
+
+    def commit(self) -> None:
+        if self.decoder is not None:
+            self.file.write(self.decoder.flush())
+        self.file.close()
+        os.replace(self.temp_name, self.file_name)
+
+    def abort(self) -> None:
+        self.file.close()
+        if os.path.exists(self.temp_name):
+            os.remove(self.temp_name)
+
+
+class Fetcher:
+    """
+    Download files reusing one connection per host and worker thread.
+
+    Connections are kept in a pool keyed by (scheme, host, port).  A worker
+    takes a connection from the pool, performs one request on it and gives it
+    back, so a batch of N files from the same host needs only as many TCP/TLS
+    handshakes as there are concurrent workers.
+    """
+
+    def __init__(
+        self,
+        verify: bool = True,
+        timeout: float = 60.0,
+        retries: int = 3,
+        workers: int = 4,
+    ):
+        self.timeout: float = timeout
+        self.retries: int = retries
+        self.workers: int = workers
+        self._ssl_context: ssl.SSLContext = ssl.create_default_context()
+        if not verify:
+            self._ssl_context.check_hostname = False
+            self._ssl_context.verify_mode = ssl.CERT_NONE
+        self._idle: dict[tuple[str, str, int], list] = defaultdict(list)
+        self._lock: threading.Lock = threading.Lock()
+        self.connections_opened: int = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            idle = [conn for conns in self._idle.values() for conn in conns]
+            self._idle.clear()
+        for conn in idle:
+            self._close_connection(conn)
+
+    def fetch(self, url: str, file_name: str, skip_existing: bool = False) -> bool:
+        """
+        Download url into file_name.
+
+        Returns True if the file was (re)written and False if the local copy
+        was kept, either because the server answered "Not Modified" or because
+        skip_existing was set and the file already exists.
+        """
+        if skip_existing and os.path.isfile(file_name):
+            return False
+
+        for attempt in range(self.retries):
+            try:
+                if urlsplit(url).scheme == "ftp":
+                    return self._fetch_ftp(url, file_name)
+                return self._fetch_http(url, file_name)
+            except (
+                OSError,
+                http.client.HTTPException,
+                ftplib.error_temp,
+                _ServerError,
+            ) as e:
+                if attempt + 1 == self.retries:
+                    raise FetchError(f"Error fetching {url}: {e!r}") from e
+                time.sleep(0.5 * 2**attempt)
+        raise Exception(f"No attempt to fetch {url} with retries={self.retries}")
+
+    def fetch_many(
+        self,
+        items: Iterable[tuple[str, str]],
+        skip_existing: bool = False,
+        keep_going: bool = False,
+    ) -> tuple[list[str], dict[str, FetchError]]:
+        """
+        Download (url, file_name) pairs concurrently.
+
+        Returns the list of updated file names and a mapping from file name to
+        error for the downloads that failed.  Unless keep_going is set, the
+        first error is raised once all the other downloads are finished.
+        """
+        items = list(items)
+        updated: list[str] = []
+        errors: dict[str, FetchError] = {}
+
+        def task(item: tuple[str, str]) -> None:
+            url, file_name = item
+            try:
+                if self.fetch(url, file_name, skip_existing):
+                    updated.append(file_name)
+            except FetchError as e:
+                errors[file_name] = e
+
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as executor:
+            list(executor.map(task, items))
+
+        if errors and not keep_going:
+            raise next(iter(errors.values()))
+        order = {file_name: i for i, (_, file_name) in enumerate(items)}
+        return sorted(updated, key=order.__getitem__), errors
+
+    ########
+    # HTTP #
+    ########
+
+    def _fetch_http(self, url: str, file_name: str) -> bool:
+        headers = {
+            "Accept-Encoding": "gzip",
+            "Connection": "keep-alive",
+            "User-Agent": _USER_AGENT,
+            **_conditional_headers(file_name),
+        }
+
+        for _ in range(_MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            path = parts.path or "/"
+            if parts.query:
+                path += "?" + parts.query
+
+            key, conn = self._acquire(parts.scheme, parts.hostname, parts.port)
+            try:
+                response = self._request(conn, path, headers)
+            except Exception:
+                self._close_connection(conn)
+                raise
+
+            if response.status in _REDIRECT_CODES:
+                response.read()
+                self._release(key, conn, response)
+                location = response.getheader("Location")
+                if location is None:
+                    raise FetchError(f"Redirect without location: {url}")
+                url = urljoin(url, location)
+                continue
+
+            if response.status == 304:
+                response.read()
+                self._release(key, conn, response)
+                # Refresh timestamp so that is_file_up_to_date() sees the file as current
+                os.utime(file_name, None)
+                return False
+
+            if response.status != 200:
+                response.read()
+                self._release(key, conn, response)
+                error = _ServerError if response.status >= 500 else FetchError
+                raise error(f"HTTP {response.status} fetching {url}")
+
+            self._save(key, conn, response, file_name)
+            return True
+
+        raise FetchError(f"Too many redirects fetching {url}")
+
+    def _save(
+        self,
+        key: tuple[str, str, int],
+        conn: http.client.HTTPConnection,
+        response: http.client.HTTPResponse,
+        file_name: str,
+    ) -> None:
+        """Stream the body of response into file_name, with its validators."""
+        gzipped = response.getheader("Content-Encoding", "").lower() == "gzip"
+        stream = _Stream(file_name, gzipped)
+        try:
+            while chunk := response.read(_CHUNK_SIZE):
+                stream.write(chunk)
+            stream.commit()
+        except Exception:
+            stream.abort()
+            self._close_connection(conn)
+            raise
+        self._release(key, conn, response)
+        _write_meta(file_name, response.msg)
+
+    def _request(
+        self, conn: http.client.HTTPConnection, path: str, headers: dict[str, str]
+    ) -> http.client.HTTPResponse:
+        try:
+            conn.request("GET", path, headers=headers)
+            return conn.getresponse()
+        except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+            # Idle keep-alive connection was dropped by the server: reconnect once
+            conn.close()
+            conn.request("GET", path, headers=headers)
+            return conn.getresponse()
+
+    #######
+    # FTP #
+    #######
+
+    def _fetch_ftp(self, url: str, file_name: str) -> bool:
+        parts = urlsplit(url)
+        key, ftp = self._acquire(parts.scheme, parts.hostname, parts.port)
+        stream = _Stream(file_name)
+        try:
+            ftp.retrbinary("RETR " + parts.path, stream.write, blocksize=_CHUNK_SIZE)
+            stream.commit()
+        except ftplib.error_perm as e:
+            # Permanent errors (e.g. missing file) leave the session usable
+            stream.abort()
+            self._release(key, ftp)
+            raise FetchError(f"FTP error fetching {url}: {e}") from e
+        except Exception:
+            stream.abort()
+            self._close_connection(ftp)
+            raise
+        self._release(key, ftp)
+        return True
+
+    ###################
+    # Connection pool #
+    ###################
+
+    def _acquire(self, scheme: str, host: str | None, port: int | None):
+        assert host is not None, "URL without host"
+        default_ports = {"http": 80, "https": 443, "ftp": 21}
+        if scheme not in default_ports:
+            raise FetchError(f"Unsupported URL scheme: {scheme}")
+        key = (scheme, host, port or default_ports[scheme])
+
+        with self._lock:
+            if self._idle[key]:
+                return key, self._idle[key].pop()
+            self.connections_opened += 1
+
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(
+                host, key[2], timeout=self.timeout, context=self._ssl_context
+            )
+        elif scheme == "http":
+            conn = http.client.HTTPConnection(host, key[2], timeout=self.timeout)
+        else:
+            conn = ftplib.FTP(timeout=self.timeout)
+            conn.connect(host, key[2])
+            conn.login()
+        return key, conn
+
+    def _release(self, key, conn, response: http.client.HTTPResponse | None = None):
+        if response is not None and response.will_close:
+            self._close_connection(conn)
+            return
+        with self._lock:
+            self._idle[key].append(conn)
+
+    @staticmethod
+    def _close_connection(conn) -> None:
+        try:
+            conn.close()
+        except OSError:
+            pass
+
+
+def _parse_items(lines: Iterable[str]) -> list[tuple[str, str]]:
+    items = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        url, file_name = line.split(maxsplit=1)
+        items.append((url, file_name))
+    return items
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Download files over pooled keep-alive connections"
+    )
+    parser.add_argument("url", nargs="?", help="URL to download")
+    parser.add_argument("file", nargs="?", help="Output file")
+    parser.add_argument(
+        "--insecure", action="store_true", help="Do not verify TLS certificates"
+    )
+    parser.add_argument(
+        "--skip-existing", action="store_true", help="Do not refetch existing files"
+    )
+    parser.add_argument(
+        "--keep-going", action="store_true", help="Ignore failed downloads"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=4, help="Concurrent downloads (default: 4)"
+    )
+    args = parser.parse_args(argv)
+
+    if args.url is not None:
+        if args.file is None:
+            parser.error("FILE is required when URL is given")
+        items = [(args.url, args.file)]
+    else:
+        items = _parse_items(sys.stdin)
+
+    with Fetcher(verify=not args.insecure, workers=args.workers) as fetcher:
+        updated, errors = fetcher.fetch_many(
+            items, skip_existing=args.skip_existing, keep_going=True
+        )
+
+    # Updated files are written to stdout so that scripts can post-process them
+    for file_name in updated:
+        print(file_name)
+    for file_name, error in errors.items():
+        print(f"Could not download {file_name}: {error}", file=sys.stderr)
+
+    return 0 if args.keep_going or not errors else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,15 @@
 import glob
+import logging
 import re
 
 import pandas as pd
 
+from utils.instrumentation import increment, timed
+
 from .retriever import ValueRetriever
 
+logger = logging.getLogger(__name__)
+
 
 class FundsInfo:
     def __init__(self, codes_file: str):
@@ -27,8 +32,8 @@ class FundsInfo:
 class FundRetriever(ValueRetriever):
     _regex = re.compile(r"(\.|/|-)")
 
-    def __init__(self):
-        ValueRetriever.__init__(self, "fund")
+    def __init__(self, data_directory: str | None = None):
+        ValueRetriever.__init__(self, "fund", data_directory)
         self.funds_info: FundsInfo = FundsInfo(self.data_directory + "/codes.txt")
         self.check_and_update_data()
 
@@ -42,7 +47,7 @@ class FundRetriever(ValueRetriever):
         return [FundRetriever._regex.sub("", code) for code in self.codes]
 
     def _load_data_files(self):
-        self._data = {}
+        parts: dict[str, list[pd.DataFrame]] = {}
 
         names = [
             "TP_FUNDO_CLASSE",
@@ -59,13 +64,13 @@ class FundRetriever(ValueRetriever):
 
         file_list = sorted(glob.glob(self.data_directory + "/??????????????_????.csv"))
         for file_name in file_list:
-            print("Loading file %s..." % file_name)
+            logger.info("Loading file %s...", file_name)
+            increment("files_parsed", asset="fund")
 
             # year = int(file_name.split("/")[-1][-8:-4])
             fund_cnpj = file_name.split("/")[-1][:14]
 
-            if fund_cnpj not in self._data:
-                self._data[fund_cnpj] = pd.DataFrame()
+            fund_parts = parts.setdefault(fund_cnpj, [])
 
             df = pd.read_csv(
                 file_name,
@@ -88,10 +93,25 @@ class FundRetriever(ValueRetriever):
                 df = df.query(f"ID_SUBCLASSE.isnull() or ID_SUBCLASSE=='{subclass}'")
 
             if len(df) > 0:
-                self._data[fund_cnpj] = pd.concat([self._data[fund_cnpj], df])
-                assert not any(self._data[fund_cnpj].index.duplicated())
+                fund_parts.append(df)
+
+        # Concatenate and validate each fund once, after all files are read
+        self._data = {}
+        for fund_cnpj, fund_parts in parts.items():
+            df = pd.concat(fund_parts) if fund_parts else pd.DataFrame()
+            assert not df.index.has_duplicates, f"Duplicated dates for {fund_cnpj}"
+            self._data[fund_cnpj] = df
+
+    def _value_series(self, code):
+        assert self._data is not None
+        return self._data[code]["VL_QUOTA"]
 
+    @timed("get_value")
     def get_value(self, code, date):
+        if self._grid is not None:
+            quote = self._grid.lookup(code, date)
+            if quote is not None:
+                return quote[0]
         ValueRetriever.get_value(self, code, date)
         ts = pd.Timestamp(date)
         asof_ts = self._data[code].index.asof(ts)
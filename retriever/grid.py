@@ -0,0 +1,137 @@
+"""
+Dense price grid for as-of lookups.
+
+A PriceGrid holds the quotes of a set of codes as a calendar day x code
+array, forward filled from the last quote, along with the age (in days) of
+the quote used for each cell.  An as-of lookup is then a single array access.
+"""
+
+from collections.abc import Sequence
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+
+def _ordinal(day: str | date) -> int:
+    if isinstance(day, str):
+        return date.fromisoformat(day).toordinal()
+    return day.toordinal()
+
+
+class PriceGrid:
+    __slots__ = ("first_day", "codes", "columns", "values", "ages")
+
+    def __init__(
+        self,
+        first_day: date,
+        codes: Sequence[str],
+        values: np.ndarray,
+        ages: np.ndarray,
+    ):
+        assert values.shape == ages.shape == (values.shape[0], len(codes))
+        self.first_day: int = first_day.toordinal()
+        self.codes: list[str] = list(codes)
+        self.columns: dict[str, int] = {code: i for i, code in enumerate(self.codes)}
+        # Quote of the last trading day up to each day (NaN before the first one)
+        self.values: np.ndarray = values
+        # Days since that quote (-1 before the first one)
+        self.ages: np.ndarray = ages
+
+    @classmethod
+    def from_records(
+        cls,
+        days: np.ndarray,
+        columns: np.ndarray,
+        values: np.ndarray,
+        codes: Sequence[str],
+    ) -> "PriceGrid":
+        """
+        Build a grid from quote records: the day (datetime64), the code (as an
+        index into codes) and the value of each quote.  For repeated days of
+        a code, the last record wins.
+        """
+        days = days.astype("datetime64[D]")
+        first = days.min()
+        rows = (days - first).astype(np.int64)
+        shape = (int(rows.max()) + 1, len(codes))
+
+        # Index of the last record up to each day, forward filled along days
+        last = np.full(shape, -1, dtype=np.int64)
+        last[rows, columns] = np.arange(len(rows))
+        np.maximum.accumulate(last, axis=0, out=last)
+
+        found = last >= 0
+        grid_values = np.full(shape, np.nan)
+        grid_values[found] = values[last[found]]
+        ages = np.full(shape, -1, dtype=np.int32)
+        ages[found] = np.nonzero(found)[0] - rows[last[found]]
+        return cls(pd.Timestamp(first).date(), codes, grid_values, ages)
+
+    @classmethod
+    def from_series(cls, series: dict[str, pd.Series]) -> "PriceGrid":
+        """Build a grid from a series of quotes (indexed by day) per code."""
+        codes = [code for code, s in series.items() if len(s) > 0]
+        assert codes, "No quotes"
+        return cls.from_records(
+            np.concatenate([series[code].index.values for code in codes]),
+            np.concatenate(
+                [np.full(len(series[code]), i) for i, code in enumerate(codes)]
+            ),
+            np.concatenate([series[code].to_numpy(np.float64) for code in codes]),
+            codes,
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + self.ages.nbytes
+
+    @property
+    def last_day(self) -> date:
+        return date.fromordinal(self.first_day + len(self.values) - 1)
+
+    def take(
+        self, codes: Sequence[str], days: Sequence[date] | pd.DatetimeIndex
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Return the values and ages of the given codes (columns) on the given
+        days (rows), all at once.  Cells without a quote are NaN, aged -1.
+        """
+        columns = [self.columns[code] for code in codes]
+        first_day = np.datetime64(date.fromordinal(self.first_day), "D")
+        rows = (np.asarray(days, dtype="datetime64[D]") - first_day).astype(np.int64)
+        last_row = len(self.values) - 1
+        clipped = np.clip(rows, 0, last_row)
+        values = self.values[np.ix_(clipped, columns)]
+        ages = self.ages[np.ix_(clipped, columns)].astype(np.int64)
+
+        # Quotes are carried forward after the end of the grid
+        quoted = ages >= 0
+        ages += np.where(quoted, np.maximum(rows - last_row, 0)[:, None], 0)
+        missing = (rows < 0)[:, None] | ~quoted
+        values[missing] = np.nan
+        ages[missing] = -1
+        return values, ages
+
+    def lookup(self, code: str, day: str | date) -> tuple[float, int] | None:
+        """
+        Return the last quote of code up to day and its age in days, or None
+        if the code is not in the grid or has no quote up to day.
+        """
+        column = self.columns.get(code)
+        if column is None:
+            return None
+        row = _ordinal(day) - self.first_day
+        if row < 0:
+            return None
+        last_row = len(self.values) - 1
+        if row > last_row:
+            # Quotes are carried forward after the end of the grid
+            age = int(self.ages[last_row, column])
+            if age < 0:
+                return None
+            return float(self.values[last_row, column]), age + row - last_row
+        age = int(self.ages[row, column])
+        if age < 0:
+            return None
+        return float(self.values[row, column]), age
@@ -0,0 +1,83 @@
+import logging
+
+import pandas as pd
+
+from utils.instrumentation import increment
+
+from .retriever import IndexLevelRetriever
+
+logger = logging.getLogger(__name__)
+
+# Accepted header names (lower case) of the columns that are kept
+COLUMNS = {
+    "day": ("data", "date"),
+    "level": ("número índice", "numero indice", "índice", "indice", "index"),
+    "spread": ("spread", "spread (%)"),
+    "duration": ("duration", "duration (anos)"),
+}
+
+
+def _parse_datafile(raw: pd.DataFrame) -> pd.DataFrame:
+    """
+    Return the daily levels (and spreads and durations, if present) of an
+    IDEX data file sheet, read without header: title lines above the
+    header line and notes below the series are dropped.
+    """
+    labels = raw.apply(lambda col: col.astype(str).str.strip().str.lower())
+    header = labels.isin(COLUMNS["day"]).any(axis=1)
+    assert header.any(), "Missing IDEX header line"
+    row = header.idxmax()
+
+    columns = {}
+    for name, aliases in COLUMNS.items():
+        matches = [col for col in raw.columns if labels.at[row, col] in aliases]
+        if matches:
+            columns[name] = matches[0]
+    assert "level" in columns, "Missing IDEX level column"
+
+    df = pd.DataFrame(
+        {name: raw[col].loc[row + 1 :] for name, col in columns.items()}
+    ).reset_index(drop=True)
+    df["day"] = pd.to_datetime(df["day"], dayfirst=True, errors="coerce")
+    for col in df.columns.drop("day"):
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+
+    df.dropna(subset=["day", "level"], inplace=True)
+    df.drop_duplicates(subset="day", keep="last", inplace=True)
+    df.set_index("day", inplace=True)
+    df.sort_index(inplace=True)
+    return df
+
+
+class IdexRetriever(IndexLevelRetriever):
+    """
+    Daily numbers of the JGP IDEX credit indices (IDEX-CDI, IDEX-INFRA...).
+
+    Each index has a single data file (<INDEX>.xlsx) with its whole history,
+    which is parsed once into the cache file of the index.
+    """
+
+    def __init__(self, data_directory: str | None = None):
+        IndexLevelRetriever.__init__(self, "idex", data_directory)
+        self.check_and_update_data()
+
+    def _get_data_file_patterns(self):
+        return [self.data_directory + "/" + code + ".xlsx" for code in self.codes]
+
+    def _available_codes(self):
+        return self.codes
+
+    def _load_data_files(self):
+        data: dict[str, pd.DataFrame] = {}
+        for code in self.codes:
+            file_name = self.data_directory + "/" + code + ".xlsx"
+            logger.info("Loading file %s...", file_name)
+            increment("files_parsed", asset="idex")
+
+            raw = pd.read_excel(file_name, header=None, engine="openpyxl")
+            data[code] = _parse_datafile(raw)
+
+        self._data = data
+
+    def __repr__(self):
+        return "IdexRetriever()"
@@ -1,45 +1,177 @@
+import glob
 import inspect
+import logging
 import os
+from collections.abc import Iterable
+from datetime import date, datetime
 
 import pandas as pd
-from playwright.sync_api import sync_playwright
+
+from utils.instrumentation import increment, span
 
 from .retriever import is_file_up_to_date
 
+logger = logging.getLogger(__name__)
+
+COLUMNS = ["code", "name", "stockType", "quantity", "part"]
+
+
+def _read_composition_file(file_name: str) -> pd.DataFrame:
+    # Title lines and the column header are skipped, and the two footer lines
+    # (total quantity and reductor) are dropped after parsing, so that the
+    # fast C parser can be used instead of skipfooter
+    df = pd.read_csv(
+        file_name,
+        header=0,
+        names=COLUMNS + [""],
+        skiprows=2,
+        dtype=str,
+    ).iloc[:-2, :-1]
+    df.reset_index(drop=True, inplace=True)
+    for col in ("quantity", "part"):
+        df[col] = pd.to_numeric(df[col].str.replace(",", ""))
+    df["part"] /= 100.0
+    return df
+
 
 class IndexRetriever:
+    """
+    Compositions of B3 indices.
+
+    Each downloaded composition is stored as a dated partition (one feather
+    file per index and day) in the compositions directory, so past
+    compositions remain available.  Compositions already read are served
+    from memory, and stale indices are downloaded in a single browser session.
+    """
+
     __base_URL = "https://sistemaswebb3-listados.b3.com.br/indexPage/day"
 
-    def __init__(self):
-        module_file = inspect.getfile(inspect.currentframe())
-        module_dir = os.path.dirname(os.path.abspath(module_file))
-        self.data_directory = module_dir + "/data_index"
-
-    def get_composition(self, index):
-        assert isinstance(index, str)
-        assert len(index) == 4
-
-        url = f"{IndexRetriever.__base_URL}/{index}?language=en-us"
-        file_name = os.path.join(self.data_directory, f"{index}.csv")
-
-        if not is_file_up_to_date(file_name):
-            with sync_playwright() as p:
-                page = p.firefox.launch().new_page()
-                page.goto(url)
-                with page.expect_download() as download:
-                    page.get_by_text("Download").click()
-                download.value.save_as(file_name)
-            assert is_file_up_to_date(file_name)
-
-        columns = ["code", "name", "stockType", "quantity", "part"]
-        df = pd.read_csv(
-            file_name,
-            engine="python",
-            header=0,
-            names=columns + [""],
-            skiprows=2,
-            skipfooter=2,
-        ).iloc[:, :-1]
-        df["part"] /= 100.0
-
-        return df.to_dict("records")
+    def __init__(self, data_directory: str | None = None, base_url: str | None = None):
+        if data_directory is None:
+            module_file = inspect.getfile(inspect.currentframe())
+            module_dir = os.path.dirname(os.path.abspath(module_file))
+            data_directory = module_dir + "/data_index"
+        self.data_directory: str = data_directory
+        self.store_directory: str = os.path.join(data_directory, "compositions")
+        self.base_url: str = base_url or IndexRetriever.__base_URL
+
+        self._frames: dict[tuple[str, date], pd.DataFrame] = {}
+        self._records: dict[tuple[str, date], list[dict]] = {}
+        self._days: dict[str, list[date]] = {}
+
+    def _file_name(self, index: str) -> str:
+        return os.path.join(self.data_directory, f"{index}.csv")
+
+    def _partition_file(self, index: str, day: date) -> str:
+        return os.path.join(self.store_directory, f"{index}_{day:%Y-%m-%d}.feather")
+
+    ############
+    # Download #
+    ############
+
+    def refresh(self, indices: Iterable[str]) -> list[str]:
+        """Download the compositions that are not up to date and store them."""
+        stale = [i for i in indices if not is_file_up_to_date(self._file_name(i))]
+        if stale:
+            self._download_files(stale)
+            for index in stale:
+                self._store(index)
+        return stale
+
+    def _download_files(self, indices: list[str]) -> None:
+        # Playwright is only needed (and imported) when files must be downloaded
+        from playwright.sync_api import sync_playwright
+
+        logger.info("Downloading compositions of %s...", ", ".join(indices))
+        with span("download", asset="index"), sync_playwright() as p:
+            browser = p.firefox.launch()
+            try:
+                page = browser.new_page()
+                for index in indices:
+                    page.goto(f"{self.base_url}/{index}?language=en-us")
+                    with page.expect_download() as download:
+                        page.get_by_text("Download").click()
+                    download.value.save_as(self._file_name(index))
+                    assert is_file_up_to_date(self._file_name(index))
+            finally:
+                browser.close()
+        increment("files_downloaded", len(indices), asset="index")
+
+    #########
+    # Store #
+    #########
+
+    def _store(self, index: str) -> date:
+        """Store the downloaded composition of index in the partition of its day."""
+        file_name = self._file_name(index)
+        file_ts = os.path.getmtime(file_name)
+        day = date.fromtimestamp(file_ts)
+        partition_file = self._partition_file(index, day)
+        if (
+            os.path.isfile(partition_file)
+            and os.path.getmtime(partition_file) >= file_ts
+        ):
+            return day
+
+        logger.info("Loading file %s...", file_name)
+        increment("files_parsed", asset="index")
+        df = _read_composition_file(file_name)
+        os.makedirs(self.store_directory, exist_ok=True)
+        df.to_feather(partition_file + ".part")
+        os.replace(partition_file + ".part", partition_file)
+
+        self._frames.pop((index, day), None)
+        self._records.pop((index, day), None)
+        self._days.pop(index, None)
+        return day
+
+    def available_days(self, index: str) -> list[date]:
+        """Return the days of the stored compositions of index."""
+        days = self._days.get(index)
+        if days is None:
+            files = glob.glob(os.path.join(self.store_directory, f"{index}_*.feather"))
+            prefix, suffix = len(index) + 1, len(".feather")
+            days = sorted(
+                datetime.strptime(
+                    os.path.basename(f)[prefix:-suffix], "%Y-%m-%d"
+                ).date()
+                for f in files
+            )
+            self._days[index] = days
+        return days
+
+    def _composition_day(self, index: str, day: str | date | None) -> date:
+        assert isinstance(index, str) and index.isalnum(), "Invalid index: %s" % index
+        if day is None:
+            self.refresh([index])
+            return self._store(index)
+
+        if isinstance(day, str):
+            day = date.fromisoformat(day)
+        days = [d for d in self.available_days(index) if d <= day]
+        assert days, f"No composition of {index} up to {day}"
+        return days[-1]
+
+    def get_composition_frame(
+        self, index: str, day: str | date | None = None
+    ) -> pd.DataFrame:
+        """
+        Return the composition of index on the given day (the last one stored
+        up to that day), or the current one.  The frame is shared between
+        calls and must not be modified.
+        """
+        key = (index, self._composition_day(index, day))
+        df = self._frames.get(key)
+        if df is None:
+            df = pd.read_feather(self._partition_file(*key))
+            self._frames[key] = df
+        return df
+
+    def get_composition(self, index: str, day: str | date | None = None) -> list[dict]:
+        key = (index, self._composition_day(index, day))
+        records = self._records.get(key)
+        if records is None:
+            records = self.get_composition_frame(index, key[1]).to_dict("records")
+            self._records[key] = records
+        # Callers get their own records, which they may modify
+        return [dict(record) for record in records]
@@ -1,15 +1,20 @@
 import glob
+import logging
 from datetime import datetime, timedelta
 
 import pandas as pd
 
+from utils.instrumentation import increment, timed
+
 from .retriever import VariationRetriever
 
+logger = logging.getLogger(__name__)
+
 
 class IPCARetriever(VariationRetriever):
-    def __init__(self):
+    def __init__(self, data_directory: str | None = None):
         self._data = None
-        VariationRetriever.__init__(self, "ipca")
+        VariationRetriever.__init__(self, "ipca", data_directory)
         # self.check_and_update_data()
 
     def _get_data_file_patterns(self):
@@ -21,10 +26,11 @@ class IPCARetriever(VariationRetriever):
     def _load_data_files(self):
         file_list = sorted(glob.glob(self.data_directory + "/IPCA_*.csv"))
 
-        data = pd.DataFrame()
+        df_list: list[pd.DataFrame] = []
 
         for file_name in file_list:
-            print("Loading file %s..." % file_name)
+            logger.info("Loading file %s...", file_name)
+            increment("files_parsed", asset="ipca")
 
             df = pd.read_csv(
                 file_name,
@@ -34,10 +40,13 @@ class IPCARetriever(VariationRetriever):
                 index_col=["date"],
             )
 
-            data = pd.concat([data, df])
+            df_list.append(df)
+
+        data = pd.concat(df_list)
 
         self._data = {"ipca": data}
 
+    @timed("get_variation")
     def get_variation(self, code, begin_date, end_date):
         VariationRetriever.get_variation(self, code, begin_date, end_date)
 
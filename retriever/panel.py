@@ -0,0 +1,170 @@
+"""
+Aligned price panels across value retrievers.
+
+A PricePanel builds a single days x securities frame of prices (stock quotes,
+fund quotas, treasure bond and debenture unit prices), forward filled from
+the last quote, with one vectorized pass per retriever over its price grid
+(see retriever.grid).  Assembled panels can be cached on disk, keyed by their
+request and by the load time of the retrievers used.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from collections.abc import Iterable
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from utils.instrumentation import span
+
+from .registry import RetrieverRegistry
+from .retriever import ValueRetriever
+
+logger = logging.getLogger(__name__)
+
+# Registry names of the value retrievers, in the order names are resolved
+SOURCES = ["bovespa", "fund", "directtreasure", "debentures"]
+
+
+def _to_date(day: str | date) -> date:
+    if isinstance(day, str):
+        return date.fromisoformat(day)
+    return date(day.year, day.month, day.day)
+
+
+class PricePanel:
+    def __init__(
+        self,
+        registry: RetrieverRegistry | None = None,
+        cache_directory: str | None = None,
+        sources: Iterable[str] = SOURCES,
+    ):
+        if registry is None:
+            import retriever
+
+            registry = retriever.registry
+        self.registry: RetrieverRegistry = registry
+        self.cache_directory: str | None = cache_directory
+        self.sources: list[str] = list(sources)
+
+    def source_of(self, instance: object) -> str | None:
+        """Return the registry name of a retriever instance, if it is a source."""
+        for source in self.sources:
+            if (
+                self.registry.is_loaded(source)
+                and self.registry.get(source) is instance
+            ):
+                return source
+        return None
+
+    def resolve(self, names: Iterable[str]) -> dict[str, str]:
+        """Return the source of each security name (the first one quoting it)."""
+        sources = {}
+        pending = set(names)
+        for source in self.sources:
+            if not pending:
+                break
+            codes = set(map(str, self.registry.get(source)._available_codes()))
+            for name in pending & codes:
+                sources[name] = source
+            pending -= codes
+        assert not pending, "Unknown securities: %s" % sorted(pending)
+        return sources
+
+    def days(
+        self, start: str | date, end: str | date, calendar: str | None = None
+    ) -> pd.DatetimeIndex:
+        """Return the calendar days (or business days of calendar) of the panel."""
+        start, end = _to_date(start), _to_date(end)
+        if calendar is None:
+            return pd.date_range(start, end, freq="D", name="day")
+        from utils.calendars import get_calendar
+
+        return pd.DatetimeIndex(get_calendar(calendar).seq(start, end), name="day")
+
+    def build(
+        self,
+        names: Iterable[str],
+        start: str | date,
+        end: str | date,
+        calendar: str | None = None,
+        max_age: int | None = None,
+        sources: dict[str, str] | None = None,
+    ) -> pd.DataFrame:
+        """
+        Return the prices of the given securities (columns) on each day from
+        start to end (rows).  Days before the first quote of a security, and
+        quotes older than max_age days if given, are NaN.  Sources map names
+        to retrievers and are resolved from the quoted codes if not given.
+        """
+        names = list(dict.fromkeys(names))
+        if sources is None:
+            sources = self.resolve(names)
+        days = self.days(start, end, calendar)
+
+        cache_file = self._cache_file(names, sources, days, calendar, max_age)
+        if cache_file is not None and os.path.isfile(cache_file):
+            logger.info("Loading price panel from %s...", cache_file)
+            return pd.read_feather(cache_file).set_index("day")
+
+        with span("panel_build"):
+            panel = self._assemble(names, sources, days, max_age)
+
+        if cache_file is not None:
+            panel.reset_index().to_feather(cache_file + ".part")
+            os.replace(cache_file + ".part", cache_file)
+        return panel
+
+    def _assemble(
+        self,
+        names: list[str],
+        sources: dict[str, str],
+        days: pd.DatetimeIndex,
+        max_age: int | None,
+    ) -> pd.DataFrame:
+        values = np.full((len(days), len(names)), np.nan)
+        positions = {name: i for i, name in enumerate(names)}
+        for source in dict.fromkeys(sources[name] for name in names):
+            codes = [name for name in names if sources[name] == source]
+            source_values, ages = self._take(source, codes, days)
+            if max_age is not None:
+                source_values[ages > max_age] = np.nan
+            values[:, [positions[code] for code in codes]] = source_values
+        return pd.DataFrame(values, index=days, columns=names)
+
+    def _take(
+        self, source: str, codes: list[str], days: pd.DatetimeIndex
+    ) -> tuple[np.ndarray, np.ndarray]:
+        dr: ValueRetriever = self.registry.get(source)
+        grid = dr.price_grid
+        if grid is None or any(code not in grid.columns for code in codes):
+            grid = dr._build_price_grid(codes)
+        return grid.take(codes, days)
+
+    def _cache_file(
+        self,
+        names: list[str],
+        sources: dict[str, str],
+        days: pd.DatetimeIndex,
+        calendar: str | None,
+        max_age: int | None,
+    ) -> str | None:
+        if self.cache_directory is None:
+            return None
+        used = sorted(set(sources[name] for name in names))
+        key = json.dumps(
+            {
+                "names": names,
+                "sources": [sources[name] for name in names],
+                "days": [str(days[0]), str(days[-1]), len(days)] if len(days) else [],
+                "calendar": calendar,
+                "max_age": max_age,
+                # Panels are rebuilt whenever a retriever reloads its data
+                "loaded": [self.registry.get(source).loaded_at for source in used],
+            }
+        )
+        digest = hashlib.sha1(key.encode(), usedforsecurity=False).hexdigest()[:16]
+        return os.path.join(self.cache_directory, "panel_%s.feather" % digest)
@@ -0,0 +1,159 @@
+"""
+Scheduled background refresh of the loaded retrievers.
+
+Each retriever is refreshed (see DataRetriever.refresh) at fixed times of the
+day, shortly after its source usually publishes new data, or at a fixed
+interval.  Refreshes run in a background thread, so readers never wait for a
+download, and the refreshed data is swapped into the retriever at once.
+"""
+
+import logging
+import threading
+import time
+from collections.abc import Callable, Iterable
+from datetime import datetime
+from datetime import time as day_time
+from datetime import timedelta
+
+from utils.instrumentation import increment, span
+
+from .registry import RetrieverRegistry
+
+logger = logging.getLogger(__name__)
+
+# Approximate local times (America/Sao_Paulo) after which each source has
+# usually published the data of the day (or of the previous business day)
+PUBLICATION_TIMES: dict[str, list[day_time]] = {
+    "anbima": [day_time(20, 0)],
+    "bcb": [day_time(9, 30)],
+    "bovespa": [day_time(20, 30)],
+    "cdi": [day_time(9, 30)],
+    "curves": [day_time(20, 30)],
+    "debentures": [day_time(21, 0)],
+    "directtreasure": [day_time(9, 30), day_time(18, 30)],
+    "fund": [day_time(8, 0)],
+    "idex": [day_time(20, 0)],
+    "ipca": [day_time(9, 30)],
+}
+
+Schedule = list[day_time] | float
+
+
+def next_run(schedule: Schedule, after: datetime) -> datetime:
+    """Return the first time after the given one matching the schedule."""
+    if isinstance(schedule, (int, float)):
+        return after + timedelta(seconds=schedule)
+    assert len(schedule) > 0
+    day = after.date()
+    while True:
+        for t in sorted(schedule):
+            candidate = datetime.combine(day, t)
+            if candidate > after:
+                return candidate
+        day += timedelta(days=1)
+
+
+class Refresher:
+    """
+    Refresh the retrievers of a registry on a schedule, in a background
+    thread.  Only retrievers already loaded are refreshed.  Listeners are
+    called with the name of each reloaded retriever.
+    """
+
+    def __init__(
+        self,
+        registry: RetrieverRegistry | None = None,
+        schedules: dict[str, Schedule] | None = None,
+        download: bool = True,
+    ):
+        if registry is None:
+            import retriever
+
+            registry = retriever.registry
+        self.registry: RetrieverRegistry = registry
+        self.schedules: dict[str, Schedule] = dict(
+            PUBLICATION_TIMES if schedules is None else schedules
+        )
+        self.download: bool = download
+        self.listeners: list[Callable[[str], None]] = []
+        self.last_refresh: dict[str, datetime] = {}
+        self.errors: dict[str, Exception] = {}
+        self._due: dict[str, datetime] = {}
+        self._locks: dict[str, threading.Lock] = {
+            name: threading.Lock() for name in self.schedules
+        }
+        self._thread: threading.Thread | None = None
+        self._stop: threading.Event = threading.Event()
+        self._wake: threading.Event = threading.Event()
+
+    def add_listener(self, listener: Callable[[str], None]) -> None:
+        self.listeners.append(listener)
+
+    def refresh(self, name: str) -> bool:
+        """Refresh a loaded retriever now and return True if it was reloaded."""
+        if not self.registry.is_loaded(name):
+            return False
+        instance = self.registry.get(name)
+        lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            start = time.perf_counter()
+            try:
+                with span("refresh", asset=name):
+                    reloaded = instance.refresh(self.download)
+            except Exception as e:
+                logger.exception("Failed to refresh %s", name)
+                self.errors[name] = e
+                return False
+            self.errors.pop(name, None)
+            self.last_refresh[name] = datetime.now()
+        if reloaded:
+            logger.info("Refreshed %s", name)
+            increment("refreshes", asset=name)
+            # Update the registry statistics
+            self.registry.add(name, instance, time.perf_counter() - start)
+            for listener in self.listeners:
+                listener(name)
+        return reloaded
+
+    def refresh_all(self, names: Iterable[str] | None = None) -> list[str]:
+        """Refresh the given (or all scheduled) retrievers, returning the reloaded ones."""
+        names = list(self.schedules if names is None else names)
+        return [name for name in names if self.refresh(name)]
+
+    def run_pending(self, now: datetime | None = None) -> list[str]:
+        """Refresh the retrievers whose scheduled time has come."""
+        if now is None:
+            now = datetime.now()
+        due = []
+        for name, schedule in self.schedules.items():
+            if name not in self._due:
+                self._due[name] = next_run(schedule, now)
+            if self._due[name] <= now:
+                due.append(name)
+                self._due[name] = next_run(schedule, now)
+        return self.refresh_all(due)
+
+    def next_due(self) -> datetime | None:
+        return min(self._due.values(), default=None)
+
+    def start(self) -> None:
+        def task() -> None:
+            while not self._stop.is_set():
+                self.run_pending()
+                due = self.next_due()
+                timeout = (
+                    60.0 if due is None else (due - datetime.now()).total_seconds()
+                )
+                self._wake.wait(max(0.0, timeout))
+                self._wake.clear()
+
+        assert self._thread is None, "Refresher already started"
+        self._thread = threading.Thread(target=task, name="refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
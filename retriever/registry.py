@@ -0,0 +1,144 @@
+import logging
+import threading
+import time
+from collections import namedtuple
+from collections.abc import Callable, Iterable
+
+from utils.instrumentation import record_time
+
+logger = logging.getLogger(__name__)
+
+RetrieverStats = namedtuple("RetrieverStats", ["name", "load_time", "memory_usage"])
+
+
+class RetrieverRegistry:
+    """
+    Process-wide registry of data retrievers.
+
+    Each retriever is built at most once, by the first thread asking for it,
+    while other threads asking for the same retriever wait for it to be ready.
+    Different retrievers are built concurrently, which allows a set of
+    retrievers (a profile) to be warmed up in background threads.
+    """
+
+    def __init__(self):
+        self._factories: dict[str, Callable[[], object]] = {}
+        self._instances: dict[str, object] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self._lock: threading.Lock = threading.Lock()
+        self.profiles: dict[str, list[str]] = {}
+        self.stats: dict[str, RetrieverStats] = {}
+        self.errors: dict[str, Exception] = {}
+
+    def register(self, name: str, factory: Callable[[], object]) -> None:
+        with self._lock:
+            assert name not in self._factories, "Retriever %s already registered" % name
+            self._factories[name] = factory
+            self._locks[name] = threading.Lock()
+
+    def register_profile(self, profile: str, names: Iterable[str]) -> None:
+        names = list(names)
+        for name in names:
+            assert name in self._factories, "Unknown retriever: %s" % name
+        self.profiles[profile] = names
+
+    @property
+    def names(self) -> list[str]:
+        return list(self._factories)
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._instances
+
+    def get(self, name: str):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        assert name in self._factories, "Unknown retriever: %s" % name
+        with self._locks[name]:
+            instance = self._instances.get(name)
+            if instance is None:
+                start = time.perf_counter()
+                try:
+                    instance = self._factories[name]()
+                except Exception as e:
+                    # Failed attempts are kept in the stats as well (with no memory)
+                    load_time = time.perf_counter() - start
+                    self.stats[name] = RetrieverStats(name, load_time, 0)
+                    self.errors[name] = e
+                    raise
+                self._store(name, instance, time.perf_counter() - start)
+        return instance
+
+    def add(self, name: str, instance: object, load_time: float = 0.0) -> None:
+        """Register an already built retriever (e.g. restored from a snapshot)."""
+        assert name in self._factories, "Unknown retriever: %s" % name
+        with self._locks[name]:
+            self._store(name, instance, load_time)
+
+    def remove(self, name: str) -> None:
+        """Drop the built retriever, if any, so that the next get() builds it again."""
+        assert name in self._factories, "Unknown retriever: %s" % name
+        with self._locks[name]:
+            self._instances.pop(name, None)
+            self.stats.pop(name, None)
+
+    def _store(self, name: str, instance: object, load_time: float) -> None:
+        record_time("retriever_build", load_time, retriever=name)
+        memory_usage = getattr(instance, "memory_usage", None)
+        self.stats[name] = RetrieverStats(
+            name, load_time, memory_usage() if memory_usage else 0
+        )
+        self.errors.pop(name, None)
+        self._instances[name] = instance
+
+    @property
+    def instances(self) -> dict[str, object]:
+        return dict(self._instances)
+
+    def preload(
+        self, profile_or_names: str | Iterable[str], wait: bool = False
+    ) -> list[threading.Thread]:
+        """
+        Build the retrievers of a profile (or a list of names) in background
+        threads, one per retriever.  Errors are kept in self.errors, and a
+        later get() tries again.  If wait is set, return when all are done.
+        """
+        if isinstance(profile_or_names, str):
+            if profile_or_names in self.profiles:
+                names = self.profiles[profile_or_names]
+            else:
+                names = [profile_or_names]
+        else:
+            names = list(profile_or_names)
+
+        def task(name: str) -> None:
+            try:
+                self.get(name)
+            except Exception:
+                logger.exception("Preloading %s failed", name)
+
+        threads = [
+            threading.Thread(
+                target=task, args=(name,), name="preload-" + name, daemon=True
+            )
+            for name in names
+            if not self.is_loaded(name)
+        ]
+        for thread in threads:
+            thread.start()
+        if wait:
+            for thread in threads:
+                thread.join()
+        return threads
+
+    def report(self) -> str:
+        lines = ["%-16s %10s %12s" % ("Retriever", "Load (s)", "Memory (MB)")]
+        for stats in sorted(self.stats.values(), key=lambda s: -s.load_time):
+            error = self.errors.get(stats.name)
+            if error is None:
+                memory = "%12.1f" % (stats.memory_usage / 2**20)
+            else:
+                memory = " failed: %r" % error
+            lines.append("%-16s %10.2f%s" % (stats.name, stats.load_time, memory))
+        return "\n".join(lines)
@@ -1,16 +1,27 @@
+import copy
 import glob
 import inspect
+import logging
 import os
 import re
 import time
 from abc import ABC, abstractmethod
+from collections import namedtuple
 from collections.abc import Iterable
-from contextlib import chdir
 from datetime import date
 from pathlib import Path
 
 import pandas as pd
-from sh import bash
+
+from utils.instrumentation import span, timed
+
+from .grid import PriceGrid
+from .schema import compact_frame, frame_memory_usage
+
+logger = logging.getLogger(__name__)
+
+# Last quote up to a day and its age in days (-1 if there is none)
+Quote = namedtuple("Quote", ["value", "age"])
 
 
 def is_file_up_to_date(file_name: str, base_year: int | None = None):
@@ -37,14 +48,16 @@ class DataRetriever(ABC):
     _initial_year: int = 2014
     _date_regex = re.compile(r"^\d{4}-\d{2}-\d{2}$")
 
-    def __init__(self, asset_type: str):
+    def __init__(self, asset_type: str, data_directory: str | None = None):
         self.asset_type: str = asset_type.lower()
 
-        frame = inspect.currentframe()
-        assert frame is not None
-        module_file = inspect.getfile(frame)
-        module_dir = os.path.dirname(os.path.abspath(module_file))
-        self.data_directory: str = module_dir + "/data_" + asset_type.lower()
+        if data_directory is None:
+            frame = inspect.currentframe()
+            assert frame is not None
+            module_file = inspect.getfile(frame)
+            module_dir = os.path.dirname(os.path.abspath(module_file))
+            data_directory = module_dir + "/data_" + asset_type.lower()
+        self.data_directory: str = data_directory
 
         self.codes: list[str] = sorted(
             line.strip().split("|")[0]
@@ -55,22 +68,75 @@ class DataRetriever(ABC):
 
         self._needs_to_be_loaded: bool = True
 
+        # Time at which the data started being loaded (see refresh)
+        self.loaded_at: float = 0.0
+
+        # Memory used by the loaded data before and after compaction (in bytes)
+        self.memory_footprint: tuple[int, int] | None = None
+
     @property
     def needs_to_be_loaded(self) -> bool:
         return self._needs_to_be_loaded
 
     def check_and_update_data(self):
-        self._check_and_download_data_files()
+        if self._check_and_download_data_files():
+            self._needs_to_be_loaded = True
         self._check_and_load_data_files()
 
-    def _check_and_download_data_files(self):
-        years: Iterable[int] = range(
-            DataRetriever._initial_year, time.localtime()[0] + 1
-        )
-        patterns = self._get_data_file_patterns()
-        tuples: list[tuple[str, int]] = [(p % y, y) for p in patterns for y in years]
+    def refresh(self, download: bool = True) -> bool:
+        """
+        Download the current year data files (if download is set) and reload
+        the data if any data file is newer than the loaded data.
+
+        The data is loaded into a copy of the retriever, whose state is then
+        swapped in at once: readers keep using the old data while the new
+        one is downloaded and parsed, and never see a partially loaded
+        retriever.  Refreshes of the same retriever must not run
+        concurrently.  Return True if the data was reloaded.
+        """
+        if download:
+            self._download_data_files(time.localtime()[0])
+            self._check_and_download_data_files()
+        if not self._needs_to_be_loaded and self._data_files_time() < self.loaded_at:
+            return False
 
-        for file_name, year in tuples:
+        staged = self._staging_copy()
+        staged._needs_to_be_loaded = True
+        staged._check_and_load_data_files()
+        self.__dict__.update(staged.__dict__)
+        return True
+
+    def _staging_copy(self) -> "DataRetriever":
+        return copy.copy(self)
+
+    def _data_file_years(self) -> list[tuple[str, int]]:
+        """
+        Return each data file along with its year.  Patterns without a year
+        (%s) stand for a single file holding the whole history, which is
+        updated as a current year file.
+        """
+        current_year = time.localtime()[0]
+        years: Iterable[int] = range(DataRetriever._initial_year, current_year + 1)
+        tuples: list[tuple[str, int]] = []
+        for pattern in self._get_data_file_patterns():
+            if "%s" in pattern:
+                tuples.extend((pattern % y, y) for y in years)
+            else:
+                tuples.append((pattern, current_year))
+        return tuples
+
+    def _data_files(self) -> list[str]:
+        return [file_name for file_name, _ in self._data_file_years()]
+
+    def _data_files_time(self) -> float:
+        """Return the modification time of the newest data file."""
+        times = [os.path.getmtime(f) for f in self._data_files() if os.path.isfile(f)]
+        return max(times, default=0.0)
+
+    def _check_and_download_data_files(self) -> bool:
+        """Download missing or outdated data files and return True if any."""
+        updated = False
+        for file_name, year in self._data_file_years():
             if is_file_up_to_date(file_name, year):
                 continue
 
@@ -79,30 +145,67 @@ class DataRetriever(ABC):
             assert is_file_up_to_date(file_name, year), (
                 "File %s was not updated!" % file_name
             )
-            self._needs_to_be_loaded = True
+            updated = True
+        return updated
 
     def _download_data_files(self, year: int) -> None:
-        print("Downloading %s data files..." % self.asset_type)
-        with chdir(self.data_directory):
-            bash(f"download_{self.asset_type}_files.sh", str(year))
-        time.sleep(5)
+        from sh import bash
+
+        logger.info("Downloading %s data files...", self.asset_type)
+        with span("download", asset=self.asset_type):
+            # Run the script in the data directory without changing the working
+            # directory of the process, which other threads may rely on
+            bash(
+                f"download_{self.asset_type}_files.sh",
+                str(year),
+                _cwd=self.data_directory,
+            )
 
     def _check_and_load_data_files(self):
         if not self._needs_to_be_loaded:
             return
 
-        if self._check_cache_files():
-            print("Loading %s from cache files..." % self.asset_type)
-            self._load_data_from_cache()
-        else:
-            print("Loading %s data files..." % self.asset_type)
-            self._load_data_files()
-            self._write_data_to_cache()
-            assert self._check_cache_files(), "Cache files not updated!"
-
-        print("Done loading %s..." % self.asset_type)
+        asset = self.asset_type
+        loaded_at = time.time()
+        with span("load", asset=asset):
+            if self._check_cache_files():
+                logger.info("Loading %s from cache files...", asset)
+                with span("cache_read", asset=asset):
+                    self._load_data_from_cache()
+                self._compact_data()
+            else:
+                logger.info("Loading %s data files...", asset)
+                with span("parse", asset=asset):
+                    self._load_data_files()
+                self._compact_data()
+                with span("cache_write", asset=asset):
+                    self._write_data_to_cache()
+                assert self._check_cache_files(), "Cache files not updated!"
+
+        logger.info("Done loading %s...", asset)
+        self.loaded_at = loaded_at
         self._needs_to_be_loaded = False
 
+    def _compact_data(self) -> None:
+        assert self._data is not None
+        with span("index_build", asset=self.asset_type):
+            before = self.memory_usage()
+            self._data = {key: compact_frame(df) for key, df in self._data.items()}
+            after = self.memory_usage()
+        self.memory_footprint = (before, after)
+        logger.info(
+            "Memory usage of %s: %.1f MB (%.1f MB before compaction)",
+            self.asset_type,
+            after / 2**20,
+            before / 2**20,
+        )
+
+    def memory_usage(self) -> int:
+        """Return the number of bytes used by the loaded dataframes."""
+        if self._data is None:
+            return 0
+        return sum(map(frame_memory_usage, self._data.values()))
+
     def _check_cache_files(self):
         # Check if cache files exist
         cache_files = sorted(glob.glob(self.data_directory + "/*.cache"))
@@ -117,27 +220,30 @@ class DataRetriever(ABC):
             return False
 
         # Get newest data file timestamp
-        years = range(DataRetriever._initial_year, time.localtime()[0] + 1)
-        patterns = self._get_data_file_patterns()
-        file_list = [p % y for p in patterns for y in years]
-        data_ts = max(map(os.path.getmtime, file_list))
+        data_ts = max(map(os.path.getmtime, self._data_files()))
 
         return data_ts < cache_ts
 
     def _load_data_from_cache(self) -> None:
-        self._data = {}
         cache_files = sorted(glob.glob(self.data_directory + "/*.cache"))
-        for cache_file in cache_files:
-            name = Path(cache_file).stem
-            self._data[name] = pd.read_feather(cache_file)
+        self._data = {
+            Path(cache_file).stem: pd.read_feather(cache_file)
+            for cache_file in cache_files
+        }
 
     def _write_data_to_cache(self) -> None:
         assert self._data is not None
         assert isinstance(self._data, dict)
+        # Write all cache files next to the old ones before replacing any of
+        # them, so that the old cache stays whole if writing fails
+        file_names = []
         for key, df in self._data.items():
             assert isinstance(df, pd.DataFrame)
             file_name = os.path.join(self.data_directory, key + ".cache")
-            df.to_feather(str(file_name))
+            df.to_feather(file_name + ".part")
+            file_names.append(file_name)
+        for file_name in file_names:
+            os.replace(file_name + ".part", file_name)
 
     @property
     def data(self) -> dict[str, pd.DataFrame]:
@@ -163,9 +269,98 @@ class DataRetriever(ABC):
 
 
 class ValueRetriever(DataRetriever, ABC):
+    # Optional dense price grid (see build_price_grid) and the codes it was
+    # requested for (None for all codes)
+    _grid: PriceGrid | None = None
+    _grid_codes: list[str] | None = None
+
     def get_today_value(self, code: str):
         return self.get_value(code, date.today().strftime("%Y-%m-%d"))
 
+    def build_price_grid(self, codes: Iterable[str] | None = None) -> PriceGrid:
+        """
+        Materialize the quotes of the given (or all) codes as a dense grid,
+        forward filled over calendar days, which then serves get_value and
+        get_quote with a single array access.  The grid is rebuilt whenever
+        the data is reloaded.
+        """
+        assert not self.needs_to_be_loaded
+        self._grid_codes = None if codes is None else list(codes)
+        all_codes = list(self._available_codes())
+        with span("grid_build", asset=self.asset_type):
+            self._grid = self._build_price_grid(
+                all_codes if self._grid_codes is None else self._grid_codes
+            )
+        return self._grid
+
+    def drop_price_grid(self) -> None:
+        self._grid = None
+        self._grid_codes = None
+
+    @property
+    def price_grid(self) -> PriceGrid | None:
+        return self._grid
+
+    def _build_price_grid(self, codes: list[str]) -> PriceGrid:
+        return PriceGrid.from_series({code: self._value_series(code) for code in codes})
+
+    def _check_and_load_data_files(self):
+        reloaded = self._needs_to_be_loaded
+        DataRetriever._check_and_load_data_files(self)
+        if reloaded and self._grid is not None:
+            self.build_price_grid(self._grid_codes)
+
+    def memory_usage(self) -> int:
+        grid_usage = 0 if self._grid is None else self._grid.nbytes
+        return DataRetriever.memory_usage(self) + grid_usage
+
+    def get_quote(self, code: str, day: str | date) -> Quote:
+        """Return the last quote of code up to day and its age in days."""
+        if self._grid is not None:
+            quote = self._grid.lookup(code, day)
+            if quote is not None:
+                return Quote(*quote)
+        series = self._value_series(code)
+        ts = pd.Timestamp(day)
+        position = series.index.searchsorted(ts, side="right") - 1
+        if position < 0:
+            return Quote(float("nan"), -1)
+        return Quote(float(series.iloc[position]), (ts - series.index[position]).days)
+
+    def _grid_of(self, codes: list[str]) -> PriceGrid:
+        """Return the price grid if it has all codes, or a grid of the codes."""
+        available = self._available_codes()
+        for code in codes:
+            assert code in available, "Unknown code: %s" % code
+        grid = self._grid
+        # A grid of all codes lacks only the codes without any value
+        if grid is None or (
+            self._grid_codes is not None
+            and any(code not in grid.columns for code in codes)
+        ):
+            grid = self._build_price_grid(codes)
+        return grid
+
+    def get_values(
+        self, codes: Iterable[str], days: Iterable[str | date]
+    ) -> pd.DataFrame:
+        """
+        Return the last values of the given codes (columns) up to each day
+        (rows), all at once.  Days before the first value of a code are NaN.
+        """
+        codes = list(codes)
+        index = pd.DatetimeIndex(list(days), name="day")
+        grid = self._grid_of(codes)
+        values = pd.DataFrame(float("nan"), index=index, columns=codes)
+        quoted = [code for code in codes if code in grid.columns]
+        values[quoted] = grid.take(quoted, index)[0]
+        return values
+
+    @abstractmethod
+    def _value_series(self, code: str) -> pd.Series:
+        """Return the quotes of code, indexed by (sorted) day."""
+        pass
+
     @abstractmethod
     def get_value(self, code: str, day: str | date) -> float:
         assert code in self._available_codes()
@@ -194,6 +389,75 @@ class VariationRetriever(DataRetriever, ABC):
         return float("nan")
 
 
+class IndexLevelRetriever(ValueRetriever, VariationRetriever, ABC):
+    """
+    Retriever of index numbers (levels), whose loaded data holds a "level"
+    column per index code.
+
+    The levels are kept in a price grid, so that the level on a day is a
+    single array access and the variation over an interval is the ratio of
+    two levels, whatever the length of the interval.  Days without a level
+    (weekends, holidays) take the last level published.
+    """
+
+    def _check_and_load_data_files(self):
+        reloaded = self._needs_to_be_loaded
+        DataRetriever._check_and_load_data_files(self)
+        if reloaded:
+            self.build_price_grid(self._grid_codes)
+
+    def _value_series(self, code: str) -> pd.Series:
+        assert self._data is not None
+        return self._data[code]["level"]
+
+    @timed("get_value")
+    def get_value(self, code: str, day: str | date) -> float:
+        ValueRetriever.get_value(self, code, day)
+        return self.get_quote(code, day).value
+
+    @timed("get_variation")
+    def get_variation(
+        self,
+        code: str,
+        begin_date: str | date,
+        end_date: str | date,
+        percentage: float = 1.0,
+    ) -> float:
+        _ = VariationRetriever.get_variation(self, code, begin_date, end_date)
+        # Index returns are not rates, and cannot be scaled day by day
+        assert percentage == 1.0, "Invalid percentage for index %s" % code
+        begin = self.get_quote(code, begin_date)
+        end = self.get_quote(code, end_date)
+        assert begin.age >= 0, "No level of %s up to %s" % (code, begin_date)
+        assert pd.Timestamp(begin_date) <= pd.Timestamp(end_date)
+        return end.value / begin.value - 1.0
+
+    def get_variations(
+        self,
+        codes: Iterable[str],
+        begin_dates: Iterable[str | date],
+        end_dates: Iterable[str | date],
+    ) -> pd.DataFrame:
+        """
+        Return the variations of the given indices (columns) over each
+        interval (rows, indexed by begin and end dates), all at once.
+        Intervals beginning before the first level of an index are NaN.
+        """
+        codes = list(codes)
+        begins = pd.DatetimeIndex(list(begin_dates), name="begin")
+        ends = pd.DatetimeIndex(list(end_dates), name="end")
+        assert len(begins) == len(ends)
+        assert (begins <= ends).all(), "Intervals must not end before they begin"
+        grid = self._grid_of(codes)
+        begin_levels, _ = grid.take(codes, begins)
+        end_levels, _ = grid.take(codes, ends)
+        return pd.DataFrame(
+            end_levels / begin_levels - 1.0,
+            index=pd.MultiIndex.from_arrays([begins, ends]),
+            columns=codes,
+        )
+
+
 class CurveRetriever(DataRetriever, ABC):
     @abstractmethod
     def get_curve_vertices(self, code: str, base_date: str | date) -> pd.DataFrame:
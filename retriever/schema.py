@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_float_dtype, is_integer_dtype, is_object_dtype
+
+
+def frame_memory_usage(df: pd.DataFrame) -> int:
+    """Return the number of bytes used by a dataframe, including its index."""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def _is_lossless_float32(values: np.ndarray) -> bool:
+    with np.errstate(over="ignore"):
+        narrow = values.astype(np.float32)
+    return np.array_equal(narrow.astype(values.dtype), values, equal_nan=True)
+
+
+def compact_series(series: pd.Series) -> pd.Series:
+    """
+    Return the series converted to the narrowest dtype holding the same values:
+    - strings (codes, names, ISINs) become categoricals
+    - integers are downcast to the smallest integer type that fits
+    - floats become float32 only when every value round trips exactly
+    """
+    dtype = series.dtype
+    if is_object_dtype(dtype):
+        non_null = series.dropna()
+        if len(non_null) > 0 and all(isinstance(v, str) for v in non_null):
+            return series.astype("category")
+    elif is_integer_dtype(dtype):
+        return pd.to_numeric(series, downcast="integer")
+    elif is_float_dtype(dtype) and dtype != np.float32:
+        if _is_lossless_float32(series.to_numpy()):
+            return series.astype(np.float32)
+    return series
+
+
+def compact_index(index: pd.Index) -> pd.Index:
+    # MultiIndex levels are already dictionary encoded with the narrowest codes
+    if isinstance(index, pd.MultiIndex):
+        return index
+    if is_object_dtype(index.dtype) and all(isinstance(v, str) for v in index):
+        return pd.CategoricalIndex(index, name=index.name)
+    return index
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Return a copy of the dataframe using compact dtypes (see compact_series)."""
+    compacted = pd.DataFrame(
+        {col: compact_series(df[col]) for col in df.columns}, index=df.index
+    )
+    compacted.index = compact_index(df.index)
+    return compacted
@@ -0,0 +1,223 @@
+"""
+Snapshot of fully loaded retrievers.
+
+A snapshot is a single file holding the pickled state of the loaded
+retrievers (dataframes and any index derived from them) and of the loaded
+calendars.  It is written with pickle protocol 5: the large numeric buffers
+are stored out of band, aligned, and restored as views of a copy-on-write
+memory map, so restoring a snapshot costs little more than mapping the file.
+
+The snapshot records a stamp of the source files (name, size and
+modification time of every data file) and is ignored once they change.
+
+    python -m retriever.snapshot save FILE [PROFILE]
+    python -m retriever.snapshot info FILE
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import pickle
+import struct
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from utils.calendars import add_calendar, loaded_calendars
+
+from .registry import RetrieverRegistry
+
+_MAGIC = b"PORTSNAP"
+_FORMAT_VERSION = 1
+_ALIGNMENT = 64
+# Files written while loading, which do not change the loaded data
+_IGNORED_SUFFIXES = (".cache", ".meta", ".part", ".snapshot")
+
+
+def _align(offset: int) -> int:
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+def source_stamp(directories: list[str]) -> str:
+    """Return a hash of the data files found in the given directories."""
+    h = hashlib.sha1(usedforsecurity=False)
+    h.update(("%d|%s|%s\n" % (_FORMAT_VERSION, pd.__version__, sys.version)).encode())
+    for directory in sorted(set(directories)):
+        with os.scandir(directory) as it:
+            entries = sorted(
+                (
+                    e
+                    for e in it
+                    if e.is_file() and not e.name.endswith(_IGNORED_SUFFIXES)
+                ),
+                key=lambda e: e.name,
+            )
+        for entry in entries:
+            stat = entry.stat()
+            h.update(
+                ("%s|%d|%d\n" % (entry.path, stat.st_size, stat.st_mtime_ns)).encode()
+            )
+    return h.hexdigest()
+
+
+def _data_directories(retrievers: dict[str, object]) -> list[str]:
+    directories = []
+    for instance in retrievers.values():
+        directory = getattr(instance, "data_directory", None)
+        if directory is not None and os.path.isdir(directory):
+            directories.append(os.path.abspath(directory))
+    return sorted(set(directories))
+
+
+def save_snapshot(file_name: str, retrievers: dict[str, object]) -> None:
+    """Write the given retrievers (by name) and the loaded calendars to file_name."""
+    buffers: list[pickle.PickleBuffer] = []
+    payload = pickle.dumps(
+        {"retrievers": retrievers, "calendars": loaded_calendars()},
+        protocol=5,
+        buffer_callback=buffers.append,
+    )
+    raws = [buffer.raw() for buffer in buffers]
+
+    # Offsets are relative to the start of the (aligned) data section
+    offsets = []
+    offset = 0
+    for raw in raws:
+        offsets.append((offset, raw.nbytes))
+        offset = _align(offset + raw.nbytes)
+    payload_offset = offset
+    directories = _data_directories(retrievers)
+    header = json.dumps(
+        {
+            "version": _FORMAT_VERSION,
+            "created": time.time(),
+            "retrievers": sorted(retrievers),
+            "directories": directories,
+            "stamp": source_stamp(directories),
+            "buffers": offsets,
+            "payload": (payload_offset, len(payload)),
+        }
+    ).encode()
+    data_start = _align(len(_MAGIC) + 8 + len(header))
+
+    directory = os.path.dirname(os.path.abspath(file_name))
+    fd, temp_name = tempfile.mkstemp(dir=directory, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_MAGIC + struct.pack("<Q", len(header)) + header)
+            for raw, (offset, _) in zip(raws, offsets):
+                f.seek(data_start + offset)
+                f.write(raw)
+            f.seek(data_start + payload_offset)
+            f.write(payload)
+        os.replace(temp_name, file_name)
+    except BaseException:
+        os.remove(temp_name)
+        raise
+
+
+def _read_header(mm: mmap.mmap) -> tuple[dict, int]:
+    if mm[: len(_MAGIC)] != _MAGIC:
+        raise Exception("Not a snapshot file")
+    (header_size,) = struct.unpack("<Q", mm[len(_MAGIC) : len(_MAGIC) + 8])
+    start = len(_MAGIC) + 8
+    header = json.loads(mm[start : start + header_size])
+    return header, _align(start + header_size)
+
+
+def read_snapshot_info(file_name: str) -> dict:
+    with open(file_name, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            header, _ = _read_header(mm)
+    header["up_to_date"] = (
+        header["version"] == _FORMAT_VERSION
+        and source_stamp(header["directories"]) == header["stamp"]
+    )
+    return header
+
+
+def load_snapshot(file_name: str) -> dict | None:
+    """
+    Return the contents of a snapshot ({"retrievers": ..., "calendars": ...})
+    or None if it does not exist or if its source files have changed.
+    """
+    if not os.path.isfile(file_name):
+        return None
+
+    with open(file_name, "rb") as f:
+        # Copy-on-write mapping: pages are read lazily and restored arrays are
+        # writable without modifying the file
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    header, data_start = _read_header(mm)
+    if header["version"] != _FORMAT_VERSION:
+        return None
+    if source_stamp(header["directories"]) != header["stamp"]:
+        return None
+
+    view = memoryview(mm)
+    buffers = [
+        view[data_start + offset : data_start + offset + size]
+        for offset, size in header["buffers"]
+    ]
+    offset, size = header["payload"]
+    return pickle.loads(
+        view[data_start + offset : data_start + offset + size], buffers=buffers
+    )
+
+
+def restore_snapshot(file_name: str, registry: RetrieverRegistry | None = None) -> bool:
+    """
+    Load a snapshot into the retriever registry and the calendar registry.
+    Return False (and leave both untouched) if the snapshot is missing or stale.
+    """
+    if registry is None:
+        import retriever
+
+        registry = retriever.registry
+
+    start = time.perf_counter()
+    contents = load_snapshot(file_name)
+    if contents is None:
+        return False
+    load_time = time.perf_counter() - start
+
+    for name, calendar in contents["calendars"].items():
+        add_calendar(name, calendar)
+    for name, instance in contents["retrievers"].items():
+        if not registry.is_loaded(name):
+            registry.add(name, instance, load_time)
+    return True
+
+
+def main(argv: list[str]) -> int:
+    import retriever
+
+    if len(argv) < 2 or argv[0] not in ("save", "info"):
+        print(__doc__)
+        return 1
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    command, file_name = argv[:2]
+    if command == "save":
+        profile = argv[2] if len(argv) > 2 else "valuation"
+        retriever.preload_retrievers(profile, wait=True)
+        save_snapshot(file_name, retriever.registry.instances)
+        print(retriever.registry.report())
+    info = read_snapshot_info(file_name)
+    print(
+        "Snapshot %s: %s (%s)"
+        % (
+            file_name,
+            ", ".join(info["retrievers"]),
+            "up to date" if info["up_to_date"] else "stale",
+        )
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
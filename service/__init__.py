@@ -0,0 +1,8 @@
+from .client import ServiceClient
+from .server import ValuationService, make_server
+
+__all__ = [
+    "ServiceClient",
+    "ValuationService",
+    "make_server",
+]
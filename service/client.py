@@ -0,0 +1,105 @@
+import http.client
+import json
+import socket
+from datetime import date
+from urllib.parse import urlencode
+
+from .server import DEFAULT_PORT
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: float | None = None):
+        http.client.HTTPConnection.__init__(self, "localhost", timeout=timeout)
+        self.socket_path: str = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def _format(day: str | date) -> str:
+    return day if isinstance(day, str) else f"{day:%Y-%m-%d}"
+
+
+class ServiceClient:
+    """Client of the local valuation service (see service.server)."""
+
+    def __init__(
+        self,
+        socket_path: str | None = None,
+        host: str = "127.0.0.1",
+        port: int = DEFAULT_PORT,
+        timeout: float | None = 30.0,
+    ):
+        self.socket_path: str | None = socket_path
+        self.host: str = host
+        self.port: int = port
+        self.timeout: float | None = timeout
+        self._connection: http.client.HTTPConnection | None = None
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self._connection is None:
+            if self.socket_path is not None:
+                self._connection = UnixHTTPConnection(self.socket_path, self.timeout)
+            else:
+                self._connection = http.client.HTTPConnection(
+                    self.host, self.port, timeout=self.timeout
+                )
+        return self._connection
+
+    def request(self, method: str, path: str, **params) -> dict:
+        if params:
+            path += "?" + urlencode(params)
+        connection = self._connect()
+        try:
+            connection.request(method, path)
+            response = connection.getresponse()
+            body = json.loads(response.read())
+        except (ConnectionError, http.client.HTTPException):
+            self.close()
+            raise
+        if response.status != 200:
+            raise Exception("Service error (%d): %s" % (response.status, body["error"]))
+        return body
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def get_value(self, source: str, code: str, day: str | date) -> float:
+        return self.request(
+            "GET", "/value", source=source, code=code, day=_format(day)
+        )["value"]
+
+    def get_variation(
+        self, source: str, code: str, begin: str | date, end: str | date
+    ) -> float:
+        return self.request(
+            "GET",
+            "/variation",
+            source=source,
+            code=code,
+            begin=_format(begin),
+            end=_format(end),
+        )["value"]
+
+    def get_rate(self, curve: str, base: str | date, forward: str | date) -> float:
+        return self.request(
+            "GET", "/rate", curve=curve, base=_format(base), forward=_format(forward)
+        )["value"]
+
+    def get_portfolio(self, file_name: str, day: str | date | None = None) -> dict:
+        params = {"file": file_name}
+        if day is not None:
+            params["day"] = _format(day)
+        return self.request("GET", "/portfolio", **params)
+
+    def status(self) -> dict:
+        return self.request("GET", "/status")
+
+    def reload(self, source: str | None = None) -> list[str]:
+        params = {} if source is None else {"source": source}
+        return self.request("POST", "/reload", **params)["reloading"]
@@ -0,0 +1,442 @@
+"""
+Local valuation service.
+
+A long-lived process keeping the retrievers, calendars, curves and portfolios
+loaded in memory, and answering queries over HTTP on localhost or on a Unix
+socket:
+
+    GET  /value?source=bovespa&code=PETR4&day=2024-01-02
+    GET  /variation?source=bcb&code=CDI&begin=2024-01-02&end=2024-06-28
+    GET  /rate?curve=di_pre&base=2024-01-02&forward=2027-01-04
+    GET  /portfolio?file=/path/to/portfolio.csv[&day=2024-01-02]
+    GET  /status
+    POST /reload[?source=bovespa]
+
+Responses are JSON objects.  Data directories of the loaded retrievers are
+watched, and a retriever is rebuilt in the background (and swapped in the
+registry) when the download step adds or changes its data files.
+
+    python -m service [--socket PATH | --port PORT] [--profile valuation]
+                      [--snapshot FILE] [--watch SECONDS] [--refresh]
+
+With --refresh, the retrievers also download and load new data after their
+sources' publication times (see retriever.refresher).
+"""
+
+import argparse
+import json
+import logging
+import os
+import socketserver
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from retriever.registry import RetrieverRegistry
+from retriever.snapshot import source_stamp
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+
+
+def _parse_date(day: str) -> date:
+    return date.fromisoformat(day)
+
+
+class ValuationService:
+    """
+    Warm state of the service: retrievers (held by the registry) and caches
+    of curves and portfolio valuations, which are dropped whenever a
+    retriever is reloaded.
+    """
+
+    def __init__(
+        self,
+        registry: RetrieverRegistry | None = None,
+        max_curves: int = 256,
+        max_portfolios: int = 32,
+    ):
+        if registry is None:
+            import retriever
+
+            registry = retriever.registry
+        self.registry: RetrieverRegistry = registry
+        self.max_curves: int = max_curves
+        self.max_portfolios: int = max_portfolios
+        self.started: float = time.time()
+        self.generation: int = 0
+        self.requests: int = 0
+        self._curves: OrderedDict[tuple[str, date], object] = OrderedDict()
+        self._portfolios: OrderedDict[tuple, dict] = OrderedDict()
+        self._stamps: dict[str, str] = {}
+        self._reloading: set[str] = set()
+        self._lock: threading.Lock = threading.Lock()
+        self._watcher: threading.Thread | None = None
+        self._stop: threading.Event = threading.Event()
+
+    ###########
+    # Queries #
+    ###########
+
+    def get_value(self, source: str, code: str, day: str) -> float:
+        return float(self.registry.get(source).get_value(code, day))
+
+    def get_variation(self, source: str, code: str, begin: str, end: str) -> float:
+        dr = self.registry.get(source)
+        return float(dr.get_variation(code, _parse_date(begin), _parse_date(end)))
+
+    def get_curve(self, code: str, base_date: str):
+        from model.curves import Curve
+
+        key = (code, _parse_date(base_date))
+        with self._lock:
+            curve = self._curves.get(key)
+            if curve is not None:
+                self._curves.move_to_end(key)
+                return curve
+        curve = Curve(code, key[1])
+        with self._lock:
+            self._curves[key] = curve
+            while len(self._curves) > self.max_curves:
+                self._curves.popitem(last=False)
+        return curve
+
+    def get_rate(self, code: str, base_date: str, forward_date: str) -> float:
+        curve = self.get_curve(code, base_date)
+        return float(curve.get_rate(_parse_date(forward_date)))
+
+    def get_portfolio(self, file_name: str, day: str | None = None) -> dict:
+        from model.portfolio import Portfolio
+
+        file_name = os.path.abspath(file_name)
+        at_day = date.today() if day is None else _parse_date(day)
+        key = (file_name, os.stat(file_name).st_mtime_ns, at_day, self.generation)
+        with self._lock:
+            result = self._portfolios.get(key)
+            if result is not None:
+                self._portfolios.move_to_end(key)
+                return result
+
+        portfolio = Portfolio()
+        portfolio.at_day = at_day
+        portfolio.load_from_csv(file_name)
+        result = {
+            "day": f"{at_day:%Y-%m-%d}",
+            "value": float(portfolio.portfolio_value),
+            "categories": {
+                cat.name: float(value)
+                for cat, value in portfolio.categories_values.items()
+            },
+            "securities": {
+                name: {
+                    "amount": float(item.amount),
+                    "value": float(item.sec.get_value(at_day) * item.amount),
+                }
+                for name, item in sorted(portfolio.securities.items())
+            },
+        }
+        with self._lock:
+            self._portfolios[key] = result
+            while len(self._portfolios) > self.max_portfolios:
+                self._portfolios.popitem(last=False)
+        return result
+
+    def status(self) -> dict:
+        return {
+            "uptime": time.time() - self.started,
+            "generation": self.generation,
+            "requests": self.requests,
+            "retrievers": {
+                name: {
+                    "load_time": stats.load_time,
+                    "memory_usage": stats.memory_usage,
+                }
+                for name, stats in self.registry.stats.items()
+            },
+            "reloading": sorted(self._reloading),
+            "errors": {name: repr(e) for name, e in self.registry.errors.items()},
+            "curves": len(self._curves),
+            "portfolios": len(self._portfolios),
+        }
+
+    #############
+    # Reloading #
+    #############
+
+    def _directory(self, name: str) -> str | None:
+        instance = self.registry.instances.get(name)
+        directory = getattr(instance, "data_directory", None)
+        if directory is None or not os.path.isdir(directory):
+            return None
+        return directory
+
+    def record_stamps(self) -> None:
+        """Record the state of the data files of the loaded retrievers."""
+        for name in self.registry.instances:
+            directory = self._directory(name)
+            if directory is not None:
+                self._stamps[name] = source_stamp([directory])
+
+    def changed_retrievers(self) -> list[str]:
+        """Return the loaded retrievers whose data files changed since loaded."""
+        changed = []
+        for name, stamp in list(self._stamps.items()):
+            directory = self._directory(name)
+            if directory is not None and source_stamp([directory]) != stamp:
+                changed.append(name)
+        return changed
+
+    def reload(self, name: str) -> threading.Thread | None:
+        """
+        Rebuild a retriever from its data directory in a background thread
+        and swap it into the registry.  Queries keep using the old instance
+        until the new one is ready.
+        """
+        with self._lock:
+            if name in self._reloading:
+                return None
+            self._reloading.add(name)
+
+        def task() -> None:
+            try:
+                old = self.registry.get(name)
+                directory = self._directory(name)
+                stamp = source_stamp([directory]) if directory else None
+                logger.info("Reloading %s...", name)
+                start = time.perf_counter()
+                new = type(old)(data_directory=old.data_directory)
+                self.registry.add(name, new, time.perf_counter() - start)
+                if stamp is not None:
+                    self._stamps[name] = stamp
+                self.invalidate()
+                logger.info("Reloaded %s", name)
+            except Exception as e:
+                logger.exception("Failed to reload %s", name)
+                self.registry.errors[name] = e
+            finally:
+                with self._lock:
+                    self._reloading.discard(name)
+
+        thread = threading.Thread(target=task, name="reload-" + name, daemon=True)
+        thread.start()
+        return thread
+
+    def invalidate(self, name: str | None = None) -> None:
+        """Drop the curves and portfolio valuations (after a retriever reload)."""
+        with self._lock:
+            self.generation += 1
+            self._curves.clear()
+            self._portfolios.clear()
+
+    def watch(self, interval: float) -> None:
+        """Check the data directories every interval seconds, in a thread."""
+
+        def task() -> None:
+            while not self._stop.wait(interval):
+                for name in self.changed_retrievers():
+                    self.reload(name)
+
+        self.record_stamps()
+        self._watcher = threading.Thread(target=task, name="watcher", daemon=True)
+        self._watcher.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+
+
+################
+# HTTP handler #
+################
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    server_version = "PortfolioService/0.1"
+    service: ValuationService
+
+    def _reply(self, status: int, body: dict) -> None:
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _handle(self, method: str) -> None:
+        url = urlsplit(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        service = self.server.service
+        with service._lock:
+            service.requests += 1
+        route = ROUTES.get((method, url.path))
+        if route is None:
+            self._reply(404, {"error": "Unknown request: %s %s" % (method, url.path)})
+            return
+
+        start = time.perf_counter()
+        try:
+            body = route(self, service, params)
+        except KeyError as e:
+            self._reply(400, {"error": "Missing parameter or unknown code: %s" % e})
+            return
+        except (AssertionError, ValueError) as e:
+            # Retrievers assert on codes and days they cannot value
+            self._reply(400, {"error": repr(e)})
+            return
+        except Exception as e:
+            logger.exception("Error handling %s %s", method, self.path)
+            self._reply(500, {"error": repr(e)})
+            return
+        body["elapsed"] = time.perf_counter() - start
+        self._reply(200, body)
+
+    def _get_value(self, service: ValuationService, params: dict[str, str]) -> dict:
+        return {
+            "value": service.get_value(params["source"], params["code"], params["day"])
+        }
+
+    def _get_variation(self, service: ValuationService, params: dict[str, str]) -> dict:
+        return {
+            "value": service.get_variation(
+                params["source"], params["code"], params["begin"], params["end"]
+            )
+        }
+
+    def _get_rate(self, service: ValuationService, params: dict[str, str]) -> dict:
+        return {
+            "value": service.get_rate(
+                params["curve"], params["base"], params["forward"]
+            )
+        }
+
+    def _get_portfolio(self, service: ValuationService, params: dict[str, str]) -> dict:
+        return service.get_portfolio(params["file"], params.get("day"))
+
+    def _get_status(self, service: ValuationService, params: dict[str, str]) -> dict:
+        return service.status()
+
+    def _post_reload(self, service: ValuationService, params: dict[str, str]) -> dict:
+        if "source" in params:
+            names = [params["source"]]
+        else:
+            names = list(service.registry.instances)
+        return {"reloading": [n for n in names if service.reload(n)]}
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def log_message(self, format, *args):
+        # client_address is empty for Unix sockets
+        logger.debug(format, *args)
+
+
+# Handler of each (method, path)
+ROUTES = {
+    ("GET", "/value"): RequestHandler._get_value,
+    ("GET", "/variation"): RequestHandler._get_variation,
+    ("GET", "/rate"): RequestHandler._get_rate,
+    ("GET", "/portfolio"): RequestHandler._get_portfolio,
+    ("GET", "/status"): RequestHandler._get_status,
+    ("POST", "/reload"): RequestHandler._post_reload,
+}
+
+
+class ServiceHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], service: ValuationService):
+        self.service: ValuationService = service
+        ThreadingHTTPServer.__init__(self, address, RequestHandler)
+
+
+class UnixServiceHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, service: ValuationService):
+        self.service: ValuationService = service
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        socketserver.UnixStreamServer.__init__(self, socket_path, RequestHandler)
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+def make_server(
+    service: ValuationService,
+    socket_path: str | None = None,
+    host: str = "127.0.0.1",
+    port: int = DEFAULT_PORT,
+) -> socketserver.BaseServer:
+    """Return a server for service, on a Unix socket if socket_path is given."""
+    if socket_path is not None:
+        return UnixServiceHTTPServer(socket_path, service)
+    return ServiceHTTPServer((host, port), service)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--socket", help="Listen on a Unix socket")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--profile", default="valuation", help="Retrievers to load")
+    parser.add_argument("--snapshot", help="Restore retrievers from a snapshot")
+    parser.add_argument(
+        "--watch", type=float, default=60.0, help="Data files check interval (s)"
+    )
+    parser.add_argument(
+        "--refresh", action="store_true", help="Download new data on schedule"
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    import retriever
+    from utils.calendars import get_calendar
+
+    if args.snapshot is not None:
+        from retriever.snapshot import restore_snapshot
+
+        if not restore_snapshot(args.snapshot):
+            logger.info("Snapshot %s is missing or stale", args.snapshot)
+    retriever.preload_retrievers(args.profile, wait=True)
+    get_calendar("ANBIMA")
+    get_calendar("PMC/BMF")
+    logger.info("Loaded retrievers:\n%s", retriever.registry.report())
+
+    service = ValuationService(retriever.registry)
+    if args.watch > 0:
+        service.watch(args.watch)
+    refresher = None
+    if args.refresh:
+        from retriever.refresher import Refresher
+
+        refresher = Refresher(retriever.registry)
+        refresher.add_listener(service.invalidate)
+        refresher.start()
+    server = make_server(service, args.socket, args.host, args.port)
+    logger.info("Listening on %s", args.socket or "%s:%d" % (args.host, args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if refresher is not None:
+            refresher.stop()
+        service.stop()
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
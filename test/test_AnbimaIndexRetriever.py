@@ -0,0 +1,147 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from retriever.anbima import AnbimaIndexRetriever, _to_number
+
+CODES = ["IMA-B", "IRF-M"]
+
+
+def write_index_files(
+    directory: str, codes: list[str], days: pd.DatetimeIndex, mixed: bool = False
+):
+    """
+    Write ANBIMA-like history files and return the levels written.  If mixed
+    is set, some levels are written as text (1.234,56) and some durations
+    are missing (--).
+    """
+    import xlwt
+
+    header = [
+        "Índice",
+        "Data de Referência",
+        "Número Índice",
+        "Variação Diária (%)",
+        "Duration (d.u.)",
+    ]
+    rng = np.random.default_rng(0)
+    levels = {}
+    for code in codes:
+        level = 1000.0 * np.cumprod(1.0 + rng.normal(0.0004, 0.003, len(days)))
+        levels[code] = pd.Series(level, index=days)
+
+        book = xlwt.Workbook()
+        sheet = book.add_sheet("Historico")
+        for col, name in enumerate(header):
+            sheet.write(0, col, name)
+        for row, (day, value) in enumerate(zip(days, level), start=1):
+            sheet.write(row, 0, code)
+            sheet.write(row, 1, day.strftime("%d/%m/%Y"))
+            if mixed and row % 10 == 0:
+                text = f"{value:,.6f}".replace(",", "_").replace(".", ",")
+                sheet.write(row, 2, text.replace("_", "."))
+            else:
+                sheet.write(row, 2, float(value))
+            sheet.write(row, 3, 0.04)
+            if mixed and row % 7 == 0:
+                sheet.write(row, 4, "--")
+            else:
+                sheet.write(row, 4, 1500.5 + row)
+        sheet.write(len(days) + 2, 0, "Fonte: ANBIMA")
+        book.save(os.path.join(directory, code + ".xls"))
+
+    with open(os.path.join(directory, "codes.txt"), "w") as f:
+        f.write("\n".join(codes) + "\n")
+    return levels
+
+
+class AnbimaIndexRetrieverTestCase(unittest.TestCase):
+    """Tests for ANBIMA index levels and variations"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.days = pd.bdate_range("2023-01-02", "2024-12-31")
+        cls.levels = write_index_files(cls.directory.name, CODES, cls.days)
+        cls.retriever = AnbimaIndexRetriever(data_directory=cls.directory.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def test_load(self):
+        self.assertEqual(sorted(self.retriever.data), CODES)
+        df = self.retriever.data["IMA-B"]
+        self.assertEqual(len(df), len(self.days))
+        self.assertEqual(list(df.columns), ["level", "duration"])
+        self.assertEqual(self.retriever.price_grid.codes, CODES)
+        # A second retriever loads the cache files
+        cached = AnbimaIndexRetriever(data_directory=self.directory.name)
+        pd.testing.assert_frame_equal(
+            cached.data["IRF-M"], self.retriever.data["IRF-M"]
+        )
+
+    def test_get_value(self):
+        levels = self.levels["IMA-B"]
+        self.assertAlmostEqual(
+            self.retriever.get_value("IMA-B", "2023-03-15"),
+            levels[pd.Timestamp("2023-03-15")],
+        )
+        # Weekends take the level of the last business day
+        self.assertAlmostEqual(
+            self.retriever.get_value("IMA-B", date(2023, 3, 19)),
+            levels[pd.Timestamp("2023-03-17")],
+        )
+        self.assertTrue(np.isnan(self.retriever.get_value("IMA-B", "2022-12-30")))
+
+    def test_get_variation(self):
+        levels = self.levels["IRF-M"]
+        variation = self.retriever.get_variation("IRF-M", "2023-02-01", "2024-06-28")
+        expected = (
+            levels[pd.Timestamp("2024-06-28")] / levels[pd.Timestamp("2023-02-01")]
+        )
+        self.assertAlmostEqual(variation, expected - 1.0)
+        self.assertEqual(
+            self.retriever.get_variation("IRF-M", "2023-02-01", "2023-02-01"), 0.0
+        )
+        with self.assertRaises(AssertionError):
+            self.retriever.get_variation("IRF-M", "2022-12-01", "2023-02-01")
+
+    def test_mixed_columns(self):
+        self.assertEqual(
+            _to_number(pd.Series([8123.456789, 8130.1, "--", "1.234,56"])).tolist()[:2],
+            [8123.456789, 8130.1],
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            levels = write_index_files(directory, ["IMA-S"], self.days, mixed=True)
+            df = AnbimaIndexRetriever(data_directory=directory).data["IMA-S"]
+        np.testing.assert_allclose(df["level"], levels["IMA-S"], rtol=0, atol=1e-6)
+        durations = 1500.5 + np.arange(1, len(self.days) + 1)
+        durations[np.arange(1, len(self.days) + 1) % 7 == 0] = np.nan
+        np.testing.assert_array_equal(df["duration"], durations)
+
+    def test_batch(self):
+        rng = np.random.default_rng(1)
+        begins = self.days[rng.integers(0, len(self.days) // 2, 50)]
+        ends = begins + pd.to_timedelta(rng.integers(0, 300, 50), unit="D")
+
+        variations = self.retriever.get_variations(CODES, begins, ends)
+        self.assertEqual(variations.shape, (50, 2))
+        for (begin, end), row in variations.iterrows():
+            for code in CODES:
+                self.assertAlmostEqual(
+                    row[code], self.retriever.get_variation(code, begin, end)
+                )
+
+        values = self.retriever.get_values(["IMA-B"], ["2022-12-30", "2023-01-02"])
+        self.assertTrue(np.isnan(values["IMA-B"].iloc[0]))
+        self.assertAlmostEqual(values["IMA-B"].iloc[1], self.levels["IMA-B"].iloc[0])
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(AnbimaIndexRetrieverTestCase)
+    unittest.TextTestRunner(verbosity=2).run(suite)
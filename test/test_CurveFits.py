@@ -0,0 +1,136 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.generators import data_years, registered_retrievers
+from model.curves import Curve
+from model.nss import CurveFits, NSSFit, fit_nss, nss_discounts, nss_rates
+from utils import instrumentation
+from utils.calendars import get_calendar
+
+
+class CurveFitsTestCase(unittest.TestCase):
+    """Tests for the NSS fits of the B3 curves"""
+
+    @classmethod
+    def setUpClass(cls):
+        directory = cls.enterClassContext(tempfile.TemporaryDirectory())
+        retrievers = cls.enterClassContext(registered_retrievers(directory, ["curves"]))
+        cls.retriever = retrievers["curves"]
+        year = data_years()[-2]
+        cls.days = get_calendar("ANBIMA").seq(date(year, 6, 1), date(year, 6, 30))
+
+    def tearDown(self):
+        instrumentation.disable()
+        instrumentation.reset()
+
+    def test_fit(self):
+        fit = NSSFit(0.11, -0.02, 0.03, -0.01, 1.3, 7.0, 0.0, 0.0, 0)
+        years = np.linspace(1.0 / 252.0, 30.0, 500)
+        result = fit_nss(years, nss_rates(fit, years))
+        self.assertLess(result.max_error, 1e-4)
+        self.assertEqual(result.vertices, 500)
+        np.testing.assert_allclose(
+            nss_rates(result, [0.5, 2.0, 10.0]),
+            nss_rates(fit, [0.5, 2.0, 10.0]),
+            atol=1e-4,
+        )
+        np.testing.assert_allclose(
+            nss_discounts(result, [0.0, 2.0]),
+            [1.0, (1.0 + nss_rates(result, [2.0])[0]) ** -2.0],
+        )
+
+    def test_cache(self):
+        instrumentation.enable()
+        fits = CurveFits(self.retriever)
+        df = fits.fit_all("di_pre", self.days)
+        self.assertEqual(len(df), len(self.days))
+        self.assertTrue((df["max_error"] < 0.0005).all())
+        self.assertTrue((df["rmse"] <= df["max_error"]).all())
+        self.assertTrue(
+            os.path.isfile(
+                os.path.join(self.retriever.data_directory, "fits", "di_pre.feather")
+            )
+        )
+
+        # Fits are read back from the cache, without fitting again
+        instrumentation.reset()
+        other = CurveFits(self.retriever)
+        for day in self.days:
+            self.assertEqual(other.get_fit("di_pre", day), fits.get_fit("di_pre", day))
+        self.assertEqual(instrumentation.to_dict()["counters"], [])
+
+        # Only missing dates are fitted
+        day = get_calendar("ANBIMA").following(date(data_years()[-2], 8, 1))
+        other.get_fit("di_pre", day)
+        (counter,) = instrumentation.to_dict()["counters"]
+        self.assertEqual(counter["value"], 1)
+        # and written in batches
+        self.assertNotIn(
+            day, CurveFits(self.retriever).diagnostics("di_pre").index.date
+        )
+        other.flush()
+        self.assertIn(day, CurveFits(self.retriever).diagnostics("di_pre").index.date)
+
+    def test_refresh(self):
+        instrumentation.enable()
+        fits = CurveFits(self.retriever)
+        day = self.days[0]
+        fit = fits.get_fit("di_ipca", day)
+
+        # Fits of newer curve files are stale once the retriever reloads them
+        file_name = os.path.join(
+            self.retriever.data_directory, "yc_di_ipca_%d.csv" % day.year
+        )
+        df = pd.read_csv(file_name)
+        df["rate"] += 0.01
+        df.to_csv(file_name, index=False)
+        self.assertEqual(fits.get_fit("di_ipca", day), fit)
+        self.retriever.refresh(download=False)
+        refit = fits.get_fit("di_ipca", day)
+        np.testing.assert_allclose(
+            nss_rates(refit, [1.0, 5.0]) - nss_rates(fit, [1.0, 5.0]), 0.01, atol=1e-4
+        )
+        counters = instrumentation.to_dict()["counters"]
+        (counter,) = [c for c in counters if c["name"] == "curves_fitted"]
+        self.assertEqual(counter["value"], 2)
+
+        # and so are those read back from the cache
+        fits.flush()
+        df["rate"] -= 0.01
+        df.to_csv(file_name, index=False)
+        self.retriever.refresh(download=False)
+        np.testing.assert_allclose(
+            nss_rates(CurveFits(self.retriever).get_fit("di_ipca", day), [1.0, 5.0]),
+            nss_rates(fit, [1.0, 5.0]),
+        )
+
+    def test_curve(self):
+        day = self.days[3]
+        curve = Curve("di_ipca", day)
+        fitted = Curve("di_ipca", day, fitted=True)
+        forward_dates = [date(day.year + i, 1, 2) for i in range(1, 10)]
+        # Between vertices, the interpolated curve differs from the fit as well
+        np.testing.assert_allclose(
+            fitted.get_rates(forward_dates), curve.get_rates(forward_dates), atol=5e-4
+        )
+        self.assertEqual(
+            fitted.get_rate(forward_dates[0]), fitted.get_rates(forward_dates)[0]
+        )
+        # Shocked vertices are fitted directly
+        vertices = curve.vertices.assign(rate=curve.vertices["rate"] + 0.01)
+        shocked = Curve("di_ipca", day, vertices, fitted=True)
+        np.testing.assert_allclose(
+            shocked.get_rates(forward_dates) - fitted.get_rates(forward_dates),
+            0.01,
+            atol=1e-4,
+        )
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(CurveFitsTestCase)
+    unittest.TextTestRunner(verbosity=2).run(suite)
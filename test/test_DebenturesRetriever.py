@@ -0,0 +1,122 @@
+import os
+import tempfile
+import time
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from retriever.debentures import DebenturesRetriever
+from retriever.retriever import DataRetriever
+
+NEG_HEADER = (
+    "Data,Emissor,Codigo do Ativo,ISIN,Quantidade,Numero de Negocios,"
+    "PU Minimo,PU Medio,PU Maximo,% PU da Curva"
+)
+PU_HEADER = (
+    "Data do PU,Ativo,Valor Nominal Atualizado,Juros,Premio,Preco Unitario,"
+    "Criterio de Calculo,Situacao"
+)
+YEAR = 2024
+
+
+def write_debenture_files(
+    directory: str, curves: dict[str, pd.Series], trades: dict[str, pd.Series]
+):
+    """Write NEG (trades) and PU (curve) files of all years for the debentures."""
+    for deb in curves:
+        for year in range(DataRetriever._initial_year, time.localtime()[0] + 1):
+            with open(os.path.join(directory, f"{deb}_NEG_{year}.csv"), "w") as f:
+                f.write(NEG_HEADER + "\n")
+                for day, price in trades[deb].items():
+                    if day.year == year:
+                        f.write(
+                            f"{day:%d/%m/%Y},Issuer,{deb},BR{deb}000,10,1,"
+                            f"{price},{price},{price},100.0\n"
+                        )
+            with open(os.path.join(directory, f"{deb}_PU_{year}.csv"), "w") as f:
+                f.write(PU_HEADER + "\n")
+                for day, price in curves[deb].items():
+                    if day.year == year:
+                        f.write(
+                            f"{day:%d/%m/%Y},{deb},1000.0,{price - 1000.0},0.0,"
+                            f"{price},Padrao,Ativo\n"
+                        )
+    with open(os.path.join(directory, "codes.txt"), "w") as f:
+        f.write("\n".join(curves) + "\n")
+
+
+class DebenturesRetrieverTestCase(unittest.TestCase):
+    """Tests for marking debentures to the last trade or to the curve"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        days = pd.bdate_range(f"{YEAR}-01-02", f"{YEAR}-12-31")
+        curve = pd.Series(1000.0 + 0.25 * np.arange(len(days)), index=days)
+        cls.curves = {"AAAA11": curve, "BBBB11": curve + 100.0}
+        cls.trades = {
+            "AAAA11": pd.Series(
+                [990.0, 1005.0],
+                index=pd.to_datetime([f"{YEAR}-03-01", f"{YEAR}-06-03"]),
+            ),
+            # Never traded
+            "BBBB11": pd.Series(dtype=np.float64),
+        }
+        write_debenture_files(cls.directory.name, cls.curves, cls.trades)
+        cls.retriever = DebenturesRetriever(data_directory=cls.directory.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def tearDown(self):
+        self.retriever.drop_price_grid()
+
+    def test_combined_frame(self):
+        df = self.retriever.data["AAAA11"]
+        self.assertIn("PU_Medio", df.columns)
+        self.assertIn("PU_Curva", df.columns)
+        self.assertEqual(len(df), len(self.curves["AAAA11"]))
+        self.assertEqual(df["PU_Medio"].count(), 2)
+
+    def test_mark(self):
+        dr = self.retriever
+        curve = self.curves["AAAA11"]
+        # Recent trades are used, on trading days and on the days after
+        self.assertEqual(dr.get_value("AAAA11", f"{YEAR}-03-01"), 990.0)
+        self.assertEqual(dr.get_value("AAAA11", f"{YEAR}-03-05"), 990.0)
+        # Old trades are replaced by the curve price
+        day = f"{YEAR}-03-20"
+        self.assertEqual(dr.get_value("AAAA11", day), curve[day])
+        # Before any trade, and without trades, the curve is used
+        self.assertEqual(
+            dr.get_value("AAAA11", f"{YEAR}-02-01"), curve[f"{YEAR}-02-01"]
+        )
+        self.assertEqual(dr.get_value("BBBB11", day), self.curves["BBBB11"][day])
+
+    def test_trades_only(self):
+        dr = DebenturesRetriever(data_directory=self.directory.name, max_trade_age=None)
+        self.assertEqual(dr.get_value("AAAA11", f"{YEAR}-05-20"), 990.0)
+        self.assertTrue(np.isnan(dr.get_value("AAAA11", f"{YEAR}-02-01")))
+
+    def test_batch(self):
+        dr = self.retriever
+        days = pd.date_range(f"{YEAR}-01-01", f"{YEAR}-12-31", freq="3D")
+        codes = ["AAAA11", "BBBB11"]
+        expected = pd.DataFrame(
+            {code: [dr.get_value(code, day) for day in days] for code in codes},
+            index=pd.DatetimeIndex(list(days), name="day"),
+        )
+        pd.testing.assert_frame_equal(dr.get_values(codes, days), expected)
+
+        dr.build_price_grid()
+        pd.testing.assert_frame_equal(dr.get_values(codes, days), expected)
+        np.testing.assert_array_equal(
+            [dr.get_value("AAAA11", day) for day in days], expected["AAAA11"]
+        )
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(DebenturesRetrieverTestCase)
+    unittest.TextTestRunner(verbosity=2).run(suite)
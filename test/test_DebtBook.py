@@ -0,0 +1,132 @@
+import tempfile
+import unittest
+from datetime import date
+
+import numpy as np
+
+from benchmarks.generators import data_years, registered_retrievers
+from model.analytics import DebtBook
+from model.category import PrivateDebtCategories, PublicDebtCategories
+from model.pricing import TreasurePricer
+from model.security import BankBondCDI, BankBondIPCA, BankBondPre, TreasureBond
+from utils.calendars import get_calendar
+
+
+class DebtBookTestCase(unittest.TestCase):
+    """Tests for the batch risk measures of debt securities"""
+
+    @classmethod
+    def setUpClass(cls):
+        directory = cls.enterClassContext(tempfile.TemporaryDirectory())
+        # Securities get their retrievers from the registry (as in benchmarks)
+        cls.enterClassContext(
+            registered_retrievers(directory, ["bcb", "curves", "directtreasure"])
+        )
+
+        year = data_years()[-2]
+        cls.day = get_calendar("ANBIMA").preceding(date(year, 12, 20))
+        issue_date = get_calendar("ANBIMA").following(date(year, 3, 1))
+        maturity = date(date.today().year + 3, 1, 2)
+        cls.bank_bonds = [
+            BankBondPre("CDB_PRE", maturity, 0.12, issue_date, 1000.0, "Fixed"),
+            BankBondCDI("LCI_CDI", maturity, 0.95, issue_date, 1000.0, "Floating"),
+            BankBondIPCA("CDB_IPCA", maturity, 0.06, issue_date, 1000.0, "Inflation"),
+        ]
+        maturity = date(date.today().year + 2, 1, 1)
+        cls.treasure_bonds = [
+            TreasureBond.create(f"{kind}_{maturity:%d%m%y}", 0.1)
+            for kind in ("LTN", "NTN-F", "NTN-B", "LFT")
+        ]
+        cls.items = [(bond, 10.0) for bond in cls.bank_bonds] + [
+            (bond, 2.0) for bond in cls.treasure_bonds
+        ]
+        cls.book = DebtBook(cls.items, cls.day)
+
+    def test_values(self):
+        values = self.book.unit_values()
+        for i, bond in enumerate(self.bank_bonds):
+            self.assertAlmostEqual(values[i], bond.get_value(self.day), places=6)
+
+        # Treasure bonds are priced at their last published rates
+        pricer = TreasurePricer()
+        for i, bond in enumerate(self.treasure_bonds, start=len(self.bank_bonds)):
+            rate = self.book.yields[i]
+            self.assertAlmostEqual(
+                values[i], pricer.price([bond.name], [self.day], rate)[0], places=6
+            )
+        np.testing.assert_allclose(
+            self.book.values(), values * self.book.quantities, rtol=1e-12
+        )
+
+    def test_zero_coupon(self):
+        df = self.book.measures()
+        days = get_calendar("ANBIMA").bizdays(self.day, self.bank_bonds[0].maturity)
+        row = df.loc["CDB_PRE"]
+        self.assertAlmostEqual(row["macaulay"], days / 252.0)
+        self.assertAlmostEqual(row["modified"], days / 252.0 / (1.0 + row["yield"]))
+        # Coupons shorten the duration of NTN-F bonds
+        ntnf = self.treasure_bonds[1].name
+        self.assertLess(df.loc[ntnf, "macaulay"], df.loc[ntnf, "convexity"])
+        self.assertLess(
+            df.loc[ntnf, "macaulay"],
+            self.book.flow_years[self.book.flow_positions == 4].max(),
+        )
+
+    def test_dv01(self):
+        # DV01 and convexity match a parallel shock of all yields
+        df = self.book.measures()
+        shocks = {code: 0.0001 for code in ("di_pre", "di_ipca")}
+        moved = np.array(
+            [p.curve is not None and p.projection is None for p in self.book.positions]
+        )
+        up = self.book.pnl(shocks)
+        down = self.book.pnl({code: -bump for code, bump in shocks.items()})
+        np.testing.assert_allclose(
+            (down - up)[moved] / 2.0, df["dv01"][moved], rtol=1e-6
+        )
+        np.testing.assert_allclose(
+            (up + down)[moved] / (df["value"][moved] * 1e-8),
+            df["convexity"][moved],
+            rtol=1e-3,
+        )
+        # LFT is not moved by curve shocks, and projected cash flows of CDI
+        # bonds mostly offset the change of their discount rate
+        curves = [p.curve for p in self.book.positions]
+        self.assertEqual(up[curves.index(None)], 0.0)
+        cdi = self.book.positions.index(
+            next(p for p in self.book.positions if p.name == "LCI_CDI")
+        )
+        self.assertLess(abs(up[cdi]), 0.1 * df["dv01"].iloc[cdi])
+
+    def test_tenor_shock(self):
+        # A shock of a single curve, growing with the tenor
+        pnl = dict(
+            zip(
+                [p.name for p in self.book.positions],
+                self.book.pnl({"di_ipca": lambda years: 0.0001 * years}),
+            )
+        )
+        ntnb = self.treasure_bonds[2].name
+        self.assertLess(pnl[ntnb], 0.0)
+        # Cash flows of IPCA bank bonds are projected with real rates
+        self.assertGreater(pnl["CDB_IPCA"], 0.0)
+        self.assertEqual(pnl["CDB_PRE"], 0.0)
+        self.assertEqual(pnl[self.treasure_bonds[0].name], 0.0)
+
+    def test_aggregate(self):
+        df = self.book.measures()
+        groups = self.book.aggregate()
+        self.assertAlmostEqual(groups["value"].sum(), df["value"].sum())
+        self.assertAlmostEqual(groups["dv01"].sum(), df["dv01"].sum())
+        self.assertIn(PrivateDebtCategories.Floating, groups.index.get_level_values(1))
+        public = groups.xs(PublicDebtCategories.Fixed, level="subcategory")
+        fixed = df[df["subcategory"] == PublicDebtCategories.Fixed]
+        self.assertAlmostEqual(
+            public["modified"].iloc[0],
+            (fixed["modified"] * fixed["value"]).sum() / fixed["value"].sum(),
+        )
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(DebtBookTestCase)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,69 @@
+import glob
+import os
+import tempfile
+import time
+import unittest
+
+import pandas as pd
+
+from benchmarks.generators import data_years, write_treasure_files
+from retriever.directtreasure import DirectTreasureRetriever, _read_file
+
+
+class DirectTreasureRetrieverTestCase(unittest.TestCase):
+    """Tests for the columnar partitions of Tesouro Direto files"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.codes = write_treasure_files(cls.directory.name, 1, data_years())
+        for xls_file in glob.glob(cls.directory.name + "/*.xls"):
+            os.utime(xls_file, (time.time() - 100, time.time() - 100))
+        cls.retriever = DirectTreasureRetriever(data_directory=cls.directory.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def remove_caches(self):
+        for cache_file in glob.glob(self.directory.name + "/*.cache"):
+            os.remove(cache_file)
+
+    def test_partitions(self):
+        xls_files = sorted(glob.glob(self.directory.name + "/*.xls"))
+        partitions = [self.retriever._partition_file(f) for f in xls_files]
+        self.assertTrue(all(map(os.path.isfile, partitions)))
+        self.assertEqual(sorted(self.retriever.data), sorted(self.codes))
+
+        # Partitions hold the same quotes as the XLS files
+        df = _read_file(xls_files[0])
+        code = df["Titulo"].iloc[0]
+        expected = df[df["Titulo"] == code].set_index("Dia")["PU_Base_Manha"]
+        year = expected.index[0].year
+        quotes = self.retriever.data[code]["PU_Base_Manha"]
+        pd.testing.assert_series_equal(
+            quotes[quotes.index.year == year], expected, check_dtype=False
+        )
+
+    def test_reconversion(self):
+        xls_files = sorted(glob.glob(self.directory.name + "/*.xls"))
+        partitions = [self.retriever._partition_file(f) for f in xls_files]
+        mtimes = list(map(os.path.getmtime, partitions))
+
+        # Without cache files, data is read from the partitions
+        self.remove_caches()
+        DirectTreasureRetriever(data_directory=self.directory.name)
+        self.assertEqual(list(map(os.path.getmtime, partitions)), mtimes)
+
+        # Only files newer than their partitions are converted again
+        os.utime(xls_files[0])
+        self.remove_caches()
+        dr = DirectTreasureRetriever(data_directory=self.directory.name)
+        self.assertGreater(os.path.getmtime(partitions[0]), mtimes[0])
+        self.assertEqual(list(map(os.path.getmtime, partitions[1:])), mtimes[1:])
+        self.assertEqual(sorted(dr.data), sorted(self.codes))
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(DirectTreasureRetrieverTestCase)
+    unittest.TextTestRunner(verbosity=2).run(suite)
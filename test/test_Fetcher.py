@@ -0,0 +1,205 @@
+import gzip
+import hashlib
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from retriever.fetcher import Fetcher, FetchError, main
+
+FILES = {
+    "/small.txt": b"20140102,9.77\n",
+    "/big.bin": os.urandom(3 * 1024 * 1024),
+    "/compressed.csv": b"Date,CDI\n" + b"20140102,9.77\n" * 10000,
+    "/unversioned.txt": b"20140102,10.00\n",
+}
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests.append((self.path, dict(self.headers)))
+
+        if self.path == "/redirect":
+            self.send_response(302)
+            self.send_header("Location", "/small.txt")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if self.path not in FILES:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body = FILES[self.path]
+        if self.path == "/unversioned.txt":
+            # Served without ETag or Last-Modified
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        etag = '"%s"' % hashlib.md5(body, usedforsecurity=False).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", "Thu, 02 Jan 2014 00:00:00 GMT")
+        if self.path.endswith(".csv") and "gzip" in self.headers.get(
+            "Accept-Encoding", ""
+        ):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FetcherTestCase(unittest.TestCase):
+    """Tests for the pooled Fetcher against a local fixture server"""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+        self.server.lock = threading.Lock()
+        self.server.connections = 0
+        self.server.requests = []
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, args=(0.05,), daemon=True
+        )
+        self.thread.start()
+        self.base_url = "http://127.0.0.1:%d" % self.server.server_address[1]
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def read(self, name):
+        with open(self.path(name), "rb") as f:
+            return f.read()
+
+    def test_connection_reuse(self):
+        items = [
+            (self.base_url + "/small.txt", self.path("a.txt")),
+            (self.base_url + "/big.bin", self.path("b.bin")),
+            (self.base_url + "/compressed.csv", self.path("c.csv")),
+        ]
+        with Fetcher(workers=1) as fetcher:
+            updated, errors = fetcher.fetch_many(items)
+        self.assertEqual(errors, {})
+        self.assertEqual(updated, [file_name for _, file_name in items])
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(fetcher.connections_opened, 1)
+        self.assertEqual(self.read("b.bin"), FILES["/big.bin"])
+
+    def test_gzip(self):
+        with Fetcher() as fetcher:
+            fetcher.fetch(self.base_url + "/compressed.csv", self.path("c.csv"))
+        self.assertEqual(self.read("c.csv"), FILES["/compressed.csv"])
+        _, headers = self.server.requests[-1]
+        self.assertIn("gzip", headers["Accept-Encoding"])
+
+    def test_conditional_request(self):
+        url = self.base_url + "/big.bin"
+        with Fetcher() as fetcher:
+            self.assertTrue(fetcher.fetch(url, self.path("b.bin")))
+            os.utime(self.path("b.bin"), (0, 0))
+            self.assertFalse(fetcher.fetch(url, self.path("b.bin")))
+        _, headers = self.server.requests[-1]
+        self.assertIn("If-None-Match", headers)
+        self.assertEqual(headers["If-Modified-Since"], "Thu, 02 Jan 2014 00:00:00 GMT")
+        # Not modified files are touched so that they are seen as up to date
+        self.assertGreater(os.path.getmtime(self.path("b.bin")), 0)
+        self.assertEqual(self.read("b.bin"), FILES["/big.bin"])
+
+    def test_stale_validators(self):
+        # Validators of a file now served without them are removed
+        with open(self.path("u.txt"), "wb") as f:
+            f.write(b"old")
+        with open(self.path("u.txt.meta"), "w") as f:
+            f.write('{"etag": "\\"old\\""}')
+        with Fetcher() as fetcher:
+            self.assertTrue(
+                fetcher.fetch(self.base_url + "/unversioned.txt", self.path("u.txt"))
+            )
+            _, headers = self.server.requests[-1]
+            self.assertEqual(headers["If-None-Match"], '"old"')
+            self.assertFalse(os.path.exists(self.path("u.txt.meta")))
+
+            fetcher.fetch(self.base_url + "/unversioned.txt", self.path("u.txt"))
+        _, headers = self.server.requests[-1]
+        self.assertNotIn("If-None-Match", headers)
+        self.assertIn("If-Modified-Since", headers)
+        self.assertEqual(self.read("u.txt"), FILES["/unversioned.txt"])
+
+    def test_redirect(self):
+        with Fetcher() as fetcher:
+            fetcher.fetch(self.base_url + "/redirect", self.path("a.txt"))
+        self.assertEqual(self.read("a.txt"), FILES["/small.txt"])
+
+    def test_errors(self):
+        with Fetcher(retries=1) as fetcher:
+            with self.assertRaises(FetchError):
+                fetcher.fetch(self.base_url + "/missing.txt", self.path("m.txt"))
+            updated, errors = fetcher.fetch_many(
+                [
+                    (self.base_url + "/missing.txt", self.path("m.txt")),
+                    (self.base_url + "/small.txt", self.path("a.txt")),
+                ],
+                keep_going=True,
+            )
+        self.assertEqual(updated, [self.path("a.txt")])
+        self.assertEqual(list(errors), [self.path("m.txt")])
+        self.assertFalse(os.path.exists(self.path("m.txt")))
+        self.assertEqual(
+            [f for f in os.listdir(self.directory.name) if f.endswith(".part")], []
+        )
+        with self.assertRaises(Exception):
+            Fetcher(retries=0).fetch(self.base_url + "/small.txt", self.path("a.txt"))
+
+    def test_skip_existing(self):
+        with open(self.path("a.txt"), "wb") as f:
+            f.write(b"local")
+        with Fetcher() as fetcher:
+            updated = fetcher.fetch(
+                self.base_url + "/small.txt", self.path("a.txt"), skip_existing=True
+            )
+        self.assertFalse(updated)
+        self.assertEqual(self.read("a.txt"), b"local")
+        self.assertEqual(self.server.requests, [])
+
+    def test_command_line(self):
+        self.assertEqual(main([self.base_url + "/small.txt", self.path("a.txt")]), 0)
+        self.assertEqual(self.read("a.txt"), FILES["/small.txt"])
+        self.assertEqual(main([self.base_url + "/missing", self.path("m.txt")]), 1)
+        self.assertEqual(
+            main(["--keep-going", self.base_url + "/missing", self.path("m.txt")]), 0
+        )
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(FetcherTestCase)
+    unittest.TextTestRunner(verbosity=2).run(suite)
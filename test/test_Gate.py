@@ -0,0 +1,71 @@
+import unittest
+
+from benchmarks.gate import compare, format_diff
+
+BASELINE = {
+    "BovespaRetriever.get_value": {
+        "wall_time": 1.0,
+        "peak_rss": 300.0,
+        "alloc_peak": 10.0,
+        "alloc_blocks": 20000,
+    },
+    "Curve.__init__": {"wall_time": 0.001, "peak_rss": 300.0},
+}
+
+
+class GateTestCase(unittest.TestCase):
+    """Tests for the regression gate comparison"""
+
+    def test_within_tolerance(self):
+        current = {
+            "BovespaRetriever.get_value": {
+                "wall_time": 1.4,
+                "peak_rss": 320.0,
+                "alloc_peak": 9.0,
+                "alloc_blocks": 20500,
+            },
+            # Tiny timings are compared with an absolute slack
+            "Curve.__init__": {"wall_time": 0.003, "peak_rss": 300.0},
+        }
+        self.assertEqual(compare(BASELINE, current), [])
+
+    def test_regressions(self):
+        current = {
+            "BovespaRetriever.get_value": {
+                "wall_time": 2.0,
+                "peak_rss": 300.0,
+                "alloc_peak": 25.0,
+                "alloc_blocks": 20000,
+            },
+            "Curve.__init__": {"wall_time": 0.001, "peak_rss": 300.0},
+            "Portfolio.load_from_csv": {"wall_time": 5.0},
+        }
+        regressions = compare(BASELINE, current)
+        self.assertEqual(
+            [(r.case, r.metric) for r in regressions],
+            [
+                ("BovespaRetriever.get_value", "wall_time"),
+                ("BovespaRetriever.get_value", "alloc_peak"),
+            ],
+        )
+
+        diff = format_diff(BASELINE, current, regressions).splitlines()
+        (line,) = [x for x in diff if "wall_time" in x and "Bovespa" in x]
+        self.assertIn("+100%", line)
+        self.assertIn("REGRESSION", line)
+        (line,) = [x for x in diff if "Portfolio" in x]
+        self.assertIn("new", line)
+        self.assertNotIn("REGRESSION", line)
+
+    def test_tolerances(self):
+        current = {"Curve.__init__": {"wall_time": 0.003}}
+        tolerances = {"wall_time": 1.1}
+        slack = {"wall_time": 0.0}
+        regressions = compare(BASELINE, current, tolerances, slack)
+        self.assertEqual(len(regressions), 1)
+        self.assertEqual(regressions[0].current, 0.003)
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(GateTestCase)
+    unittest.TextTestRunner(verbosity=2).run(suite)
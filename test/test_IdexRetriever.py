@@ -0,0 +1,107 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from retriever.idex import IdexRetriever, _parse_datafile
+
+CODES = ["cdi", "infra"]
+
+
+def datafile_rows(days: pd.DatetimeIndex, levels: np.ndarray) -> list[list]:
+    """Return the rows of an IDEX-like data file sheet."""
+    rows: list[list] = [
+        ["IDEX - Índice de Debêntures", None, None, None],
+        [None, None, None, None],
+        ["Data", "Índice", "Spread (%)", "Duration"],
+    ]
+    for day, level in zip(days, levels):
+        rows.append([day.to_pydatetime(), float(level), 1.5, 3.2])
+    rows.append(["Fonte: JGP", None, None, None])
+    return rows
+
+
+class IdexParserTestCase(unittest.TestCase):
+    """Tests for parsing IDEX data file sheets"""
+
+    def test_parse(self):
+        days = pd.bdate_range("2024-01-02", periods=5)
+        rows = datafile_rows(days, np.arange(100.0, 105.0))
+        # Repeated days keep the last line
+        rows.insert(4, [days[0].to_pydatetime(), 99.0, 1.5, 3.2])
+        df = _parse_datafile(pd.DataFrame(rows))
+        self.assertEqual(list(df.columns), ["level", "spread", "duration"])
+        self.assertTrue(df.index.equals(pd.DatetimeIndex(days, name="day")))
+        self.assertEqual(list(df["level"]), [99.0, 101.0, 102.0, 103.0, 104.0])
+
+    def test_text_dates(self):
+        rows = [
+            ["DATA", "NÚMERO ÍNDICE"],
+            ["02/01/2024", 100.0],
+            ["03/01/2024", 100.5],
+        ]
+        df = _parse_datafile(pd.DataFrame(rows))
+        self.assertEqual(df.index[1], datetime(2024, 1, 3))
+        self.assertEqual(list(df.columns), ["level"])
+
+
+@unittest.skipUnless(importlib.util.find_spec("openpyxl"), "openpyxl not installed")
+class IdexRetrieverTestCase(unittest.TestCase):
+    """Tests for IDEX levels and variations"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.days = pd.bdate_range("2023-01-02", "2024-12-31")
+        rng = np.random.default_rng(0)
+        cls.levels = {}
+        for code in CODES:
+            levels = 100.0 * np.cumprod(1.0 + rng.normal(0.0005, 0.001, len(cls.days)))
+            cls.levels[code] = pd.Series(levels, index=cls.days)
+            pd.DataFrame(datafile_rows(cls.days, levels)).to_excel(
+                os.path.join(cls.directory.name, code + ".xlsx"),
+                header=False,
+                index=False,
+            )
+        with open(os.path.join(cls.directory.name, "codes.txt"), "w") as f:
+            f.write("\n".join(CODES) + "\n")
+        cls.retriever = IdexRetriever(data_directory=cls.directory.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def test_levels(self):
+        self.assertEqual(sorted(self.retriever.data), CODES)
+        values = self.retriever.get_values(CODES, ["2024-03-01", "2024-03-03"])
+        for code in CODES:
+            expected = self.levels[code][pd.Timestamp("2024-03-01")]
+            self.assertAlmostEqual(values[code].iloc[0], expected)
+            # Weekends take the level of the last business day
+            self.assertAlmostEqual(values[code].iloc[1], expected)
+
+    def test_variations(self):
+        variations = self.retriever.get_variations(
+            CODES, ["2023-06-01", "2024-01-02"], ["2024-06-03", "2024-01-02"]
+        )
+        levels = self.levels["infra"]
+        self.assertAlmostEqual(
+            variations["infra"].iloc[0],
+            levels[pd.Timestamp("2024-06-03")] / levels[pd.Timestamp("2023-06-01")]
+            - 1.0,
+        )
+        self.assertEqual(variations["cdi"].iloc[1], 0.0)
+        self.assertAlmostEqual(
+            self.retriever.get_variation("infra", "2023-06-01", "2024-06-03"),
+            variations["infra"].iloc[0],
+        )
+
+
+if __name__ == "__main__":
+    for case in (IdexParserTestCase, IdexRetrieverTestCase):
+        suite = unittest.TestLoader().loadTestsFromTestCase(case)
+        unittest.TextTestRunner(verbosity=2).run(suite)
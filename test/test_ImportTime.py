@@ -0,0 +1,55 @@
+import os
+import re
+import subprocess
+import sys
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Budget for "import model" in milliseconds (override with IMPORT_TIME_BUDGET_MS)
+BUDGET_MS = float(os.environ.get("IMPORT_TIME_BUDGET_MS", "2000"))
+
+# Modules that must only be imported on first use
+DEFERRED_MODULES = ["QuantLib", "playwright", "sh", "pandas_market_calendars"]
+
+
+def _import_times(module: str) -> tuple[dict[str, int], str]:
+    """Import a module in a fresh interpreter and return its -X importtime report."""
+    code = "import sys, %s; print(' '.join(sorted(sys.modules)))" % module
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=REPO_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        m = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$", line)
+        if m:
+            cumulative[m.group(4)] = int(m.group(2))
+    return cumulative, result.stdout
+
+
+class ImportTimeTestCase(unittest.TestCase):
+    """Startup time budget of the model package"""
+
+    def test_import_budget(self):
+        # Best of three runs, to smooth out cold file system caches
+        times = [_import_times("model")[0]["model"] / 1000 for _ in range(3)]
+        self.assertLess(
+            min(times),
+            BUDGET_MS,
+            "import model took %.0f ms (budget: %.0f ms)" % (min(times), BUDGET_MS),
+        )
+
+    def test_deferred_imports(self):
+        _, modules = _import_times("model")
+        loaded = set(modules.split())
+        for module in DEFERRED_MODULES:
+            self.assertNotIn(module, loaded)
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(ImportTimeTestCase)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,132 @@
+import os
+import tempfile
+import threading
+import unittest
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from retriever.index import IndexRetriever
+
+PAGE = b"""<html><body>
+<h1>Theoretical portfolio</h1>
+<a href="/download.csv" download="composition.csv">Download</a>
+</body></html>
+"""
+
+
+def composition_csv(parts):
+    lines = [
+        "Theoretical Portfolio,,,,,",
+        "Valid until,,,,,",
+        "Code,Stock,Type,Theoretical Quantity,Part. (%),",
+    ]
+    for i, part in enumerate(parts):
+        lines.append(f"STK{i}3,STOCK {i},ON NM,{1000 * (i + 1)},{part:.3f},")
+    lines.append(f"Theoretical Quantity,{sum(range(len(parts)))},,,,")
+    lines.append("Reductor,12345.678,,,,")
+    return "\n".join(lines) + "\n"
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Local stand-in for the B3 index page and its CSV download"""
+
+    def do_GET(self):
+        if self.path.startswith("/download.csv"):
+            content = composition_csv([60.0, 40.0]).encode()
+            content_type = "text/csv"
+        else:
+            content = PAGE
+            content_type = "text/html"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class IndexRetrieverTestCase(unittest.TestCase):
+    """Tests for the index composition store"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.retriever = IndexRetriever(data_directory=self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_composition(self, index, parts, day=None):
+        file_name = os.path.join(self.directory.name, f"{index}.csv")
+        with open(file_name, "w") as f:
+            f.write(composition_csv(parts))
+        if day is not None:
+            ts = datetime.combine(day, datetime.min.time()).timestamp() + 12 * 3600
+            os.utime(file_name, (ts, ts))
+        return file_name
+
+    def test_composition(self):
+        self.write_composition("IBrX50", [50.0, 30.0, 20.0])
+        composition = self.retriever.get_composition("IBrX50")
+        self.assertEqual(len(composition), 3)
+        self.assertAlmostEqual(sum(stock["part"] for stock in composition), 1.0)
+        self.assertEqual(composition[0]["code"], "STK03")
+        self.assertEqual(composition[2]["quantity"], 3000)
+        self.assertEqual(self.retriever.available_days("IBrX50"), [date.today()])
+
+        # Repeat reads are served from memory, as copies callers may modify
+        composition[0]["part"] = 2.0
+        again = self.retriever.get_composition("IBrX50")
+        self.assertIsNot(again, composition)
+        self.assertAlmostEqual(sum(stock["part"] for stock in again), 1.0)
+        frame = self.retriever.get_composition_frame("IBrX50")
+        self.assertIs(self.retriever.get_composition_frame("IBrX50"), frame)
+
+    def test_history(self):
+        old_day = date.today() - timedelta(days=30)
+        self.write_composition("IBOV", [70.0, 30.0], old_day)
+        self.retriever._store("IBOV")
+        self.write_composition("IBOV", [25.0, 25.0, 50.0])
+        self.assertEqual(len(self.retriever.get_composition("IBOV")), 3)
+
+        self.assertEqual(self.retriever.available_days("IBOV"), [old_day, date.today()])
+        past = self.retriever.get_composition("IBOV", old_day + timedelta(days=3))
+        self.assertEqual([stock["part"] for stock in past], [0.7, 0.3])
+        with self.assertRaises(AssertionError):
+            self.retriever.get_composition("IBOV", old_day - timedelta(days=1))
+
+        # A new retriever reads the stored partitions
+        retriever = IndexRetriever(data_directory=self.directory.name)
+        self.assertEqual(retriever.get_composition("IBOV", f"{old_day}"), past)
+
+    def test_download(self):
+        try:
+            from playwright.sync_api import sync_playwright
+
+            with sync_playwright() as p:
+                p.firefox.launch().close()
+        except Exception:
+            self.skipTest("Playwright Firefox is not available")
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            retriever = IndexRetriever(
+                self.directory.name,
+                "http://127.0.0.1:%d/indexPage/day" % server.server_address[1],
+            )
+            self.assertEqual(retriever.refresh(["IBOV", "SMLL"]), ["IBOV", "SMLL"])
+            self.assertEqual(retriever.refresh(["IBOV", "SMLL"]), [])
+            for index in ("IBOV", "SMLL"):
+                composition = retriever.get_composition(index)
+                self.assertEqual([stock["part"] for stock in composition], [0.6, 0.4])
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(IndexRetrieverTestCase)
+    unittest.TextTestRunner(verbosity=2).run(suite)
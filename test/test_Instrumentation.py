@@ -0,0 +1,90 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from retriever.cdi import CDIRetriever
+from utils import instrumentation
+
+
+class InstrumentationTestCase(unittest.TestCase):
+    """Tests for counters, spans and their export"""
+
+    def setUp(self):
+        instrumentation.reset()
+        instrumentation.enable()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        instrumentation.disable()
+        instrumentation.reset()
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_disabled(self):
+        instrumentation.disable()
+        with instrumentation.span("parse", asset="cdi"):
+            pass
+        instrumentation.increment("files_parsed")
+        self.assertEqual(instrumentation.to_dict(), {"counters": [], "timers": []})
+
+    def test_span_and_counters(self):
+        for _ in range(3):
+            with instrumentation.span("parse", asset="cdi"):
+                time.sleep(0.01)
+        instrumentation.increment("files_parsed", asset="cdi")
+        instrumentation.increment("files_parsed", 2, asset="cdi")
+
+        metrics = instrumentation.to_dict()
+        self.assertEqual(
+            metrics["counters"],
+            [{"name": "files_parsed", "labels": {"asset": "cdi"}, "value": 3}],
+        )
+        (timer,) = metrics["timers"]
+        self.assertEqual(timer["count"], 3)
+        self.assertGreaterEqual(timer["total"], 0.03)
+        self.assertLessEqual(timer["min"], timer["max"])
+
+    def test_export(self):
+        with instrumentation.span("cache_read", asset="fund"):
+            pass
+        instrumentation.increment("files_parsed", asset="fund")
+
+        instrumentation.export(self.path("metrics.json"))
+        with open(self.path("metrics.json")) as f:
+            self.assertEqual(json.load(f), instrumentation.to_dict())
+
+        instrumentation.export(self.path("metrics.prom"))
+        with open(self.path("metrics.prom")) as f:
+            lines = f.read().splitlines()
+        self.assertIn('portfolio_files_parsed_total{asset="fund"} 1', lines)
+        self.assertIn('portfolio_cache_read_seconds_count{asset="fund"} 1', lines)
+        self.assertIn("# TYPE portfolio_cache_read_seconds summary", lines)
+
+    def test_retriever(self):
+        with open(self.path("codes.txt"), "w") as f:
+            f.write("CDI\n")
+        for year in range(2014, time.localtime()[0] + 1):
+            with open(self.path("CDI_%d.csv" % year), "w") as f:
+                f.write("date,annual\n%d-01-02,977\n%d-01-03,977\n" % (year, year))
+
+        dr = CDIRetriever(data_directory=self.directory.name)
+        dr._check_and_load_data_files()
+        dr.get_variation("CDI", "2014-01-02", "2014-01-03")
+
+        metrics = instrumentation.to_dict()
+        timers = {(t["name"], t["labels"].get("asset")) for t in metrics["timers"]}
+        for name in ("load", "parse", "index_build", "cache_write"):
+            self.assertIn((name, "cdi"), timers)
+        functions = [t["labels"].get("function") for t in metrics["timers"]]
+        self.assertIn("CDIRetriever.get_variation", functions)
+        (counter,) = metrics["counters"]
+        self.assertEqual(counter["value"], time.localtime()[0] - 2013)
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(InstrumentationTestCase)
+    unittest.TextTestRunner(verbosity=2).run(suite)
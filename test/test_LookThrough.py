@@ -0,0 +1,81 @@
+import unittest
+
+import pandas as pd
+
+from allocation import LookThrough, SecuritySelector, join_securities
+
+
+class FakeIndexRetriever:
+    def __init__(self, compositions):
+        self.compositions = compositions
+        self.reads = 0
+
+    def get_composition_frame(self, index, day=None):
+        self.reads += 1
+        codes, parts = zip(*self.compositions[index].items())
+        return pd.DataFrame({"code": codes, "part": parts})
+
+
+class LookThroughTestCase(unittest.TestCase):
+    """Tests for the ETF look-through"""
+
+    def setUp(self):
+        self.index_retriever = FakeIndexRetriever(
+            {
+                "IBOV": {"PETR4": 0.5, "VALE3": 0.3, "ITUB4": 0.2},
+                "SMLL": {"SMTO3": 0.6, "LREN3": 0.4},
+            }
+        )
+        self.look_through = LookThrough(index_retriever=self.index_retriever)
+
+    def test_expand(self):
+        exposures = self.look_through.expand(
+            {"BOVA11": 100.0, "SMAL11": 50.0, "PETR4": 20.0, "HGLG11": 30.0}
+        )
+        self.assertAlmostEqual(exposures["PETR4"], 70.0)
+        self.assertAlmostEqual(exposures["VALE3"], 30.0)
+        self.assertAlmostEqual(exposures["SMTO3"], 30.0)
+        # Unknown funds are kept as is
+        self.assertEqual(exposures["HGLG11"], 30.0)
+        self.assertNotIn("BOVA11", exposures)
+        self.assertAlmostEqual(sum(exposures.values()), 200.0)
+
+        # Compositions are read once
+        self.look_through.expand({"BOVV11": 1.0, "BOVA11": 1.0})
+        self.assertEqual(self.index_retriever.reads, 2)
+        self.assertEqual(self.look_through.expand({"PETR4": 1.0}), {"PETR4": 1.0})
+
+    def test_selector(self):
+        selector = SecuritySelector(num_of_secs=2, look_through=self.look_through)
+        selected = selector.select_securities({"BOVA11": 0.6, "VALE3": 0.4})
+        self.assertEqual(list(selected), ["VALE3", "PETR4"])
+        self.assertAlmostEqual(selected["VALE3"], 0.58 / 0.88)
+
+        joined = join_securities(
+            {"BOVA11": 0.5, "ITUB4": 0.5},
+            {"SMAL11": 1.0},
+            num_of_secs=0,
+            look_through=self.look_through,
+        )
+        self.assertAlmostEqual(joined["ITUB4"], 0.6 / 2.0)
+        self.assertAlmostEqual(sum(joined.values()), 1.0)
+
+    def test_many_etfs(self):
+        codes = ["STK%03d3" % i for i in range(100)]
+        compositions = {
+            "IDX%d" % i: {code: 1.0 / len(codes) for code in codes[i % 7 :]}
+            for i in range(200)
+        }
+        look_through = LookThrough(
+            {"ETF%d11" % i: "IDX%d" % i for i in range(200)},
+            FakeIndexRetriever(compositions),
+        )
+        securities = {"ETF%d11" % i: 1.0 for i in range(200)}
+        exposures = look_through.expand(securities)
+        self.assertEqual(len(exposures), 100)
+        self.assertAlmostEqual(sum(exposures.values()), 200.0)
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(LookThroughTestCase)
+    unittest.TextTestRunner(verbosity=2).run(suite)
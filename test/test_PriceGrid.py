@@ -0,0 +1,104 @@
+import tempfile
+import unittest
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.generators import data_years, write_fund_files
+from retriever.fund import FundRetriever
+from retriever.grid import PriceGrid
+
+
+class PriceGridTestCase(unittest.TestCase):
+    """Tests for the forward filled price grid"""
+
+    def setUp(self):
+        self.grid = PriceGrid.from_series(
+            {
+                "AAAA3": pd.Series(
+                    [10.0, 11.0, 12.0],
+                    pd.to_datetime(["2024-01-02", "2024-01-05", "2024-01-08"]),
+                ),
+                "BBBB4": pd.Series([20.0], pd.to_datetime(["2024-01-04"])),
+            }
+        )
+
+    def test_lookup(self):
+        self.assertEqual(self.grid.lookup("AAAA3", "2024-01-02"), (10.0, 0))
+        self.assertEqual(self.grid.lookup("AAAA3", "2024-01-04"), (10.0, 2))
+        self.assertEqual(self.grid.lookup("AAAA3", date(2024, 1, 7)), (11.0, 2))
+        self.assertEqual(self.grid.lookup("BBBB4", "2024-01-08"), (20.0, 4))
+        self.assertEqual(self.grid.last_day, date(2024, 1, 8))
+        # Quotes are carried forward after the end of the grid
+        self.assertEqual(self.grid.lookup("AAAA3", "2024-01-10"), (12.0, 2))
+
+    def test_missing(self):
+        self.assertIsNone(self.grid.lookup("BBBB4", "2024-01-03"))
+        self.assertIsNone(self.grid.lookup("AAAA3", "2023-12-31"))
+        self.assertIsNone(self.grid.lookup("CCCC3", "2024-01-05"))
+        self.assertTrue(np.isnan(self.grid.values[0, 1]))
+        self.assertEqual(self.grid.ages[0, 1], -1)
+
+    def test_repeated_days(self):
+        grid = PriceGrid.from_records(
+            np.array(["2024-01-02", "2024-01-02"], dtype="datetime64[ns]"),
+            np.array([0, 0]),
+            np.array([1.0, 2.0]),
+            ["AAAA3"],
+        )
+        self.assertEqual(grid.lookup("AAAA3", "2024-01-02"), (2.0, 0))
+
+
+class FundPriceGridTestCase(unittest.TestCase):
+    """Tests for grid lookups of a value retriever"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.codes = write_fund_files(cls.directory.name, 3, data_years())
+        cls.retriever = FundRetriever(data_directory=cls.directory.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def tearDown(self):
+        self.retriever.drop_price_grid()
+
+    def test_lookups(self):
+        rng = np.random.default_rng(0)
+        days = pd.date_range(f"{data_years()[0]}-01-10", date.today())
+        queries = [
+            (str(code), f"{day:%Y-%m-%d}")
+            for code, day in zip(
+                rng.choice(self.codes, 200), days[rng.integers(0, len(days), 200)]
+            )
+        ]
+        expected = [self.retriever.get_value(c, d) for c, d in queries]
+        quotes = [self.retriever.get_quote(c, d) for c, d in queries]
+
+        grid = self.retriever.build_price_grid()
+        self.assertEqual(grid.codes, self.codes)
+        self.assertEqual([self.retriever.get_value(c, d) for c, d in queries], expected)
+        self.assertEqual([self.retriever.get_quote(c, d) for c, d in queries], quotes)
+        # Weekends are two or three days old
+        saturday = next(d for d in days if d.dayofweek == 5)
+        _, age = self.retriever.get_quote(self.codes[0], saturday.date())
+        self.assertGreaterEqual(age, 1)
+
+    def test_partial_grid(self):
+        grid = self.retriever.build_price_grid(self.codes[:1])
+        self.assertEqual(grid.codes, self.codes[:1])
+        # Codes outside the grid use the data frames
+        day = f"{data_years()[0]}-06-03"
+        self.assertEqual(
+            self.retriever.get_value(self.codes[1], day),
+            self.retriever.data[self.codes[1]]["VL_QUOTA"].asof(pd.Timestamp(day)),
+        )
+
+
+if __name__ == "__main__":
+    for case in (PriceGridTestCase, FundPriceGridTestCase):
+        suite = unittest.TestLoader().loadTestsFromTestCase(case)
+        unittest.TextTestRunner(verbosity=2).run(suite)
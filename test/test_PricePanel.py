@@ -0,0 +1,94 @@
+import glob
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from benchmarks.generators import data_years, write_fund_files
+from retriever import PricePanel
+from retriever.fund import FundRetriever
+from retriever.registry import RetrieverRegistry
+
+
+class PricePanelTestCase(unittest.TestCase):
+    """Tests for aligned price panels"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.data_directory = os.path.join(cls.directory.name, "data")
+        os.mkdir(cls.data_directory)
+        cls.codes = write_fund_files(cls.data_directory, 3, data_years())
+        cls.registry = RetrieverRegistry()
+        cls.registry.register(
+            "fund", lambda: FundRetriever(data_directory=cls.data_directory)
+        )
+        cls.retriever = cls.registry.get("fund")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def setUp(self):
+        self.cache_directory = tempfile.TemporaryDirectory()
+        self.panel = PricePanel(
+            self.registry, self.cache_directory.name, sources=["fund"]
+        )
+        self.first_year = data_years()[0]
+
+    def tearDown(self):
+        self.cache_directory.cleanup()
+
+    def test_build(self):
+        start, end = f"{self.first_year}-01-01", f"{self.first_year}-03-31"
+        names = self.codes[::-1]
+        panel = self.panel.build(names, start, end)
+        self.assertEqual(list(panel.columns), names)
+        self.assertEqual(len(panel), 90)
+        self.assertTrue(panel.loc[start].isna().all())
+
+        for day in pd.date_range(f"{self.first_year}-01-10", end, freq="7D"):
+            for name in names:
+                self.assertEqual(
+                    panel.loc[day, name], self.retriever.get_value(name, day)
+                )
+
+    def test_max_age(self):
+        start, end = f"{self.first_year}-02-01", f"{self.first_year}-02-28"
+        panel = self.panel.build(self.codes, start, end, max_age=0)
+        weekend = panel.index.dayofweek >= 5
+        self.assertTrue(panel[weekend].isna().all().all())
+        self.assertFalse(panel[~weekend].isna().any().any())
+
+        panel = self.panel.build(self.codes, start, end, calendar="ANBIMA")
+        self.assertFalse((panel.index.dayofweek >= 5).any())
+
+    def test_cache(self):
+        start, end = f"{self.first_year}-01-01", f"{self.first_year + 1}-12-31"
+        panel = self.panel.build(self.codes, start, end)
+        (cache_file,) = glob.glob(os.path.join(self.cache_directory.name, "*"))
+        pd.testing.assert_frame_equal(
+            self.panel.build(self.codes, start, end), panel, check_freq=False
+        )
+        self.assertEqual(len(os.listdir(self.cache_directory.name)), 1)
+
+        # A reload of the retriever invalidates the cached panels
+        loaded_at = self.retriever.loaded_at
+        self.retriever.loaded_at += 1.0
+        try:
+            self.panel.build(self.codes, start, end)
+        finally:
+            self.retriever.loaded_at = loaded_at
+        self.assertEqual(len(os.listdir(self.cache_directory.name)), 2)
+
+    def test_unknown(self):
+        with self.assertRaises(AssertionError):
+            self.panel.build(["XXXX3"], "2020-01-01", "2020-01-31")
+        self.assertEqual(self.panel.source_of(self.retriever), "fund")
+        self.assertIsNone(self.panel.source_of(object()))
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(PricePanelTestCase)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,114 @@
+import glob
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime
+from datetime import time as day_time
+
+from retriever.cdi import CDIRetriever
+from retriever.refresher import Refresher, next_run
+from retriever.registry import RetrieverRegistry
+
+
+class RefresherTestCase(unittest.TestCase):
+    """Tests for the background refresh of retrievers"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        with open(self.path("codes.txt"), "w") as f:
+            f.write("CDI\n")
+        for year in range(2014, time.localtime()[0] + 1):
+            self.write_rates(year, 977, time.time() - 100)
+
+        self.registry = RetrieverRegistry()
+        self.registry.register("cdi", self.build_retriever)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def write_rates(self, year, rate, mtime=None):
+        file_name = self.path("CDI_%d.csv" % year)
+        with open(file_name, "w") as f:
+            f.write(
+                "date,annual\n%d-01-02,%d\n%d-01-03,%d\n" % (year, rate, year, rate)
+            )
+        if mtime is not None:
+            os.utime(file_name, (mtime, mtime))
+
+    def build_retriever(self):
+        dr = CDIRetriever(data_directory=self.directory.name)
+        dr._check_and_load_data_files()
+        return dr
+
+    def test_refresh(self):
+        dr = self.registry.get("cdi")
+        before = dr.get_variation("CDI", "2014-01-02", "2014-01-04")
+        self.assertFalse(dr.refresh(download=False))
+
+        # Readers keep getting whole results while the data is swapped
+        results = []
+        stop = threading.Event()
+
+        def reader():
+            while not stop.is_set():
+                results.append(dr.get_variation("CDI", "2014-01-02", "2014-01-04"))
+
+        thread = threading.Thread(target=reader, daemon=True)
+        thread.start()
+        self.write_rates(2014, 1377)
+        data = dr.data
+        try:
+            self.assertTrue(dr.refresh(download=False))
+        finally:
+            stop.set()
+            thread.join()
+
+        self.assertIsNot(dr.data, data)
+        after = dr.get_variation("CDI", "2014-01-02", "2014-01-04")
+        self.assertGreater(after, before)
+        self.assertEqual(set(results) - {before, after}, set())
+        self.assertEqual(glob.glob(self.path("*.part")), [])
+        self.assertFalse(dr.refresh(download=False))
+
+    def test_refresher(self):
+        refreshed = []
+        refresher = Refresher(self.registry, {"cdi": 60.0}, download=False)
+        refresher.add_listener(refreshed.append)
+
+        # Retrievers not loaded are not refreshed
+        self.write_rates(2014, 1377)
+        self.assertEqual(refresher.refresh_all(), [])
+
+        self.registry.get("cdi")
+        now = datetime.now()
+        self.assertEqual(refresher.run_pending(now), [])
+        self.write_rates(2014, 1577)
+        self.assertEqual(refresher.run_pending(now), [])
+        self.assertEqual(refresher.run_pending(refresher.next_due()), ["cdi"])
+        self.assertEqual(refreshed, ["cdi"])
+        self.assertIn("cdi", refresher.last_refresh)
+
+    def test_next_run(self):
+        schedule = [day_time(20, 30), day_time(9, 30)]
+        self.assertEqual(
+            next_run(schedule, datetime(2024, 1, 2, 12, 0)),
+            datetime(2024, 1, 2, 20, 30),
+        )
+        self.assertEqual(
+            next_run(schedule, datetime(2024, 1, 2, 20, 30)),
+            datetime(2024, 1, 3, 9, 30),
+        )
+        self.assertEqual(
+            next_run(90.0, datetime(2024, 1, 2, 12, 0)),
+            datetime(2024, 1, 2, 12, 1, 30),
+        )
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(RefresherTestCase)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,96 @@
+import threading
+import time
+import unittest
+
+from retriever.registry import RetrieverRegistry
+
+
+class FakeRetriever:
+    instances = 0
+    lock = threading.Lock()
+
+    def __init__(self, delay=0.2, fail=False, barrier=None):
+        time.sleep(delay)
+        if barrier is not None:
+            barrier.wait()
+        if fail:
+            raise Exception("No data files")
+        with FakeRetriever.lock:
+            FakeRetriever.instances += 1
+
+    def memory_usage(self):
+        return 2**20
+
+
+class RegistryTestCase(unittest.TestCase):
+    """Tests for the retriever registry"""
+
+    def setUp(self):
+        FakeRetriever.instances = 0
+        self.registry = RetrieverRegistry()
+        self.registry.register("a", FakeRetriever)
+        self.registry.register("b", FakeRetriever)
+        self.registry.register("broken", lambda: FakeRetriever(0.0, fail=True))
+        self.registry.register_profile("both", ["a", "b"])
+
+    def test_single_instance(self):
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.registry.get("a")))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(FakeRetriever.instances, 1)
+        self.assertTrue(all(r is results[0] for r in results))
+
+    def test_preload(self):
+        # Retrievers are built concurrently: each constructor waits for the
+        # other one at the barrier, which breaks (timeout) if run serially
+        barrier = threading.Barrier(2, timeout=5.0)
+        self.registry.register("c", lambda: FakeRetriever(0.0, barrier=barrier))
+        self.registry.register("d", lambda: FakeRetriever(0.0, barrier=barrier))
+        self.registry.register_profile("concurrent", ["c", "d"])
+
+        threads = self.registry.preload("concurrent")
+        self.assertEqual(len(threads), 2)
+        c = self.registry.get("c")
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.registry.errors, {})
+        self.assertTrue(self.registry.is_loaded("d"))
+        self.assertIs(self.registry.get("c"), c)
+        self.assertEqual(FakeRetriever.instances, 2)
+        self.assertEqual(self.registry.preload("concurrent", wait=True), [])
+
+    def test_remove(self):
+        a = self.registry.get("a")
+        self.registry.remove("a")
+        self.assertFalse(self.registry.is_loaded("a"))
+        self.assertNotIn("a", self.registry.stats)
+        self.assertIsNot(self.registry.get("a"), a)
+
+    def test_stats(self):
+        self.registry.preload("both", wait=True)
+        stats = self.registry.stats["a"]
+        self.assertGreaterEqual(stats.load_time, 0.2)
+        self.assertEqual(stats.memory_usage, 2**20)
+        self.assertIn("1.0", self.registry.report())
+
+    def test_errors(self):
+        with self.assertLogs("retriever.registry", "ERROR") as logs:
+            self.registry.preload(["broken"], wait=True)
+        self.assertIn("Preloading broken failed", logs.output[0])
+        self.assertIn("broken", self.registry.errors)
+        self.assertIn("broken", self.registry.stats)
+        self.assertFalse(self.registry.is_loaded("broken"))
+        with self.assertRaises(Exception):
+            self.registry.get("broken")
+        self.assertIn("failed", self.registry.report())
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(RegistryTestCase)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,50 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from retriever.schema import compact_frame, frame_memory_usage
+
+
+class SchemaTestCase(unittest.TestCase):
+    """Tests for compact dataframe dtypes"""
+
+    def setUp(self):
+        size = 3000
+        self.df = pd.DataFrame(
+            {
+                "Emissor": ["ENERGISA", "RODOVIAS", "TRANSMISSAO"] * (size // 3),
+                "ISIN": [None, "BRRDVTDBS003", "BRTEPEDBS015"] * (size // 3),
+                "Quantidade": np.arange(size),
+                "PU_Medio": np.linspace(1000.0, 1100.0, size) / 3.0,
+                "Percentual": [0.5, 1.25, 2.0] * (size // 3),
+            },
+            index=pd.date_range("2014-01-02", periods=size, name="Data"),
+        )
+
+    def test_dtypes(self):
+        compacted = compact_frame(self.df)
+        self.assertIsInstance(compacted["Emissor"].dtype, pd.CategoricalDtype)
+        self.assertIsInstance(compacted["ISIN"].dtype, pd.CategoricalDtype)
+        self.assertEqual(compacted["Quantidade"].dtype, np.int16)
+        # Prices are not exactly representable as float32 and must be kept
+        self.assertEqual(compacted["PU_Medio"].dtype, np.float64)
+        self.assertEqual(compacted["Percentual"].dtype, np.float32)
+        self.assertLess(frame_memory_usage(compacted), frame_memory_usage(self.df) / 3)
+
+    def test_values(self):
+        compacted = compact_frame(self.df)
+        ts = pd.Timestamp("2014-03-01")
+        for col in self.df.columns:
+            original = self.df.loc[ts, col]
+            if pd.isna(original):
+                self.assertTrue(pd.isna(compacted.loc[ts, col]))
+            else:
+                self.assertEqual(compacted.loc[ts, col], original)
+        for col in ("Quantidade", "PU_Medio", "Percentual"):
+            np.testing.assert_array_equal(compacted[col], self.df[col])
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(SchemaTestCase)
+    unittest.TextTestRunner(verbosity=2).run(suite)
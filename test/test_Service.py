@@ -0,0 +1,133 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from retriever.registry import RetrieverRegistry
+from service import ServiceClient, ValuationService, make_server
+
+
+class FakeRetriever:
+    """Retriever serving the prices written in its data directory"""
+
+    def __init__(self, data_directory):
+        self.data_directory = data_directory
+        with open(os.path.join(data_directory, "prices.txt")) as f:
+            self.prices = dict(line.split() for line in f)
+
+    def get_value(self, code, day):
+        return float(self.prices[code])
+
+    def get_variation(self, code, begin_date, end_date):
+        return (end_date - begin_date).days / 100.0
+
+
+class ServiceTestCase(unittest.TestCase):
+    """Tests for the local valuation service"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data_directory = os.path.join(self.temp_dir.name, "data")
+        os.mkdir(self.data_directory)
+        self.writes = 0
+        self.write_prices("AAAA3 10.5\nBBBB4 20.0\n")
+
+        self.registry = RetrieverRegistry()
+        self.registry.register(
+            "fake", lambda: FakeRetriever(data_directory=self.data_directory)
+        )
+        self.service = ValuationService(self.registry)
+
+        socket_path = os.path.join(self.temp_dir.name, "service.sock")
+        self.server = make_server(self.service, socket_path)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.client = ServiceClient(socket_path)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.service.stop()
+        self.temp_dir.cleanup()
+
+    def write_prices(self, content):
+        file_name = os.path.join(self.data_directory, "prices.txt")
+        with open(file_name, "w") as f:
+            f.write(content)
+        # Make sure the modification time changes
+        self.writes += 1
+        mtime = time.time_ns() + self.writes * 10**9
+        os.utime(file_name, ns=(mtime, mtime))
+
+    def test_queries(self):
+        self.assertEqual(self.client.get_value("fake", "AAAA3", "2024-01-02"), 10.5)
+        self.assertEqual(
+            self.client.get_variation("fake", "CDI", "2024-01-01", "2024-01-11"), 0.1
+        )
+        status = self.client.status()
+        self.assertIn("fake", status["retrievers"])
+        self.assertEqual(status["requests"], 3)
+
+    def test_errors(self):
+        with self.assertRaises(Exception) as cm:
+            self.client.get_value("fake", "CCCC3", "2024-01-02")
+        self.assertIn("CCCC3", str(cm.exception))
+        with self.assertRaises(Exception):
+            self.client.request("GET", "/unknown")
+        # Bad input is the client's error, anything else the service's
+        with self.assertRaisesRegex(Exception, r"\(400\)"):
+            self.client.get_variation("fake", "CDI", "2024-01-01", "01/11/2024")
+
+        def status():
+            raise RuntimeError("broken")
+
+        self.service.status = status
+        with self.assertLogs("service.server", "ERROR"):
+            with self.assertRaisesRegex(Exception, r"\(500\).*broken"):
+                self.client.status()
+        # The connection is still usable
+        self.assertEqual(self.client.get_value("fake", "BBBB4", "2024-01-02"), 20.0)
+
+    def test_reload(self):
+        self.client.get_value("fake", "AAAA3", "2024-01-02")
+        self.service.record_stamps()
+        self.assertEqual(self.service.changed_retrievers(), [])
+
+        old = self.registry.get("fake")
+        self.write_prices("AAAA3 11.0\nBBBB4 20.0\n")
+        self.assertEqual(self.service.changed_retrievers(), ["fake"])
+        self.service.reload("fake").join()
+
+        self.assertIsNot(self.registry.get("fake"), old)
+        self.assertEqual(self.service.changed_retrievers(), [])
+        self.assertEqual(self.service.generation, 1)
+        self.assertEqual(self.client.get_value("fake", "AAAA3", "2024-01-02"), 11.0)
+
+    def test_watch(self):
+        self.client.get_value("fake", "AAAA3", "2024-01-02")
+        self.service.watch(0.05)
+        self.write_prices("AAAA3 12.0\nBBBB4 20.0\n")
+        deadline = time.time() + 5.0
+        while self.service.generation == 0 and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(self.client.get_value("fake", "AAAA3", "2024-01-02"), 12.0)
+
+    def test_tcp(self):
+        server = make_server(self.service, port=0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        client = ServiceClient(port=server.server_address[1])
+        try:
+            self.assertEqual(client.get_value("fake", "BBBB4", "2024-01-02"), 20.0)
+            self.assertEqual(client.reload("fake"), ["fake"])
+        finally:
+            client.close()
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(ServiceTestCase)
+    unittest.TextTestRunner(verbosity=2).run(suite)
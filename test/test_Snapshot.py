@@ -0,0 +1,83 @@
+import os
+import tempfile
+import time
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from retriever.registry import RetrieverRegistry
+from retriever.snapshot import load_snapshot, restore_snapshot, save_snapshot
+
+
+class FakeRetriever:
+    def __init__(self, data_directory):
+        self.data_directory = data_directory
+        index = pd.date_range("2014-01-02", periods=3000, name="Data")
+        self._data = {
+            "CDI": pd.DataFrame({"Fator": np.linspace(1.0, 1.001, len(index))}, index)
+        }
+        # Derived index, as kept by the retrievers for fast lookups
+        self.cumulative = np.cumprod(self._data["CDI"]["Fator"].to_numpy())
+
+    def memory_usage(self):
+        return self.cumulative.nbytes
+
+
+class SnapshotTestCase(unittest.TestCase):
+    """Tests for retriever snapshots"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.data_file = os.path.join(self.directory.name, "CDI_2014.csv")
+        with open(self.data_file, "w") as f:
+            f.write("Data,Fator\n")
+        self.snapshot_file = os.path.join(self.directory.name, "data.snapshot")
+        self.retriever = FakeRetriever(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        save_snapshot(self.snapshot_file, {"cdi": self.retriever})
+        contents = load_snapshot(self.snapshot_file)
+        self.assertIsNotNone(contents)
+        restored = contents["retrievers"]["cdi"]
+        pd.testing.assert_frame_equal(
+            restored._data["CDI"], self.retriever._data["CDI"]
+        )
+        np.testing.assert_array_equal(restored.cumulative, self.retriever.cumulative)
+        # Arrays are views of the mapped file, but still writable
+        self.assertFalse(restored.cumulative.flags.owndata)
+        restored.cumulative[0] = 0.0
+        self.assertEqual(
+            load_snapshot(self.snapshot_file)["retrievers"]["cdi"].cumulative[0], 1.0
+        )
+
+    def test_stale_snapshot(self):
+        save_snapshot(self.snapshot_file, {"cdi": self.retriever})
+        # Cache files do not invalidate the snapshot, data files do
+        with open(os.path.join(self.directory.name, "CDI.cache"), "w") as f:
+            f.write("cache")
+        self.assertIsNotNone(load_snapshot(self.snapshot_file))
+        os.utime(self.data_file, (time.time() + 10, time.time() + 10))
+        self.assertIsNone(load_snapshot(self.snapshot_file))
+        self.assertIsNone(load_snapshot(self.snapshot_file + ".missing"))
+
+    def test_restore(self):
+        save_snapshot(self.snapshot_file, {"cdi": self.retriever})
+        registry = RetrieverRegistry()
+        registry.register("cdi", lambda: self.fail("Retriever should not be built"))
+        self.assertTrue(restore_snapshot(self.snapshot_file, registry))
+        self.assertTrue(registry.is_loaded("cdi"))
+        np.testing.assert_array_equal(
+            registry.get("cdi").cumulative, self.retriever.cumulative
+        )
+        self.assertEqual(
+            registry.stats["cdi"].memory_usage, self.retriever.memory_usage()
+        )
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(SnapshotTestCase)
+    unittest.TextTestRunner(verbosity=2).run(suite)
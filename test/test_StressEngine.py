@@ -0,0 +1,130 @@
+import glob
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import retriever
+from benchmarks.generators import data_years, registered_retrievers
+from model.analytics import DebtBook
+from model.security import BankBondCDI, BankBondIPCA, BankBondPre, TreasureBond
+from model.stress import (
+    STAGES,
+    StressEngine,
+    breakeven,
+    parallel,
+    standard_scenarios,
+    twist,
+)
+from retriever.curves import B3CurveRetriever
+from utils.calendars import get_calendar
+
+
+class StressEngineTestCase(unittest.TestCase):
+    """Tests for repricing the debt book under curve scenarios"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = cls.enterClassContext(tempfile.TemporaryDirectory())
+        # Securities get their retrievers from the registry (as in benchmarks)
+        cls.enterClassContext(
+            registered_retrievers(cls.directory, ["bcb", "curves", "directtreasure"])
+        )
+
+        year = data_years()[-2]
+        cls.day = get_calendar("ANBIMA").preceding(date(year, 12, 20))
+        issue_date = get_calendar("ANBIMA").following(date(year, 3, 1))
+        maturity = date(date.today().year + 3, 1, 2)
+        cls.bank_bonds = [
+            BankBondPre("CDB_PRE", maturity, 0.12, issue_date, 1000.0, "Fixed"),
+            BankBondCDI("CDB_CDI", maturity, 1.1, issue_date, 1000.0, "Floating"),
+            BankBondIPCA("CDB_IPCA", maturity, 0.06, issue_date, 1000.0, "Inflation"),
+        ]
+        maturity = date(date.today().year + 2, 1, 1)
+        cls.treasure_bonds = [
+            TreasureBond.create(f"{kind}_{maturity:%d%m%y}", 0.1)
+            for kind in ("LTN", "NTN-F", "NTN-B", "LFT")
+        ]
+        items = [(bond, 10.0) for bond in cls.bank_bonds + cls.treasure_bonds]
+        cls.book = DebtBook(items, cls.day)
+
+    def shifted_curves(self, bp: float) -> B3CurveRetriever:
+        # The curve files, with all vertices shifted
+        directory = os.path.join(self.directory, "curves_%d" % bp)
+        shutil.copytree(os.path.join(self.directory, "curves"), directory)
+        for file_name in glob.glob(directory + "/yc_*.csv"):
+            df = pd.read_csv(file_name)
+            df["rate"] += bp / 10000.0
+            df.to_csv(file_name, index=False)
+        for file_name in glob.glob(directory + "/*.cache"):
+            os.remove(file_name)
+        return B3CurveRetriever(data_directory=directory)
+
+    def test_scenarios(self):
+        scenarios = standard_scenarios()
+        self.assertGreaterEqual(len(scenarios), 24)
+        self.assertEqual(len({s.name for s in scenarios}), len(scenarios))
+        engine = StressEngine(self.book, processes=1)
+        pnl = engine.run(scenarios)
+        self.assertEqual(pnl.shape, (len(scenarios), len(self.book)))
+        self.assertEqual(list(pnl.index), [s.name for s in scenarios])
+        self.assertEqual(sorted(engine.timings), sorted(STAGES))
+        self.assertGreater(engine.timings["shocked_curves"], 0.0)
+
+        # Rates up, fixed rate bonds down
+        fixed = ["CDB_PRE", self.treasure_bonds[0].name]
+        self.assertTrue((pnl.loc["parallel +100bp", fixed] < 0).all())
+        self.assertTrue((pnl.loc["parallel -100bp", fixed] > 0).all())
+        # LFT is not moved by the curves
+        lft = self.treasure_bonds[3].name
+        self.assertTrue((pnl[lft] == 0.0).all())
+        # Breakeven shocks do not move real rates
+        ntnb = self.treasure_bonds[2].name
+        self.assertEqual(pnl.loc["breakeven +50bp", ntnb], 0.0)
+        self.assertLess(pnl.loc["breakeven +50bp", "CDB_IPCA"], 0.0)
+
+    def test_process_pool(self):
+        scenarios = [parallel(50), twist(-50, 50, 5.0), breakeven(-25)]
+        expected = StressEngine(self.book, processes=1).run(scenarios)
+        engine = StressEngine(self.book, processes=2)
+        pd.testing.assert_frame_equal(engine.run(scenarios), expected)
+        self.assertGreater(engine.timings["workers"], 0.0)
+        # Few scenarios are not worth starting workers for
+        engine = StressEngine(self.book)
+        pd.testing.assert_frame_equal(engine.run(scenarios), expected)
+        self.assertEqual(engine.timings["workers"], 0.0)
+
+    def test_bank_bonds(self):
+        # Bank bonds are repriced as get_value would with the shifted curves
+        pnl = StressEngine(self.book, processes=1).run([parallel(100)])
+        base_values = [bond.get_value(self.day) for bond in self.bank_bonds]
+        base_curves = retriever.get_curve_retriever()
+        retriever.registry.add("curves", self.shifted_curves(100))
+        try:
+            values = [bond.get_value(self.day) for bond in self.bank_bonds]
+        finally:
+            retriever.registry.add("curves", base_curves)
+        names = [bond.name for bond in self.bank_bonds]
+        np.testing.assert_allclose(
+            pnl.loc["parallel +100bp", names] / 10.0,
+            np.array(values) - np.array(base_values),
+            rtol=1e-6,
+        )
+
+    def test_treasure_bonds(self):
+        # A small shift moves treasure bonds by their DV01
+        pnl = StressEngine(self.book, processes=1).run([parallel(1)])
+        dv01 = self.book.measures()["dv01"]
+        for bond in self.treasure_bonds[:3]:
+            self.assertAlmostEqual(
+                -pnl.loc["parallel +1bp", bond.name] / dv01[bond.name], 1.0, delta=0.02
+            )
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(StressEngineTestCase)
+    unittest.TextTestRunner(verbosity=2).run(suite)
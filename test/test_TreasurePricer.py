@@ -0,0 +1,172 @@
+import os
+import tempfile
+import time
+import unittest
+from datetime import date
+
+import numpy as np
+
+from benchmarks.generators import data_years, write_sgs_files
+from model.fixedincome import DateRangePeriod, ir_over
+from model.pricing import TreasurePricer, payment_dates
+from retriever.bcb import BCBRetriever
+from retriever.directtreasure import DirectTreasureRetriever
+from retriever.retriever import DataRetriever
+from utils.calendars import get_calendar
+
+YEAR = time.localtime()[0] - 1
+KINDS = ["LTN", "NTN-F", "NTN-B", "LFT"]
+BONDS = ["LTN_010130", "NTN-F_010131", "NTN-B_150530", "LFT_010329"]
+SHEETS = ["LTN 010130", "NTN-F 010131", "NTN-B 150530", "LFT 010329"]
+HEADER = [
+    "Dia",
+    "Taxa Compra Manha",
+    "Taxa Venda Manha",
+    "PU Compra Manha",
+    "PU Venda Manha",
+    "PU Base Manha",
+]
+
+
+class TreasurePricerTestCase(unittest.TestCase):
+    """Tests for pricing Tesouro Direto bonds from their rates"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        bcb_directory = os.path.join(cls.directory.name, "bcb")
+        treasure_directory = os.path.join(cls.directory.name, "treasure")
+        os.makedirs(bcb_directory)
+        os.makedirs(treasure_directory)
+
+        write_sgs_files(bcb_directory, data_years())
+        cls.bcb = BCBRetriever(data_directory=bcb_directory)
+
+        cls.calendar = get_calendar("ANBIMA")
+        cls.days = cls.calendar.seq(date(YEAR, 1, 2), date(YEAR, 12, 30))
+        rng = np.random.default_rng(0)
+        cls.rates = {bond: rng.uniform(0.05, 0.15, len(cls.days)) for bond in BONDS}
+        cls.prices = {
+            bond: [
+                cls.reference_price(bond, day, rate)
+                for day, rate in zip(cls.days, cls.rates[bond])
+            ]
+            for bond in BONDS
+        }
+        cls.write_treasure_files(treasure_directory)
+        cls.treasure = DirectTreasureRetriever(data_directory=treasure_directory)
+        cls.pricer = TreasurePricer(cls.treasure, cls.bcb)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    @classmethod
+    def reference_price(cls, bond: str, day: date, rate: float) -> float:
+        # Scalar pricing, one cash flow at a time
+        def discount(payment: date) -> float:
+            payment = cls.calendar.following(payment)
+            return ir_over(rate).discount(DateRangePeriod([day, payment]))
+
+        kind, maturity = bond.rsplit("_", 1)
+        maturity = date(2000 + int(maturity[4:]), int(maturity[2:4]), 1)
+        if kind == "LTN":
+            return 1000.0 * discount(maturity)
+        if kind == "NTN-F":
+            payments = [date(y, m, 1) for y in range(YEAR, 2032) for m in (1, 7)]
+            return cls.coupon_bond(discount, day, maturity, payments, 1000.0, 0.1)
+        if kind == "LFT":
+            return 15000.0 * cls.factor("SELIC", day) * discount(maturity)
+        maturity = maturity.replace(day=15)
+        payments = [date(y, m, 15) for y in range(YEAR, 2031) for m in (5, 11)]
+        quotation = cls.coupon_bond(discount, day, maturity, payments, 100.0, 0.06)
+        return 4000.0 * cls.factor("IPCA", day) * quotation / 100.0
+
+    @staticmethod
+    def coupon_bond(discount, day, maturity, payments, face, rate) -> float:
+        # Semiannual coupons paid after day, and the face value at maturity
+        coupon = face * ((1.0 + rate) ** 0.5 - 1.0)
+        value = sum(coupon * discount(p) for p in payments if day < p <= maturity)
+        return value + face * discount(maturity)
+
+    @classmethod
+    def factor(cls, code: str, day: date) -> float:
+        # Daily rates from the first day of the year, the last day not included
+        series = cls.bcb.data["bcb"][code]
+        series = series[(series.index >= "%d-01-02" % YEAR) & (series.index < str(day))]
+        return float((1.0 + series).prod())
+
+    @classmethod
+    def write_treasure_files(cls, directory: str) -> None:
+        import xlwt
+
+        with open(os.path.join(directory, "codes.txt"), "w") as f:
+            f.write("\n".join(KINDS) + "\n")
+        for kind, bond, sheet_name in zip(KINDS, BONDS, SHEETS):
+            for year in range(DataRetriever._initial_year, time.localtime()[0] + 1):
+                book = xlwt.Workbook()
+                if year != YEAR:
+                    book.add_sheet("Sheet")
+                    book.save(os.path.join(directory, f"{kind}_{year}.xls"))
+                    continue
+                sheet = book.add_sheet(sheet_name)
+                sheet.write(0, 0, sheet_name)
+                for col, name in enumerate(HEADER):
+                    sheet.write(1, col, name)
+                # Quotes are published on the first business day of each month
+                row = 2
+                for i, day in enumerate(cls.days):
+                    if i > 0 and cls.days[i - 1].month == day.month:
+                        continue
+                    price = cls.prices[bond][i]
+                    sheet.write(row, 0, day.strftime("%d/%m/%Y"))
+                    sheet.write(row, 1, cls.rates[bond][i] * 100.0)
+                    sheet.write(row, 2, cls.rates[bond][i] * 100.0)
+                    sheet.write(row, 3, price)
+                    sheet.write(row, 4, price)
+                    sheet.write(row, 5, price)
+                    row += 1
+                book.save(os.path.join(directory, f"{kind}_{year}.xls"))
+
+    def test_payment_dates(self):
+        dates = payment_dates("NTN-F", date(2031, 1, 1), date(2029, 7, 1))
+        self.assertEqual(
+            list(dates.astype(object)),
+            [date(2030, 1, 1), date(2030, 7, 1), date(2031, 1, 1)],
+        )
+        self.assertEqual(
+            len(payment_dates("LTN", date(2030, 1, 1), date(2025, 1, 2))), 1
+        )
+
+    def test_price(self):
+        # All bonds and days in a single call, including the days without quotes
+        names = [bond for bond in BONDS for _ in self.days]
+        days = [day for _ in BONDS for day in self.days]
+        rates = np.concatenate([self.rates[bond] for bond in BONDS])
+        prices = self.pricer.price(names, days, rates)
+        expected = np.concatenate([self.prices[bond] for bond in BONDS])
+        np.testing.assert_allclose(prices, expected, rtol=1e-7)
+
+    def test_published_prices(self):
+        # Quotes published in the Tesouro Direto files are reproduced
+        for bond in BONDS:
+            quotes = self.treasure.data[bond]
+            prices = self.pricer.price(
+                [bond] * len(quotes),
+                quotes.index,
+                quotes["Taxa_Compra_Manha"].to_numpy() / 100.0,
+            )
+            np.testing.assert_allclose(prices, quotes["PU_Compra_Manha"], rtol=1e-9)
+
+    def test_what_if_rates(self):
+        day = self.days[100]
+        prices = self.pricer.price(["NTN-B_150530"] * 3, [day] * 3, [0.05, 0.06, 0.07])
+        self.assertTrue(prices[0] > prices[1] > prices[2])
+        self.assertAlmostEqual(
+            prices[1], self.reference_price("NTN-B_150530", day, 0.06), delta=1e-6
+        )
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(TreasurePricerTestCase)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,44 @@
+"""
+Process-wide registry of business day calendars.
+
+Loading a bizdays calendar is expensive (PMC/BMF alone takes seconds), so
+calendars are loaded on first use and shared by every module that needs them.
+"""
+
+import logging
+import threading
+
+from bizdays import Calendar  # pyright: ignore[reportMissingTypeStubs]
+
+from .instrumentation import span
+
+logger = logging.getLogger(__name__)
+
+_calendars: dict[str, Calendar] = {}
+_lock = threading.Lock()
+
+
+def get_calendar(name: str) -> Calendar:
+    """Return the calendar with the given name, loading it on the first call."""
+    calendar = _calendars.get(name)
+    if calendar is None:
+        with _lock:
+            calendar = _calendars.get(name)
+            if calendar is None:
+                logger.info("Loading calendar %s...", name)
+                with span("calendar_load", calendar=name):
+                    calendar = Calendar.load(name)  # pyright: ignore[reportUnknownMemberType]
+                _calendars[name] = calendar
+    return calendar
+
+
+def loaded_calendars() -> dict[str, Calendar]:
+    """Return the calendars loaded so far, by name."""
+    with _lock:
+        return dict(_calendars)
+
+
+def add_calendar(name: str, calendar: Calendar) -> None:
+    """Register an already loaded calendar (e.g. restored from a snapshot)."""
+    with _lock:
+        _calendars.setdefault(name, calendar)
@@ -0,0 +1,232 @@
+"""
+Lightweight instrumentation: counters and timed spans.
+
+Instrumentation is disabled by default, in which case span() returns a shared
+no-op context manager and counters return immediately.  It is enabled by
+calling enable() or by setting the PORTFOLIO_METRICS environment variable:
+
+    PORTFOLIO_METRICS=1               collect metrics in memory
+    PORTFOLIO_METRICS=metrics.json    ... and export them as JSON at exit
+    PORTFOLIO_METRICS=metrics.prom    ... or in Prometheus text format
+
+Metrics are identified by a name and optional labels, e.g.
+span("parse", asset="bovespa") or increment("files_parsed", asset="fund").
+"""
+
+import atexit
+import functools
+import json
+import os
+import re
+import threading
+import time
+from collections.abc import Callable
+
+_enabled: bool = False
+_lock = threading.Lock()
+
+Key = tuple[str, tuple[tuple[str, str], ...]]
+
+
+class _Timer:
+    __slots__ = ("count", "total", "min", "max")
+
+    def __init__(self):
+        self.count: int = 0
+        self.total: float = 0.0
+        self.min: float = float("inf")
+        self.max: float = 0.0
+
+    def add(self, elapsed: float) -> None:
+        self.count += 1
+        self.total += elapsed
+        self.min = min(self.min, elapsed)
+        self.max = max(self.max, elapsed)
+
+
+_counters: dict[Key, float] = {}
+_timers: dict[Key, _Timer] = {}
+
+
+def _key(name: str, labels: dict[str, object]) -> Key:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def enable() -> None:
+    global _enabled
+    _enabled = True
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _timers.clear()
+
+
+def increment(name: str, value: float = 1, **labels) -> None:
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def record_time(name: str, elapsed: float, **labels) -> None:
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        timer = _timers.get(key)
+        if timer is None:
+            timer = _timers[key] = _Timer()
+        timer.add(elapsed)
+
+
+class _Span:
+    __slots__ = ("name", "labels", "start")
+
+    def __init__(self, name: str, labels: dict[str, object]):
+        self.name: str = name
+        self.labels: dict[str, object] = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        record_time(self.name, time.perf_counter() - self.start, **self.labels)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str, **labels):
+    """Context manager timing the enclosed block."""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, labels)
+
+
+def timed(name: str) -> Callable:
+    """Decorator timing each call of a function, labeled with its qualified name."""
+
+    def decorator(func: Callable) -> Callable:
+        labels = {"function": func.__qualname__}
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record_time(name, time.perf_counter() - start, **labels)
+
+        return wrapper
+
+    return decorator
+
+
+##########
+# Export #
+##########
+
+
+def to_dict() -> dict[str, list[dict]]:
+    with _lock:
+        counters = [
+            {"name": name, "labels": dict(labels), "value": value}
+            for (name, labels), value in sorted(_counters.items())
+        ]
+        timers = [
+            {
+                "name": name,
+                "labels": dict(labels),
+                "count": timer.count,
+                "total": timer.total,
+                "min": timer.min,
+                "max": timer.max,
+            }
+            for (name, labels), timer in sorted(_timers.items())
+        ]
+    return {"counters": counters, "timers": timers}
+
+
+def _prometheus_name(name: str) -> str:
+    return "portfolio_" + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _prometheus_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        '%s="%s"' % (k, v.replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def to_prometheus() -> str:
+    metrics = to_dict()
+    lines = []
+    declared = set()
+    for counter in metrics["counters"]:
+        name = _prometheus_name(counter["name"]) + "_total"
+        if name not in declared:
+            lines.append("# TYPE %s counter" % name)
+            declared.add(name)
+        lines.append(
+            "%s%s %r" % (name, _prometheus_labels(counter["labels"]), counter["value"])
+        )
+    for timer in metrics["timers"]:
+        name = _prometheus_name(timer["name"]) + "_seconds"
+        if name not in declared:
+            lines.append("# TYPE %s summary" % name)
+            declared.add(name)
+        labels = _prometheus_labels(timer["labels"])
+        lines.append("%s_count%s %d" % (name, labels, timer["count"]))
+        lines.append("%s_sum%s %r" % (name, labels, timer["total"]))
+    return "\n".join(lines) + "\n"
+
+
+def export(file_name: str) -> None:
+    """Write the metrics to file_name, in Prometheus format for .prom files and JSON otherwise."""
+    if file_name.endswith(".prom"):
+        content = to_prometheus()
+    else:
+        content = json.dumps(to_dict(), indent=2)
+    with open(file_name + ".tmp", "w") as f:
+        f.write(content)
+    os.replace(file_name + ".tmp", file_name)
+
+
+def _configure_from_environment() -> None:
+    setting = os.environ.get("PORTFOLIO_METRICS", "")
+    if setting in ("", "0"):
+        return
+    enable()
+    if setting != "1":
+        atexit.register(export, setting)
+
+
+_configure_from_environment()